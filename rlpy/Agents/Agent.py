@@ -12,6 +12,7 @@ from builtins import object
 from abc import ABCMeta, abstractmethod
 import numpy as np
 import logging
+from rlpy.Tools import SparseTrace
 from future.utils import with_metaclass
 
 __copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
@@ -140,8 +141,10 @@ class Agent(with_metaclass(ABCMeta, object)):
         self.episode_count += 1
 
         # Set eligibility Traces to zero if it is end of the episode
-        if hasattr(self, 'eligibility_trace'):
-                self.eligibility_trace = np.zeros_like(self.eligibility_trace)
+        if isinstance(self.eligibility_trace, SparseTrace):
+            self.eligibility_trace.clear()
+        elif hasattr(self, 'eligibility_trace'):
+            self.eligibility_trace = np.zeros_like(self.eligibility_trace)
 
 
 class DescentAlgorithm(object):
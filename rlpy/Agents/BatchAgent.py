@@ -4,9 +4,11 @@ from __future__ import print_function
 from __future__ import division
 from __future__ import absolute_import
 from builtins import super
+from builtins import range
 from future import standard_library
 standard_library.install_aliases()
 from .Agent import Agent
+from rlpy.Tools import SampleStore
 import numpy as np
 
 __copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
@@ -19,12 +21,26 @@ __author__ = "Alborz Geramifard"
 class BatchAgent(Agent):
 
     """An abstract class for batch agents
+
+    The transitions are kept in a :py:class:`~rlpy.Tools.SampleStore.SampleStore`
+    (``self.store``) of ``max_window`` rows, whose arrays are also available as
+    ``data_s``, ``data_a``, ``data_r``, ``data_ns``, ``data_na`` and
+    ``data_terminal``. The first ``samples_count`` rows are in use.
     """
 
     max_window = 0
     samples_count = 0  # Number of samples gathered so far
 
-    def __init__(self, policy, representation, discount_factor, max_window):
+    def __init__(self, policy, representation, discount_factor, max_window,
+                 ring_buffer=False, state_dtype=np.float64, memmap_dir=None):
+        """
+        :param max_window: maximum number of stored transitions.
+        :param ring_buffer: once ``max_window`` transitions are stored,
+            replace the oldest ones (sliding window over the latest samples).
+        :param state_dtype: dtype used to store the states.
+        :param memmap_dir: (optional) directory of memory-mapped arrays for
+            the samples, for windows which do not fit into memory.
+        """
 
         super(BatchAgent, self).__init__(policy, representation, discount_factor=discount_factor)
 
@@ -32,11 +48,16 @@ class BatchAgent(Agent):
         self.samples_count = 0
 
         # Take memory for stored values
-        self.data_s = np.zeros((max_window, self. representation.state_space_dims))
-        self.data_ns = np.zeros((max_window, self.representation.state_space_dims))
-        self.data_a = np.zeros((max_window, 1), dtype=np.uint32)
-        self.data_na = np.zeros((max_window, 1), dtype=np.uint32)
-        self.data_r = np.zeros((max_window, 1))
+        self.store = SampleStore(max_window, self.representation.state_space_dims,
+                                 actions_num=self.representation.actions_num,
+                                 state_dtype=state_dtype, ring=ring_buffer,
+                                 directory=memmap_dir)
+        self.data_s = self.store.s
+        self.data_ns = self.store.ns
+        self.data_a = self.store.a
+        self.data_na = self.store.na
+        self.data_r = self.store.r
+        self.data_terminal = self.store.terminal
 
     def learn(self, s, p_actions, a, r, ns, np_actions, na, terminal):
         """Iterative learning method for the agent.
@@ -53,7 +74,7 @@ class BatchAgent(Agent):
         self.store_samples(s, a, r, ns, na, terminal)
         if terminal:
             self.episodeTerminated()
-        if self.samples_count % self.max_window == 0:
+        if self.store.count % self.max_window == 0:
             self.batch_learn()
 
     def batch_learn(self):
@@ -62,10 +83,32 @@ class BatchAgent(Agent):
     def store_samples(self, s, a, r, ns, na, terminal):
         """Process one transition instance."""
         # Save samples
-        self.data_s[self.samples_count, :] = s
-        self.data_a[self.samples_count] = a
-        self.data_r[self.samples_count] = r
-        self.data_ns[self.samples_count, :] = ns
-        self.data_na[self.samples_count] = na
+        self.store.add(s, a, r, ns, na, terminal)
+        self.samples_count = self.store.size
+
+    def addSamples(self, s, a, r, ns, na, terminal):
+        """Process a batch of transitions (arrays with one row per transition)
+        without learning, e.g. a chunk of an offline dataset. Learning on the
+        stored samples is done by :py:meth:`batch_learn`.
+        """
+        for i in range(len(r)):
+            self.store_samples(s[i], a[i], r[i], ns[i], na[i], terminal[i])
+            if terminal[i]:
+                self.episodeTerminated()
+
+    def saveSamples(self, path):
+        """Save the stored transitions to the ``.npz`` file *path*."""
+        self.store.save(path)
 
-        self.samples_count += 1
+    def loadSamples(self, path):
+        """Process the transitions saved with :py:meth:`saveSamples` in
+        chronological order, as if they had been observed. Learning is not
+        triggered; call :py:meth:`batch_learn` (or e.g.
+        ``LSPI.representationExpansionLSPI``) afterwards.
+
+        :return: the number of loaded transitions.
+        """
+        samples = SampleStore.load(path)
+        for transition in samples.transitions():
+            self.store_samples(*transition)
+        return samples.size
@@ -8,7 +8,7 @@ from future import standard_library
 standard_library.install_aliases()
 from past.utils import old_div
 from .Agent import Agent, DescentAlgorithm
-from rlpy.Tools import addNewElementForAllActions, count_nonzero
+from rlpy.Tools import SparseTrace, WeightBuffer
 import numpy as np
 from copy import copy
 
@@ -26,6 +26,10 @@ class Greedy_GQ(DescentAlgorithm, Agent):
     function representation.
     See Maei et al., 2010 (http://www.icml2010.org/papers/627.pdf)
 
+    The eligibility traces are stored as
+    :py:class:`~rlpy.Tools.SparseTrace.SparseTrace` objects and all updates
+    only touch the active features and the support of the traces.
+
     """
 
     lambda_ = 0  # lambda Parameter in SARSA [Sutton Book 1998]
@@ -35,12 +39,10 @@ class Greedy_GQ(DescentAlgorithm, Agent):
     eligibility_trace_s = []
 
     def __init__(self, policy, representation,
-            lambda_=0, BetaCoef=1e-6, **kwargs):
-        self.eligibility_trace = np.zeros(
-            representation.features_num *
-            representation.actions_num)
+            lambda_=0, BetaCoef=1e-6, trace_threshold=1e-5, **kwargs):
+        self.eligibility_trace = SparseTrace(threshold=trace_threshold)
         # use a state-only version of eligibility trace for dabney decay mode
-        self.eligibility_trace_s = np.zeros(representation.features_num)
+        self.eligibility_trace_s = SparseTrace(threshold=trace_threshold)
         self.lambda_ = lambda_
         super(
             Greedy_GQ,
@@ -49,6 +51,8 @@ class Greedy_GQ(DescentAlgorithm, Agent):
             representation=representation,
             **kwargs)
         self.GQWeight = copy(self.representation.weight_vec)
+        # growable storage of GQWeight for representations adding features
+        self._GQWeight_buffer = WeightBuffer(self.representation.actions_num)
         # The beta in the GQ algorithm is assumed to be learn_rate * THIS CONSTANT
         self.secondLearningRateCoef = BetaCoef
 
@@ -56,59 +60,64 @@ class Greedy_GQ(DescentAlgorithm, Agent):
         self.representation.pre_discover(s, False, a, ns, terminal)
         discount_factor = self.discount_factor
         weight_vec = self.representation.weight_vec
-        phi_s = self.representation.phi(s, False)
-        phi = self.representation.phi_sa(s, False, a, phi_s)
-        phi_prime_s = self.representation.phi(ns, terminal)
+        features_num = self.representation.features_num
+        ind_s, val_s = self.representation.phi_active(s, False)
+        active_prime = self.representation.phi_active(ns, terminal)
         na = self.representation.bestAction(
             ns,
             terminal,
             np_actions,
-            phi_prime_s)  # Switch na to the best possible action
-        phi_prime = self.representation.phi_sa(
-            ns,
-            terminal,
-            na,
-            phi_prime_s)
-        nnz = count_nonzero(phi_s)    # Number of non-zero elements
+            active=active_prime)  # Switch na to the best possible action
+        ind_ns, val_ns = active_prime
+        # indices of the active features of phi_sa(s, a) and phi_sa(ns, na)
+        ind = ind_s + a * features_num
+        ind_prime = ind_ns + na * features_num
+        nnz = len(ind_s)    # Number of non-zero elements
 
-        expanded = old_div((- len(self.GQWeight) + len(phi)), self.representation.actions_num)
+        expanded = old_div((- len(self.GQWeight) + len(weight_vec)),
+                           self.representation.actions_num)
         if expanded:
             self._expand_vectors(expanded)
         # Set eligibility traces:
         if self.lambda_:
-            self.eligibility_trace *= discount_factor * self.lambda_
-            self.eligibility_trace += phi
-
-            self.eligibility_trace_s *= discount_factor * self.lambda_
-            self.eligibility_trace_s += phi_s
+            self.eligibility_trace.decay(discount_factor * self.lambda_)
+            self.eligibility_trace.add(ind, val_s)
 
-            # Set max to 1
-            self.eligibility_trace[self.eligibility_trace > 1] = 1
-            self.eligibility_trace_s[self.eligibility_trace_s > 1] = 1
+            self.eligibility_trace_s.decay(discount_factor * self.lambda_)
+            self.eligibility_trace_s.add(ind_s, val_s)
         else:
-            self.eligibility_trace = phi
-            self.eligibility_trace_s = phi_s
+            self.eligibility_trace.assign(ind, val_s)
+            self.eligibility_trace_s.assign(ind_s, val_s)
 
-        td_error                     = r + \
-            np.dot(discount_factor * phi_prime - phi, weight_vec)
+        td_error = r + discount_factor * np.dot(weight_vec[ind_prime], val_ns) \
+            - np.dot(weight_vec[ind], val_s)
+        # phi_s and phi_prime_s restricted to the support of the state trace
         self.updateLearnRate(
-            phi_s,
-            phi_prime_s,
-            self.eligibility_trace_s,
+            self.eligibility_trace_s.align(ind_s, val_s),
+            self.eligibility_trace_s.align(ind_ns, val_ns),
+            self.eligibility_trace_s.values(),
             discount_factor,
             nnz,
             terminal)
 
         if nnz > 0:  # Phi has some nonzero elements, proceed with update
-            td_error_estimate_now = np.dot(phi, self.GQWeight)
-            Delta_weight_vec                 = td_error * self.eligibility_trace - \
-                discount_factor * td_error_estimate_now * phi_prime
-            weight_vec += self.learn_rate * Delta_weight_vec
-            Delta_GQWeight = (
-                td_error - td_error_estimate_now) * phi
-            self.GQWeight               += self.learn_rate * \
-                self.secondLearningRateCoef * Delta_GQWeight
+            td_error_estimate_now = np.dot(self.GQWeight[ind], val_s)
+            # Delta_weight_vec = td_error * e - discount_factor *
+            # td_error_estimate_now * phi_prime
+            weight_vec[self.eligibility_trace.indices] += self.learn_rate * \
+                td_error * self.eligibility_trace.values()
+            weight_vec[ind_prime] -= self.learn_rate * discount_factor * \
+                td_error_estimate_now * val_ns
+            # Delta_GQWeight = (td_error - td_error_estimate_now) * phi
+            self.GQWeight[ind] += self.learn_rate * \
+                self.secondLearningRateCoef * \
+                (td_error - td_error_estimate_now) * val_s
 
+        if self.representation.isDynamic:
+            phi_s = np.zeros(features_num)
+            phi_s[ind_s] = val_s
+        else:
+            phi_s = None
         expanded = self.representation.post_discover(
             s,
             False,
@@ -120,21 +129,19 @@ class Greedy_GQ(DescentAlgorithm, Agent):
         if terminal:
             self.episodeTerminated()
 
+    def episodeTerminated(self):
+        self.eligibility_trace_s.clear()
+        super(Greedy_GQ, self).episodeTerminated()
+
     def _expand_vectors(self, num_expansions):
         """
         correct size of GQ weight and e-traces when new features were expanded
         """
         new_elem = np.zeros((self.representation.actions_num, num_expansions))
-        self.GQWeight = addNewElementForAllActions(
+        self.GQWeight = self._GQWeight_buffer.addFeatures(
             self.GQWeight,
-            self.representation.actions_num,
             new_elem)
-        if self.lambda_:
-            # Correct the size of eligibility traces (pad with zeros for new
-            # features)
-            self.eligibility_trace = addNewElementForAllActions(
-                self.eligibility_trace,
-                self.representation.actions_num,
-                new_elem)
-            self.eligibility_trace_s = addNewElementForAllActions(
-                self.eligibility_trace_s, 1, np.zeros((1, num_expansions)))
+        # Correct the indices of the eligibility traces for the new features
+        features_num = self.representation.features_num
+        self.eligibility_trace.expandFeatures(features_num - num_expansions,
+                                              features_num)
@@ -4,6 +4,7 @@ from __future__ import unicode_literals
 from __future__ import division
 from __future__ import absolute_import
 from builtins import super
+from builtins import range
 from future import standard_library
 standard_library.install_aliases()
 from .BatchAgent import BatchAgent
@@ -41,6 +42,38 @@ class LSPI(BatchAgent):
 
         use_sparse (bool):  Use sparse operators for building the matrix of transitions?
 
+        incremental (bool): Keep A and b of LSTD as sparse matrices that are only
+                            updated with the new samples on each LSPI run, and solve
+                            with an iterative solver warm-started from the current
+                            weights instead of refactorizing A. Only applies to
+                            representations that can not expand; implies use_sparse.
+
+        rls (bool): With incremental, also maintain the inverse of the (regularized)
+                    LSTD matrix A with Sherman-Morrison updates (recursive least
+                    squares), so that LSTD needs no solve at all.
+
+        ring_buffer (bool): Keep only the latest max_window transitions, replacing the
+                    oldest ones (and removing them from A and b) when the window is
+                    full. Not combined with incremental.
+
+        state_dtype (dtype): dtype used to store the states of the transitions.
+
+        memmap_dir (str): Directory of memory-mapped arrays for the transitions
+                    (see :py:class:`~rlpy.Tools.SampleStore.SampleStore`).
+
+        lstd_chunk_size (int): For representations that can expand, A and b are
+                    accumulated over chunks of this many samples from the blocks of
+                    the actions, without building the action-expanded feature
+                    matrices (see :py:meth:`blockLSTDStatistics`).
+
+        solver (str or LinearSolver): Solver of the linear systems, see
+                    :py:func:`~rlpy.Tools.LinearSolvers.linearSolver`, e.g. "splu"
+                    to reuse the sparse factorization or "cg" / "lsqr". Solvers that
+                    can be warm-started start from the current weights. Defaults to
+                    the direct solver, or "lgmres" in incremental mode. As A is not
+                    symmetric in general, "cholesky" and "cg", which need a symmetric
+                    positive definite A, are rarely a good choice.
+
     """
 
     use_sparse = 0  # Use sparse operators for building A?
@@ -55,22 +88,49 @@ class LSPI(BatchAgent):
     # Maximum number of iterations over LSPI and Representation expansion
     re_iterations = 0
 
+    # Update A and b with the new samples only and warm-start the solver
+    incremental = False
+    # Maintain the inverse of A with Sherman-Morrison updates
+    rls = False
+    # Number of samples already included in the incremental A and b
+    lstd_samples = 0
+    # Number of samples processed at once when building A and b of dynamic
+    # representations
+    lstd_chunk_size = 10000
+
     def __init__(
             self, policy, representation, discount_factor, max_window, steps_between_LSPI,
-            lspi_iterations=5, tol_epsilon=1e-3, re_iterations=100, use_sparse=False):
+            lspi_iterations=5, tol_epsilon=1e-3, re_iterations=100, use_sparse=False,
+            incremental=False, rls=False, solver=None, ring_buffer=False,
+            state_dtype=np.float64, memmap_dir=None, lstd_chunk_size=10000):
 
         self.steps_between_LSPI = steps_between_LSPI
         self.tol_epsilon = tol_epsilon
         self.lspi_iterations = lspi_iterations
         self.re_iterations = re_iterations
         self.use_sparse = use_sparse
+        self.lstd_chunk_size = lstd_chunk_size
 
         # Make A and r incrementally if the representation can not expand
         self.fixedRep = not representation.isDynamic
+        self.incremental = incremental and self.fixedRep and not ring_buffer
+        self.rls = rls and self.incremental
+        if solver is None and self.incremental:
+            solver = "lgmres"
+        self.solver = Tools.linearSolver(solver)
         if self.fixedRep:
             f_size = representation.features_num * representation.actions_num
             self.b = np.zeros((f_size, 1))
-            self.A = np.zeros((f_size, f_size))
+            if self.incremental:
+                self.use_sparse = True
+                self.lstd_samples = 0
+                self.A = sp.csr_matrix((f_size, f_size))
+                # F1.T * F1, shared by the A matrices of all policies
+                self.F1TF1 = sp.csr_matrix((f_size, f_size))
+                if self.rls:
+                    self.A_inv = np.eye(f_size) / Tools.REGULARIZATION
+            else:
+                self.A = np.zeros((f_size, f_size))
 
             # Cache calculated phi vectors
             if self.use_sparse:
@@ -88,7 +148,9 @@ class LSPI(BatchAgent):
                 self.all_phi_s_a = np.zeros((max_window, f_size))
                 self.all_phi_ns_na = np.zeros((max_window, f_size))
 
-        super(LSPI, self).__init__(policy, representation, discount_factor, max_window)
+        super(LSPI, self).__init__(policy, representation, discount_factor, max_window,
+                                   ring_buffer=ring_buffer, state_dtype=state_dtype,
+                                   memmap_dir=memmap_dir)
 
     def calculateTDErrors(self):
         """Calculate TD errors over the transition instances stored.
@@ -98,6 +160,10 @@ class LSPI(BatchAgent):
         # + (discount_factor*F2 - F1) * Theta
         discount_factor = self.discount_factor
         R = self.data_r[:self.samples_count, :]
+        if not self.fixedRep:
+            p = self.samples_count
+            return R.ravel() + discount_factor * self._blockQ(self.all_phi_ns, self.data_na[:p]) \
+                - self._blockQ(self.all_phi_s, self.data_a[:p])
         if self.use_sparse:
             F1 = sp.csr_matrix(self.all_phi_s_a[:self.samples_count, :])
             F2 = sp.csr_matrix(self.all_phi_ns_na[:self.samples_count, :])
@@ -131,10 +197,56 @@ class LSPI(BatchAgent):
         :param int na: The action taken by the agent in state ns.
         :param bool terminal: Whether or not ns is a terminal state.
         """
-        super(LSPI, self).learn(s, p_actions, a, r, ns, np_actions, na, terminal)
-        if (self.samples_count) % self.steps_between_LSPI == 0:
+        self.store_samples(s, a, r, ns, na, terminal)
+        if terminal:
+            self.episodeTerminated()
+        if self.store.count % self.steps_between_LSPI == 0:
             self.representationExpansionLSPI()
 
+    def batch_learn(self):
+        """Run LSPI (with representation expansion) on the stored samples."""
+        self.representationExpansionLSPI()
+
+    def addSamples(self, s, a, r, ns, na, terminal):
+        """Process a batch of transitions at once: the feature vectors of all
+        states are computed with batch calls and added to A and b with matrix
+        products. Unlike :py:meth:`store_samples`, phi(s) is always computed
+        from s instead of being taken from the previous next state.
+        """
+        s, ns = np.asarray(s), np.asarray(ns)
+        a = np.asarray(a).reshape(-1, 1)
+        na = np.asarray(na).reshape(-1, 1)
+        r = np.asarray(r, dtype=float).reshape(-1, 1)
+        terminal = np.asarray(terminal, dtype=bool).ravel()
+        if self.fixedRep:
+            store = self.store
+            n = len(r)
+            if not store.ring and store.count + n > store.capacity:
+                raise IndexError("LSPI window is full (%d samples)" % store.capacity)
+            start = max(0, n - store.capacity)
+            s, a, r, ns, na, terminal = (x[start:] for x in (s, a, r, ns, na, terminal))
+            rows = (store.count + start + np.arange(n - start)) % store.capacity
+            representation = self.representation
+            phi_s = representation.phi_batch(s, use_sparse=self.use_sparse)
+            phi_ns = representation.phi_batch(ns, terminal, use_sparse=self.use_sparse)
+            phi_s_a = representation.batchPhi_s_a(phi_s, a, use_sparse=self.use_sparse)
+            phi_ns_na = representation.batchPhi_s_a(phi_ns, na, use_sparse=self.use_sparse)
+            if not self.incremental:
+                replaced = rows[store.count + start + np.arange(len(rows)) >= store.capacity]
+                if len(replaced):
+                    # remove the replaced samples from A and b
+                    self._updateAbBatch(self.all_phi_s_a[replaced, :],
+                                        self.data_r[replaced],
+                                        self.all_phi_ns_na[replaced, :], -1.)
+                self._updateAbBatch(phi_s_a, r, phi_ns_na)
+            self.all_phi_s[rows, :] = phi_s
+            self.all_phi_ns[rows, :] = phi_ns
+            self.all_phi_s_a[rows, :] = phi_s_a
+            self.all_phi_ns_na[rows, :] = phi_ns_na
+        self.store.extend(s, a, r, ns, na, terminal)
+        self.samples_count = self.store.size
+        self.episode_count += int(np.sum(terminal))
+
     def representationExpansionLSPI(self):
         re_iteration = 0
         added_feature = True
@@ -185,18 +297,30 @@ class LSPI(BatchAgent):
         # each state
         action_mask = None
         discount_factor = self.discount_factor
-        F1 = sp.csr_matrix(self.all_phi_s_a[:self.samples_count, :]) if self.use_sparse else self.all_phi_s_a[:self.samples_count, :]
+        if self.fixedRep:
+            F1 = sp.csr_matrix(self.all_phi_s_a[:self.samples_count, :]) if self.use_sparse else self.all_phi_s_a[:self.samples_count, :]
         while lspi_iteration < self.lspi_iterations and weight_diff > self.tol_epsilon:
 
             # Find the best action for each state given the current value function
             # Notice if actions have the same value the first action is
             # selected in the batch mode
             iteration_start_time = Tools.clock()
-            bestAction, self.all_phi_ns_new_na, action_mask = self.representation.batchBestAction(self.data_ns[:self.samples_count, :], self.all_phi_ns, action_mask, self.use_sparse)
+            if not self.fixedRep:
+                # only the greedy actions are needed for the blocks of A
+                bestAction, _, action_mask = self.representation.batchBestAction(self.data_ns[:self.samples_count, :], self.all_phi_ns, action_mask, self.use_sparse, returnPhi=False)
+            else:
+                bestAction, self.all_phi_ns_new_na, action_mask = self.representation.batchBestAction(self.data_ns[:self.samples_count, :], self.all_phi_ns, action_mask, self.use_sparse)
 
             # Recalculate A matrix (b remains the same)
             # Solve for the new weight_vec
-            if self.use_sparse:
+            if not self.fixedRep:
+                A, _ = self.blockLSTDStatistics(
+                    self.all_phi_s, self.data_a[:self.samples_count], self.all_phi_ns,
+                    bestAction)
+            elif self.incremental:
+                F2 = sp.csr_matrix(self.all_phi_ns_new_na[:self.samples_count, :])
+                A = self.F1TF1 - discount_factor * (F1.T * F2)
+            elif self.use_sparse:
                 F2 = sp.csr_matrix(self.all_phi_ns_new_na[:self.samples_count, :])
                 A = F1.T * (F1 - discount_factor * F2)
             else:
@@ -204,7 +328,7 @@ class LSPI(BatchAgent):
                 A = np.dot(F1.T, F1 - discount_factor * F2)
 
             A = Tools.regularize(A)
-            new_weight_vec, solve_time = Tools.solveLinear(A, self.b)
+            new_weight_vec, solve_time = self.solve(A, self.b)
 
             # Calculate TD_Errors
             ####################
@@ -229,6 +353,10 @@ class LSPI(BatchAgent):
         self.logger.info(
             'Total Policy Iteration Time = %0.0f(s)' %
             Tools.deltaT(start_time))
+        self.logger.debug(
+            'Solver %s: %d solves in %0.2f(s), ||Ax-b|| = %g' %
+            (self.solver.name, self.solver.calls, self.solver.total_time,
+             self.solver.last_residual))
         return td_errors
 
     def LSTD(self):
@@ -240,38 +368,28 @@ class LSPI(BatchAgent):
         if not self.fixedRep:
             # build phi_s and phi_ns for all samples
             p = self.samples_count
-            n = self.representation.features_num
-            self.all_phi_s = np.empty(
-                (p, n), dtype=self.representation.featureType())
-            self.all_phi_ns = np.empty(
-                (p, n), dtype=self.representation.featureType())
-
-            for i in np.arange(self.samples_count):
-                self.all_phi_s[i, :] = self.representation.phi(self.data_s[i])
-                self.all_phi_ns[i, :] = self.representation.phi(self.data_ns[i])
-
-            # build phi_s_a and phi_ns_na for all samples given phi_s and
-            # phi_ns
-            self.all_phi_s_a = self.representation.batchPhi_s_a(self.all_phi_s[:self.samples_count, :], self.data_a[:self.samples_count, :], use_sparse=self.use_sparse)
-            self.all_phi_ns_na = self.representation.batchPhi_s_a(self.all_phi_ns[:self.samples_count, :], self.data_na[:self.samples_count, :], use_sparse=self.use_sparse)
-
-            # calculate A and b for LSTD
-            F1 = self.all_phi_s_a[:self.samples_count, :]
-            F2 = self.all_phi_ns_na[:self.samples_count, :]
-            R = self.data_r[:self.samples_count, :]
-            discount_factor = self.discount_factor
-
-            if self.use_sparse:
-                self.b = (F1.T * R).reshape(-1, 1)
-                self.A = F1.T * (F1 - discount_factor * F2)
-            else:
-                self.b = np.dot(F1.T, R).reshape(-1, 1)
-                self.A = np.dot(F1.T, F1 - discount_factor * F2)
-
-        A = Tools.regularize(self.A)
+            self.all_phi_s = self.representation.phi_batch(self.data_s[:p])
+            self.all_phi_ns = self.representation.phi_batch(
+                self.data_ns[:p], self.data_terminal[:p])
+
+            # calculate A and b for LSTD from the blocks of the actions,
+            # without building phi_s_a and phi_ns_na
+            self.A, self.b = self.blockLSTDStatistics(
+                self.all_phi_s, self.data_a[:p], self.all_phi_ns,
+                self.data_na[:p], self.data_r[:p])
+
+        if self.incremental:
+            self.updateLSTDStatistics()
+
+        if self.rls:
+            solve_start_time = Tools.clock()
+            self.representation.weight_vec = np.dot(self.A_inv, self.b).ravel()
+            solve_time = Tools.deltaT(solve_start_time)
+        else:
+            A = Tools.regularize(self.A)
 
-        # Calculate weight_vec
-        self.representation.weight_vec, solve_time = Tools.solveLinear(A, self.b)
+            # Calculate weight_vec
+            self.representation.weight_vec, solve_time = self.solve(A, self.b)
 
         # log solve time only if takes more than 1 second
         if solve_time > 1:
@@ -283,12 +401,113 @@ class LSPI(BatchAgent):
                 'Total LSTD Time = %0.0f(s)' %
                 (Tools.deltaT(start_time)))
 
+    def _chunks(self, p):
+        for start in range(0, p, self.lstd_chunk_size):
+            yield slice(start, min(start + self.lstd_chunk_size, p))
+
+    def _blockQ(self, all_phi_s, actions):
+        """Q(s, a) of every sample given the feature vectors phi(s)."""
+        actions = np.asarray(actions, dtype=int).ravel()
+        W = self.representation.weight_vec.reshape(self.representation.actions_num, -1)
+        Q = np.empty(len(actions))
+        for rows in self._chunks(len(actions)):
+            Q_s = all_phi_s[rows].dot(W.T)
+            Q[rows] = np.asarray(Q_s)[np.arange(len(Q_s)), actions[rows]]
+        return Q
+
+    def blockLSTDStatistics(self, all_phi_s, actions, all_phi_ns, next_actions, rewards=None):
+        """Compute A (and b) of LSTD without building the action-expanded
+        feature matrices phi_s_a and phi_ns_na. As phi_sa copies phi(s) into
+        the block of action a, the block (a, a') of A is
+
+            sum over the samples with action a of
+            phi(s) (phi(s) [a == a'] - gamma phi(ns) [na == a'])^T
+
+        which is accumulated over chunks of ``lstd_chunk_size`` samples.
+
+        Returns the tuple (A, b); b is None if no rewards are given.
+        A is sparse if use_sparse is set.
+        """
+        p, n = all_phi_s.shape
+        a_num = self.representation.actions_num
+        size = n * a_num
+        actions = np.asarray(actions, dtype=int).ravel()
+        next_actions = np.asarray(next_actions, dtype=int).ravel()
+        A = sp.csr_matrix((size, size)) if self.use_sparse else np.zeros((size, size))
+        b = None if rewards is None else np.zeros((size, 1))
+        for rows in self._chunks(p):
+            Phi, Phi_n = all_phi_s[rows], all_phi_ns[rows]
+            a, na = actions[rows], next_actions[rows]
+            blocks = []
+            for i in np.unique(a):
+                samples = np.flatnonzero(a == i)
+                Phi_a = Phi[samples]
+                blocks.append((i, i, Phi_a.T.dot(Phi_a)))
+                if b is not None:
+                    b[i * n:(i + 1) * n] += np.asarray(
+                        Phi_a.T.dot(rewards[rows][samples])).reshape(-1, 1)
+                for j in np.unique(na[samples]):
+                    pairs = samples[na[samples] == j]
+                    blocks.append(
+                        (i, j, -self.discount_factor * Phi[pairs].T.dot(Phi_n[pairs])))
+            if self.use_sparse:
+                data, row_ids, col_ids = [], [], []
+                for i, j, block in blocks:
+                    block = sp.coo_matrix(block)
+                    data.append(block.data)
+                    row_ids.append(block.row + i * n)
+                    col_ids.append(block.col + j * n)
+                A = A + sp.csr_matrix(
+                    (np.concatenate(data), (np.concatenate(row_ids), np.concatenate(col_ids))),
+                    shape=(size, size))
+            else:
+                for i, j, block in blocks:
+                    if sp.issparse(block):
+                        block = block.toarray()
+                    A[i * n:(i + 1) * n, j * n:(j + 1) * n] += block
+        return A, b
+
+    def solve(self, A, b):
+        """Solve Ax=b for the weights. Returns tuple (x, time to solve).
+        Iterative solvers start from the current weights.
+        """
+        x0 = self.representation.weight_vec
+        if len(x0) != A.shape[0]:
+            x0 = None
+        return self.solver.solve(A, b, x0=x0)
+
+    def updateLSTDStatistics(self):
+        """Add the samples gathered since the last call to A and b (and to the
+        inverse of A in RLS mode). Used in incremental mode.
+        """
+        start, end = self.lstd_samples, self.samples_count
+        if end <= start:
+            return
+        F1 = sp.csr_matrix(self.all_phi_s_a[start:end, :])
+        F2 = sp.csr_matrix(self.all_phi_ns_na[start:end, :])
+        D = F1 - self.discount_factor * F2
+        self.b += F1.T * self.data_r[start:end, :]
+        self.A = self.A + F1.T * D
+        self.F1TF1 = self.F1TF1 + F1.T * F1
+        if self.rls:
+            # Sherman-Morrison update of A^-1 for each rank-one term u*d^T
+            A_inv = self.A_inv
+            for i in range(end - start):
+                u, d = F1.getrow(i), D.getrow(i)
+                A_inv_u = np.dot(A_inv[:, u.indices], u.data)
+                d_A_inv = np.dot(d.data, A_inv[d.indices, :])
+                denominator = 1. + np.dot(d_A_inv[u.indices], u.data)
+                A_inv -= np.outer(A_inv_u, d_A_inv) / denominator
+        self.lstd_samples = end
+
     def store_samples(self, s, a, r, ns, na, terminal):
         """Process one transition instance."""
 
         # Update A and b if representation is going to be fix together with all
         # features
         if self.fixedRep:
+            # row of the new sample; the previous sample is in the row before
+            i = self.store.index
             if terminal:
                 phi_s = self.representation.phi(s, False)
                 phi_s_a = self.representation.phi_sa(
@@ -299,11 +518,11 @@ class LSPI(BatchAgent):
             else:
                 # This is because the current s,a will be the previous ns, na
                 if self.use_sparse:
-                    phi_s = self.all_phi_ns[self.samples_count - 1, :].todense()
-                    phi_s_a = self.all_phi_ns_na[self.samples_count - 1, :].todense()
+                    phi_s = self.all_phi_ns[i - 1, :].todense()
+                    phi_s_a = self.all_phi_ns_na[i - 1, :].todense()
                 else:
-                    phi_s = self.all_phi_ns[self.samples_count - 1, :]
-                    phi_s_a = self.all_phi_ns_na[self.samples_count - 1, :]
+                    phi_s = self.all_phi_ns[i - 1, :]
+                    phi_s_a = self.all_phi_ns_na[i - 1, :]
 
             phi_ns = self.representation.phi(ns, terminal)
             phi_ns_na = self.representation.phi_sa(
@@ -312,14 +531,40 @@ class LSPI(BatchAgent):
                 na,
                 phi_s=phi_ns)
 
-            self.all_phi_s[self.samples_count, :] = phi_s
-            self.all_phi_ns[self.samples_count, :] = phi_ns
-            self.all_phi_s_a[self.samples_count, :] = phi_s_a
-            self.all_phi_ns_na[self.samples_count, :] = phi_ns_na
+            if self.store.ring and self.store.full and not self.incremental:
+                # remove the replaced sample from A and b
+                self._updateAb(self._row(self.all_phi_s_a, i), self.data_r[i, 0],
+                               self._row(self.all_phi_ns_na, i), -1.)
+
+            self.all_phi_s[i, :] = phi_s
+            self.all_phi_ns[i, :] = phi_ns
+            self.all_phi_s_a[i, :] = phi_s_a
+            self.all_phi_ns_na[i, :] = phi_ns_na
+
+            if not self.incremental:
+                self._updateAb(np.asarray(phi_s_a).ravel(), r,
+                               np.asarray(phi_ns_na).ravel())
 
-            discount_factor = self.discount_factor
-            self.b += phi_s_a.reshape((-1, 1)) * r
-            d = phi_s_a - discount_factor * phi_ns_na
-            self.A += np.outer(phi_s_a, d)
+        super(LSPI, self).store_samples(s, a, r, ns, na, terminal)
 
-            super(LSPI, self).store_samples(s, a, r, ns, na, terminal)
+    def _row(self, M, i):
+        if self.use_sparse:
+            return M[i, :].toarray().ravel()
+        return M[i, :].copy()
+
+    def _updateAb(self, phi_s_a, r, phi_ns_na, sign=1.):
+        """Add (sign=1) or remove (sign=-1) a sample from A and b."""
+        self.b += sign * phi_s_a.reshape((-1, 1)) * r
+        d = phi_s_a - self.discount_factor * phi_ns_na
+        self.A += sign * np.outer(phi_s_a, d)
+
+    def _updateAbBatch(self, F1, R, F2, sign=1.):
+        """Add (sign=1) or remove (sign=-1) the samples with the feature
+        matrices F1, F2 and rewards R from A and b."""
+        if sp.issparse(F1):
+            F1, F2 = sp.csr_matrix(F1), sp.csr_matrix(F2)
+            self.b += sign * np.asarray(F1.T * R).reshape(-1, 1)
+            self.A += sign * (F1.T * (F1 - self.discount_factor * F2)).toarray()
+        else:
+            self.b += sign * np.dot(F1.T, R).reshape(-1, 1)
+            self.A += sign * np.dot(F1.T, F1 - self.discount_factor * F2)
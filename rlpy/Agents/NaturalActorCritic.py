@@ -11,7 +11,7 @@ standard_library.install_aliases()
 from past.utils import old_div
 import numpy as np
 from .Agent import Agent
-from rlpy.Tools import solveLinear, regularize
+from rlpy.Tools import regularize, linearSolver
 
 __copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
 __credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
@@ -35,7 +35,7 @@ class NaturalActorCritic(Agent):
 
     def __init__(self, policy, representation, discount_factor, forgetting_rate,
                  min_steps_between_updates, max_steps_between_updates, lambda_,
-                 learn_rate):
+                 learn_rate, solver=None):
         """
         @param representation: function approximation used to approximate the
                                value function
@@ -49,6 +49,8 @@ class NaturalActorCritic(Agent):
         @param max_steps_between_updates
         @param lambda_:    e-trace parameter lambda
         @param learn_rate:  learning rate
+        @param solver:  solver of the linear system (name or LinearSolver, see
+                        rlpy.Tools.linearSolver); default: direct solver
 
         """
 
@@ -60,6 +62,7 @@ class NaturalActorCritic(Agent):
         self.max_steps_between_updates = max_steps_between_updates
         self.lambda_ = lambda_
         self.learn_rate = learn_rate
+        self.solver = linearSolver(solver)
 
         self.steps_between_updates = 0
         self.b = np.zeros((self.n))
@@ -94,7 +97,7 @@ class NaturalActorCritic(Agent):
 
         if self.steps_between_updates > self.min_steps_between_updates:
             A = regularize(self.A)
-            param, time = solveLinear(A, self.b)
+            param, time = self.solver.solve(A, self.b)
             #  v = param[:k]  # parameters of the value function representation
             w = param[k:]  # natural gradient estimate
 
@@ -6,9 +6,8 @@ from __future__ import absolute_import
 from builtins import super
 from future import standard_library
 standard_library.install_aliases()
-from past.utils import old_div
 from .Agent import Agent, DescentAlgorithm
-from rlpy.Tools import addNewElementForAllActions, count_nonzero
+from rlpy.Tools import SparseTrace
 import numpy as np
 
 __copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
@@ -24,22 +23,34 @@ class TDControlAgent(DescentAlgorithm, Agent):
     It is the parent of SARSA and Q-Learning
 
     All children must implement the _future_action function.
+
+    All updates work on the active features of the representation (see
+    :py:meth:`~rlpy.Representations.Representation.Representation.phi_active`)
+    and on a :py:class:`~rlpy.Tools.SparseTrace.SparseTrace`, so the cost of
+    a step is proportional to the support of the eligibility trace and not
+    to ``features_num * actions_num``.
     """
 
     lambda_ = 0        #: lambda Parameter in SARSA [Sutton Book 1998]
     eligibility_trace = []  #: eligibility trace
 
-    def __init__(self, policy, representation, discount_factor, lambda_=0, **kwargs):
-        self.eligibility_trace = np.zeros(
-            representation.features_num *
-            representation.actions_num)
+    def __init__(self, policy, representation, discount_factor, lambda_=0,
+                 trace_threshold=1e-5, **kwargs):
+        """
+        :param lambda_: the lambda parameter of the eligibility traces
+        :param trace_threshold: entries of the eligibility trace smaller
+            than this threshold are dropped.
+        """
+        self.eligibility_trace = SparseTrace(threshold=trace_threshold)
+        self._trace_features_num = representation.features_num
         self.lambda_ = lambda_
         super(
             TDControlAgent,
             self).__init__(policy=policy,
             representation=representation, discount_factor=discount_factor, **kwargs)
 
-    def _future_action(self, ns, terminal, np_actions, ns_phi, na):
+    def _future_action(self, ns, terminal, np_actions, ns_phi, na,
+                       ns_active=None):
         """needs to be implemented by children"""
         pass
 
@@ -51,60 +62,65 @@ class TDControlAgent(DescentAlgorithm, Agent):
         self.representation.pre_discover(s, prevStateTerminal, a, ns, terminal)
         discount_factor = self.discount_factor
         weight_vec = self.representation.weight_vec
-        phi_s = self.representation.phi(s, prevStateTerminal)
-        phi = self.representation.phi_sa(s, prevStateTerminal, a, phi_s)
-        phi_prime_s = self.representation.phi(ns, terminal)
+        features_num = self.representation.features_num
+        # phi_sa is never built explicitly: the active features of (s,a) are
+        # the active features of s shifted into the block of action a.
+        ind_s, val_s = self.representation.phi_active(s, prevStateTerminal)
+        active_prime = self.representation.phi_active(ns, terminal)
         na = self._future_action(
             ns,
             terminal,
             np_actions,
-            phi_prime_s,
-            na)  # here comes the difference between SARSA and Q-Learning
-        phi_prime = self.representation.phi_sa(
-            ns,
-            terminal,
+            None,
             na,
-            phi_prime_s)
-        nnz = count_nonzero(phi_s)    # Number of non-zero elements
+            ns_active=active_prime)  # here comes the difference between SARSA and Q-Learning
+        ind_ns, val_ns = active_prime
+        ind = ind_s + a * features_num
+        ind_prime = ind_ns + na * features_num
+        nnz = len(ind_s)    # Number of non-zero elements
 
         # Set eligibility traces:
+        trace = self.eligibility_trace
         if self.lambda_:
-            expanded = old_div((- len(self.eligibility_trace) + len(phi)), \
-                self.representation.actions_num)
-            if expanded > 0:
-                # Correct the size of eligibility traces (pad with zeros for
-                # new features)
-                self.eligibility_trace = addNewElementForAllActions(
-                    self.eligibility_trace,
-                    self.representation.actions_num,
-                    np.zeros((self.representation.actions_num,
-                              expanded)))
-
-            self.eligibility_trace *= discount_factor * self.lambda_
-            self.eligibility_trace += phi
-
-            # Set max to 1
-            self.eligibility_trace[self.eligibility_trace > 1] = 1
+            if features_num != self._trace_features_num:
+                # Correct the indices of the eligibility traces for the new
+                # features
+                trace.expandFeatures(self._trace_features_num, features_num)
+            trace.decay(discount_factor * self.lambda_)
+            trace.add(ind, val_s)  # entries are clipped to 1
         else:
-            self.eligibility_trace = phi
+            trace.assign(ind, val_s)
+        self._trace_features_num = features_num
 
-        td_error = r + np.dot(discount_factor * phi_prime - phi, weight_vec)
+        td_error = r + discount_factor * np.dot(weight_vec[ind_prime], val_ns) \
+            - np.dot(weight_vec[ind], val_s)
         if nnz > 0:
+            trace_ind, trace_val = trace.indices, trace.values()
+            # phi and phi_prime restricted to the support of the trace,
+            # which is all updateLearnRate needs
             self.updateLearnRate(
-                phi,
-                phi_prime,
-                self.eligibility_trace,
+                trace.align(ind, val_s),
+                trace.align(ind_prime, val_ns),
+                trace_val,
                 discount_factor,
                 nnz,
                 terminal)
-            weight_vec_old = weight_vec.copy()
-            weight_vec               += self.learn_rate * \
-                self.representation.featureLearningRate() * \
-                td_error * self.eligibility_trace
-            if not np.all(np.isfinite(weight_vec)):
-                weight_vec = weight_vec_old
+            feature_learn_rate = self.representation.featureLearningRate()
+            if np.ndim(feature_learn_rate):
+                feature_learn_rate = feature_learn_rate[trace_ind]
+            weight_vec_old = weight_vec[trace_ind]
+            weight_vec[trace_ind] += self.learn_rate * feature_learn_rate * \
+                td_error * trace_val
+            if not np.all(np.isfinite(weight_vec[trace_ind])):
+                weight_vec[trace_ind] = weight_vec_old
                 print("WARNING: TD-Learning diverged, weight_vec reached infinity!")
+
         # Discover features if the representation has the discover method
+        if self.representation.isDynamic:
+            phi_s = np.zeros(features_num)
+            phi_s[ind_s] = val_s
+        else:
+            phi_s = None
         expanded = self.representation.post_discover(
             s,
             prevStateTerminal,
@@ -123,9 +139,11 @@ class Q_Learning(TDControlAgent):
     The off-policy variant known as Q-Learning
     """
 
-    def _future_action(self, ns, terminal, np_actions, ns_phi, na):
+    def _future_action(self, ns, terminal, np_actions, ns_phi, na,
+                       ns_active=None):
         """Q Learning chooses the optimal action"""
-        return self.representation.bestAction(ns, terminal, np_actions, ns_phi)
+        return self.representation.bestAction(ns, terminal, np_actions, ns_phi,
+                                              ns_active)
 
 
 class SARSA(TDControlAgent):
@@ -134,6 +152,7 @@ class SARSA(TDControlAgent):
     The on-policy variant known as SARSA.
     """
 
-    def _future_action(self, ns, terminal, np_actions, ns_phi, na):
+    def _future_action(self, ns, terminal, np_actions, ns_phi, na,
+                       ns_active=None):
         """SARS-->A<--, so SARSA simply chooses the action the agent will follow"""
         return na
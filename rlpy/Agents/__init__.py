@@ -4,10 +4,15 @@ from __future__ import division
 from __future__ import absolute_import
 from future import standard_library
 standard_library.install_aliases()
-from .TDControlAgent import Q_Learning, SARSA
-# for compatibility of old scripts
-Q_LEARNING = Q_Learning
-from .Greedy_GQ import Greedy_GQ
-from .LSPI import LSPI
-from .LSPI_SARSA import LSPI_SARSA
-from .NaturalActorCritic import NaturalActorCritic
+from rlpy.Tools.GeneralTools import lazyPackage
+
+# each agent is imported when it is first used
+lazyPackage(__name__, {
+    "Q_Learning": ".TDControlAgent",
+    "SARSA": ".TDControlAgent",
+    "Greedy_GQ": ".Greedy_GQ",
+    "LSPI": ".LSPI",
+    "LSPI_SARSA": ".LSPI_SARSA",
+    "NaturalActorCritic": ".NaturalActorCritic",
+    # for compatibility of old scripts
+    "Q_LEARNING": ".TDControlAgent:Q_Learning"})
@@ -7,10 +7,9 @@ from future import standard_library
 standard_library.install_aliases()
 from builtins import range
 from past.utils import old_div
-from rlpy.Tools import wrap, bound, lines, fromAtoB, rk4
+from rlpy.Tools import wrap, wrap_vec, bound, lines, fromAtoB, rk4, plt
 from .Domain import Domain
 import numpy as np
-import matplotlib.pyplot as plt
 
 __copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
 __credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
@@ -135,6 +134,54 @@ class Acrobot(Domain):
         reward = -1. if not terminal else 0.
         return reward, ns, terminal, self.possibleActions()
 
+    def step_batch(self, states, actions, random_state=None):
+        """
+        Vectorized version of :py:meth:`step` for a batch of states. The
+        internal ``self.state`` is not modified.
+
+        :param states: the current states, one per row.
+        :param actions: the action taken in each state.
+        :param random_state: (optional) random number generator used for
+            the noise, defaults to ``self.random_state``.
+
+        :return: The tuple (r, ns, t, p_actions) with one entry (row) per
+            state, where ``p_actions`` is the boolean mask of the actions
+            possible in each next state.
+
+        """
+        if random_state is None:
+            random_state = self.random_state
+        states = np.asarray(states, dtype=float)
+        n = len(states)
+        torque = np.asarray(self.AVAIL_TORQUE)[actions]
+
+        # Add noise to the force action
+        if self.torque_noise_max > 0:
+            torque = torque + random_state.uniform(
+                -self.torque_noise_max, self.torque_noise_max, size=n)
+
+        # one column per state, augmented with the torque
+        s_augmented = np.vstack((states.T, torque))
+        ns = self._integrate_batch(s_augmented).T
+        terminal = -np.cos(ns[:, 0]) - np.cos(ns[:, 1] + ns[:, 0]) > 1.
+        reward = np.where(terminal, 0., -1.)
+        return reward, ns, terminal, np.ones((n, self.actions_num), dtype=bool)
+
+    def _integrate_batch(self, s_augmented):
+        """
+        Integrates the dynamics of the augmented states (one per column)
+        over one time step as in :py:meth:`step`.
+
+        :return: the next states, one per column.
+        """
+        ns = rk4(self._dsdt, s_augmented, [0, self.dt])
+        ns = ns[-1][:4]  # omit action
+        ns[0] = wrap_vec(ns[0], -np.pi, np.pi)
+        ns[1] = wrap_vec(ns[1], -np.pi, np.pi)
+        ns[2] = np.clip(ns[2], -self.MAX_VEL_1, self.MAX_VEL_1)
+        ns[3] = np.clip(ns[3], -self.MAX_VEL_2, self.MAX_VEL_2)
+        return ns
+
     def _dsdt(self, s_augmented, t):
         m1 = self.LINK_MASS_1
         m2 = self.LINK_MASS_2
@@ -167,7 +214,7 @@ class Acrobot(Domain):
             # book
             ddtheta2 = old_div((a + d2 / d1 * phi1 - m2 * l1 * lc2 * dtheta1 ** 2 * np.sin(theta2) - phi2), (m2 * lc2 ** 2 + I2 - old_div(d2 ** 2, d1)))
         ddtheta1 = old_div(-(d2 * ddtheta2 + phi1), d1)
-        return (dtheta1, dtheta2, ddtheta1, ddtheta2, 0.)
+        return (dtheta1, dtheta2, ddtheta1, ddtheta2, np.zeros_like(dtheta1))
 
     def showDomain(self, a=0):
         """
@@ -304,3 +351,20 @@ class AcrobotLegacy(Acrobot):
         terminal = self.isTerminal()
         reward = -1. if not terminal else 0.
         return reward, ns, terminal, self.possibleActions()
+
+    def _integrate_batch(self, s_augmented):
+        s_augmented = s_augmented.copy()
+        for i in range(4):
+            s_dot = np.array(self._dsdt(s_augmented, 0))
+            s_augmented += s_dot * self.dt / 4.
+            s_augmented[0] = wrap_vec(s_augmented[0], -np.pi, np.pi)
+            s_augmented[1] = wrap_vec(s_augmented[1], -np.pi, np.pi)
+            s_augmented[2] = np.clip(
+                s_augmented[2],
+                -self.MAX_VEL_1,
+                self.MAX_VEL_1)
+            s_augmented[3] = np.clip(
+                s_augmented[3],
+                -self.MAX_VEL_2,
+                self.MAX_VEL_2)
+        return s_augmented[:4]  # omit action
@@ -139,7 +139,7 @@ class BlocksWorld(Domain):
         # move block A on top of B
         [A, B] = id2vec(a, [self.blocks, self.blocks])
         # print 'taking action %d->%d' % (A,B)
-        if not self.validAction(s, A, B):
+        if not self._validActions(s)[a]:
             print('State:%s, Invalid move from %d to %d' % (str(s), A, B))
             print(self.possibleActions())
             print(id2vec(self.possibleActions(), [self.blocks, self.blocks]))
@@ -158,8 +158,16 @@ class BlocksWorld(Domain):
         self.state = np.arange(self.blocks)
         return self.state.copy(), self.isTerminal(), self.possibleActions()
 
-    def possibleActions(self):
-        s = self.state
+    def possibleActions(self, s=None):
+        if s is None:
+            s = self.state
+        return self._memoized("possibleActions", self._stateID(s),
+                              lambda: self._possibleActions(s))
+
+    def _possibleActions(self, s):
+        """
+        Computes the entry of :py:meth:`possibleActions` for state *s*.
+        """
         # return the id of possible actions
         # find empty blocks (nothing on top)
         empty_blocks = [b for b in range(self.blocks) if self.clear(b, s)]
@@ -168,7 +176,22 @@ class BlocksWorld(Domain):
             a,
             b) or not self.on_table(a,
                                     s)]  # condition means if A sits on the table you can not pick it and put it on the table
-        return np.array([vec2id(x, [self.blocks, self.blocks]) for x in actions])
+        actions = np.array([vec2id(x, [self.blocks, self.blocks]) for x in actions])
+        actions.setflags(write=False)
+        return actions
+
+    def _validActions(self, s):
+        """
+        :return: read-only boolean array, True for the actions which are
+            valid moves (see :py:meth:`validAction`) in state *s*.
+        """
+        def validActions():
+            valid = np.array([self.validAction(s, A, B)
+                              for B in range(self.blocks)
+                              for A in range(self.blocks)], dtype=bool)
+            valid.setflags(write=False)
+            return valid
+        return self._memoized("validActions", self._stateID(s), validActions)
 
     def validAction(self, s, A, B):
         # Returns true if B and A are both empty.
@@ -177,8 +200,10 @@ class BlocksWorld(Domain):
              and (self.destination_is_table(A, B) or self.clear(B, s)))
         )
 
-    def isTerminal(self):
-        return np.array_equal(self.state, self.GOAL_STATE)
+    def isTerminal(self, s=None):
+        if s is None:
+            s = self.state
+        return np.array_equal(s, self.GOAL_STATE)
 
     def top(self, A, s):
         # returns the block on top of block A. Return [] if nothing is on top
@@ -228,6 +253,7 @@ class BlocksWorld(Domain):
         #  r: k-by-1    rewards
         # ns: k-by-|s|  next state
         #  t: k-by-1    terminal values
+        # pa: k-by-??   possible actions for each next state
         [A, B] = id2vec(a, [self.blocks, self.blocks])
         # Nominal Move:
         ns1 = s.copy()
@@ -239,7 +265,8 @@ class BlocksWorld(Domain):
             r = np.array([r1]).reshape((1, -1))
             ns = np.array([ns1]).reshape((1, -1))
             t = np.array([terminal1]).reshape((1, -1))
-            return p, r, ns, t
+            pa = [self.possibleActions(ns1)]
+            return p, r, ns, t, pa
         else:
             # consider dropping the block
             ns2 = s.copy()
@@ -250,4 +277,5 @@ class BlocksWorld(Domain):
             r = np.array([r1, r2]).reshape((2, 1))
             ns = np.array([[ns1], [ns2]]).reshape((2, -1))
             t = np.array([terminal1, terminal2]).reshape((2, -1))
-            return p, r, ns, t
+            pa = [self.possibleActions(ns1), self.possibleActions(ns2)]
+            return p, r, ns, t, pa
@@ -13,7 +13,7 @@ from past.utils import old_div
 from .Domain import Domain
 import numpy as np
 import scipy.integrate
-from rlpy.Tools import pl, mpatches, mpath, fromAtoB, lines, rk4, wrap, bound, colors
+from rlpy.Tools import pl, mpatches, mpath, fromAtoB, lines, rk4, wrap, wrap_vec, bound, colors
 from abc import ABCMeta, abstractproperty
 from future.utils import with_metaclass
 
@@ -224,6 +224,21 @@ class CartPoleBase(with_metaclass(ABCMeta, Domain)):
         """
         raise NotImplementedError
 
+    def _getRewardBatch(self, a, S):
+        """
+        Vectorized version of :py:meth:`_getReward` for the actions *a* and
+        the states *S* (one per row).
+
+        """
+        raise NotImplementedError
+
+    def _isTerminalBatch(self, S):
+        """
+        Vectorized version of ``isTerminal`` for the states *S* (one per row).
+
+        """
+        raise NotImplementedError
+
     def showDomain(self, a=0):
         raise NotImplementedError
 
@@ -313,6 +328,56 @@ class CartPoleBase(with_metaclass(ABCMeta, Domain)):
 
         return ns
 
+    def _stepFourStateBatch(self, S, actions, random_state):
+        """
+        Vectorized version of :py:meth:`_stepFourState`.
+
+        :param S: the four-dimensional cartpole states, one per row.
+        :param actions: the action taken in each state.
+        :param random_state: random number generator used for the noise.
+
+        :return: the next states, one per row.
+        """
+        n = len(S)
+        forceAction = np.asarray(self.AVAIL_FORCE, dtype=float)[actions]
+
+        # Add noise to the force action
+        if self.force_noise_max > 0:
+            forceAction = forceAction + random_state.uniform(
+                -self.force_noise_max, self.force_noise_max, size=n)
+
+        # one column per state, augmented with the force action
+        s_augmented = np.vstack((np.asarray(S, dtype=float).T, forceAction))
+        if self.int_type == "euler":
+            ns = self.euler_int(self._dsdt, s_augmented, [0, self.dt])[-1]
+        elif self.int_type == "odeint":
+            # odeint only integrates a single system at a time
+            ns = np.column_stack(
+                [scipy.integrate.odeint(self._dsdt, s_aug, [0, self.dt])[-1]
+                 for s_aug in s_augmented.T])
+        else:
+            ns = rk4(self._dsdt, s_augmented, [0, self.dt])[-1]
+
+        ns = ns[0:4]  # [theta, thetadot, x, xDot]
+        theta = wrap_vec(ns[StateIndex.THETA], -np.pi, np.pi)
+        ns[StateIndex.THETA] = np.clip(
+            theta,
+            self.ANGLE_LIMITS[0],
+            self.ANGLE_LIMITS[1])
+        ns[StateIndex.THETA_DOT] = np.clip(
+            ns[StateIndex.THETA_DOT],
+            self.ANGULAR_RATE_LIMITS[0],
+            self.ANGULAR_RATE_LIMITS[1])
+        ns[StateIndex.X] = np.clip(
+            ns[StateIndex.X],
+            self.POSITION_LIMITS[0],
+            self.POSITION_LIMITS[1])
+        ns[StateIndex.X_DOT] = np.clip(
+            ns[StateIndex.X_DOT],
+            self.VELOCITY_LIMITS[0],
+            self.VELOCITY_LIMITS[1])
+        return ns.T
+
     def _dsdt(self, s_augmented, t):
         """
         This function is needed for ode integration.  It calculates and returns the
@@ -367,7 +432,7 @@ class CartPoleBase(with_metaclass(ABCMeta, Domain)):
         xDotDot = term1 - m_pendAlphaTimesL * thetaDotDot * cosTheta
         return (
             # final cell corresponds to action passed in
-            np.array((thetaDot, thetaDotDot, xDot, xDotDot, 0))
+            np.array((thetaDot, thetaDotDot, xDot, xDotDot, np.zeros_like(thetaDot)))
         )
 
     def _plot_policy(self, piMat):
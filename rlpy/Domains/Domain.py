@@ -10,6 +10,7 @@ from builtins import range
 from builtins import object
 import numpy as np
 import logging
+from rlpy.Tools import hasFunction
 from copy import deepcopy
 
 __copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
@@ -79,6 +80,12 @@ class Domain(object):
     logger = None
     # A seeded numpy random number generator
     random_state = None
+    # Lookup tables memoized per state, see _memoized
+    _tables = None
+    # Strides mapping a discrete state to its ID, see _stateID
+    _id_strides = None
+    # Read-only array of all actions returned by possibleActions
+    _all_actions = None
 
     def __init__(self):
         self.logger = logging.getLogger("rlpy.Domains." + self.__class__.__name__)
@@ -195,7 +202,11 @@ Gamma:      {self.discount_factor}
             integers and multidimensional quantities.
 
         """
-        return np.arange(self.actions_num)
+        if (self._all_actions is None or
+                len(self._all_actions) != self.actions_num):
+            self._all_actions = np.arange(self.actions_num)
+            self._all_actions.setflags(write=False)
+        return self._all_actions
 
     # TODO: change 'a' to be 'aID' to make it clearer when we refer to
     # actions vs. integer IDs of actions?  They aren't always interchangeable.
@@ -276,7 +287,47 @@ Gamma:      {self.discount_factor}
                 self.statespace_limits[d, 0] += -.5
                 self.statespace_limits[d, 1] += +.5
 
-    def sampleStep(self, a, num_samples):
+    def _stateID(self, s):
+        """
+        :param s: a state of a discrete domain.
+
+        :return: the unique integer ID of *s*, numbered like
+            :py:meth:`~rlpy.Tools.GeneralTools.vec2id` with the first
+            dimension changing fastest.
+        """
+        if self._id_strides is None:
+            limits = self.discrete_statespace_limits
+            sizes = limits[:, 1] - limits[:, 0] + 1
+            self._id_strides = np.hstack(([1], np.cumprod(sizes[:-1])))
+            self._id_offset = int(np.dot(limits[:, 0], self._id_strides))
+        return int(np.dot(s, self._id_strides)) - self._id_offset
+
+    def _memoized(self, table, key, compute):
+        """
+        Looks up *key* (usually a :py:meth:`_stateID`) in the lookup table
+        *table*. Discrete domains use these tables to answer
+        :py:meth:`possibleActions`, :py:meth:`step` and ``expectedStep``
+        without recomputing the same quantities for every visit of a state.
+        The tables are filled lazily and shared by all copies of the domain,
+        so the entries must not be modified.
+
+        :param table: name of the lookup table.
+        :param key: hashable key of the entry.
+        :param compute: function without arguments computing the entry, only
+            called the first time *key* is looked up.
+
+        :return: the entry of *key*.
+        """
+        if self._tables is None:
+            self._tables = {}
+        entries = self._tables.setdefault(table, {})
+        try:
+            return entries[key]
+        except KeyError:
+            entry = entries[key] = compute()
+            return entry
+
+    def sampleStep(self, s, a, num_samples=None):
         """
         Sample a set number of next states and rewards from the domain.
         This function is used when state transitions are stochastic;
@@ -284,7 +335,10 @@ Gamma:      {self.discount_factor}
         of *num_samples*, since repeatedly sampling a (state,action) pair
         will always yield the same tuple (r,ns,terminal).
         See :py:meth:`~rlpy.Domains.Domain.Domain.step`.
+        Domains implementing ``step_batch`` draw all samples with a single
+        vectorized call. The internal ``self.state`` is not modified.
 
+        :param s: The state to sample the transitions from
         :param a: The action to attempt
         :param num_samples: The number of next states and rewards to be sampled.
 
@@ -292,16 +346,28 @@ Gamma:      {self.discount_factor}
             *S* is an array of next states,
             *A* is an array of rewards for those states.
 
+        .. note::
+
+            ``sampleStep(a, num_samples)`` samples from the current state.
+
         """
+        if num_samples is None:
+            s, a, num_samples = self.state, s, a
+        s = np.asarray(s)
+        if hasFunction(self, "step_batch"):
+            r, ns, _, _ = self.step_batch(
+                np.tile(s, (num_samples, 1)),
+                np.full(num_samples, a, dtype=int))
+            return ns, r
         next_states = []
         rewards = []
-        s = self.state.copy()
+        state = self.state
         for i in range(num_samples):
-            r, ns, terminal = self.step(a)
             self.state = s.copy()
+            r, ns = self.step(a)[:2]
             next_states.append(ns)
             rewards.append(r)
-
+        self.state = state
         return np.array(next_states), np.array(rewards)
 
     def __copy__(self):
@@ -317,6 +383,10 @@ Gamma:      {self.discount_factor}
         for k, v in list(self.__dict__.items()):
             if k is "logger":
                 continue
+            if k == "_tables":
+                # the lookup tables only depend on the domain definition
+                result._tables = v
+                continue
             # This block bandles matplotlib transformNode objects,
                 # which cannot be coped
             try:
@@ -285,9 +285,14 @@ class FiftyChain(Domain):
         if s is None:
             s = self.state
         if self.using_optimal_policy:
-            return np.array([self.optimal_policy[s]])
+            def optimalAction():
+                action = np.array([self.optimal_policy[s]])
+                action.setflags(write=False)
+                return action
+            return self._memoized("optimalAction", self._stateID(s),
+                                  optimalAction)
         else:
-            return np.arange(self.actions_num)
+            return super(FiftyChain, self).possibleActions(s)
 
     def L_inf_distance_to_V_star(self, representation):
         """
@@ -123,6 +123,29 @@ class FiniteTrackCartPole(CartPoleBase):
         possibleActions = self.possibleActions()
         return reward, ns, terminal, possibleActions
 
+    def step_batch(self, states, actions, random_state=None):
+        """
+        Vectorized version of :py:meth:`step` for a batch of states. The
+        internal ``self.state`` is not modified.
+
+        :param states: the current states, one per row.
+        :param actions: the action taken in each state.
+        :param random_state: (optional) random number generator used for
+            the noise, defaults to ``self.random_state``.
+
+        :return: The tuple (r, ns, t, p_actions) with one entry (row) per
+            state, where ``p_actions`` is the boolean mask of the actions
+            possible in each next state.
+
+        """
+        if random_state is None:
+            random_state = self.random_state
+        ns = self._stepFourStateBatch(states, actions, random_state)
+        terminal = self._isTerminalBatch(ns)
+        reward = self._getRewardBatch(actions, ns)
+        return (reward, ns, terminal,
+                np.ones((len(ns), self.actions_num), dtype=bool))
+
     def s0(self):
         # defined by children
         raise NotImplementedError
@@ -230,6 +253,14 @@ class FiniteCartPoleBalance(FiniteTrackCartPole):
         return (not (old_div(-pi, 15) < s[StateIndex.THETA] < old_div(pi, 15)) or
                 not (-2.4 < s[StateIndex.X] < 2.4))
 
+    def _getRewardBatch(self, a, S):
+        theta = S[:, StateIndex.THETA]
+        goal = (old_div(-pi, 15) < theta) & (theta < old_div(pi, 15))
+        return np.where(goal, self.GOAL_REWARD, 0).astype(float)
+
+    def _isTerminalBatch(self, S):
+        return _balanceFailed(S)
+
 
 class FiniteCartPoleBalanceOriginal(FiniteTrackCartPole):
 
@@ -267,6 +298,12 @@ class FiniteCartPoleBalanceOriginal(FiniteTrackCartPole):
         return (not (old_div(-np.pi, 15) < s[StateIndex.THETA] < old_div(np.pi, 15)) or
                 not (-2.4 < s[StateIndex.X] < 2.4))
 
+    def _getRewardBatch(self, a, S):
+        return np.where(self._isTerminalBatch(S), -1., self.good_reward)
+
+    def _isTerminalBatch(self, S):
+        return _balanceFailed(S)
+
 
 class FiniteCartPoleBalanceModern(FiniteTrackCartPole):
 
@@ -304,6 +341,12 @@ class FiniteCartPoleBalanceModern(FiniteTrackCartPole):
         return (not (old_div(-np.pi, 15) < s[StateIndex.THETA] < old_div(np.pi, 15)) or
                 not (-2.4 < s[StateIndex.X] < 2.4))
 
+    def _getRewardBatch(self, a, S):
+        return np.where(self._isTerminalBatch(S), -1., 0.)
+
+    def _isTerminalBatch(self, S):
+        return _balanceFailed(S)
+
 
 class FiniteCartPoleSwingUp(FiniteTrackCartPole):
 
@@ -350,6 +393,15 @@ class FiniteCartPoleSwingUp(FiniteTrackCartPole):
             s = self.state
         return not (-2.4 < s[StateIndex.X] < 2.4)
 
+    def _getRewardBatch(self, a, S):
+        theta = S[:, StateIndex.THETA]
+        goal = (old_div(-pi, 6) < theta) & (theta < old_div(pi, 6))
+        return np.where(goal, self.GOAL_REWARD, 0).astype(float)
+
+    def _isTerminalBatch(self, S):
+        x = S[:, StateIndex.X]
+        return ~((-2.4 < x) & (x < 2.4))
+
 
 class FiniteCartPoleSwingUpFriction(FiniteCartPoleSwingUp):
 
@@ -400,8 +452,19 @@ class FiniteCartPoleSwingUpFriction(FiniteCartPoleSwingUp):
         #diff[1] *= 1.5
         return np.exp(-.5 * sum(diff ** 2) * self.A) - .5
 
+    def _getRewardBatch(self, a, S):
+        x = S[:, StateIndex.X]
+        theta = S[:, StateIndex.THETA]
+        diff_x = x + self.LENGTH * np.sin(theta)
+        diff_y = self.LENGTH * np.cos(theta) - self.LENGTH
+        reward = np.exp(-.5 * (diff_x ** 2 + diff_y ** 2) * self.A) - .5
+        outside = ~((self.POSITION_LIMITS[0] < x) & (x < self.POSITION_LIMITS[1]))
+        reward[outside] = -30
+        return reward
+
     def _dsdt(self, s_aug, t):
-        s = np.zeros((4))
+        # s_aug may also hold one augmented state per column
+        s = np.zeros((4,) + np.shape(s_aug)[1:])
         s[0] = s_aug[StateIndex.X]
         s[1] = s_aug[StateIndex.X_DOT]
         s[3] = pi - s_aug[StateIndex.THETA]
@@ -431,9 +494,22 @@ class FiniteCartPoleSwingUpFriction(FiniteCartPoleSwingUp):
         s3 = np.sin(s[3])
         c3 = np.cos(s[3])
         g = self.ACCEL_G
-        ds = np.zeros(4)
+        ds = np.zeros_like(s)
         ds[0] = s[1]
         ds[1] = old_div((2 * m * l * s[2] ** 2 * s3 + 3 * m * g * s3 * c3 + 4 * a - 4 * b * s[1]), (4 * (M + m) - 3 * m * c3 ** 2))
         ds[2] = old_div((-3 * m * l * s[2] ** 2 * s3 * c3 - 6 * (M + m) * g * s3 - 6 * (a - b * s[1]) * c3), (4 * l * (m + M) - 3 * m * l * c3 ** 2))
         ds[3] = s[2]
         return ds
+
+
+def _balanceFailed(S):
+    """
+    Vectorized failure condition of the finite track balancing tasks: the
+    pendulum leaves [-pi/15, pi/15] or the cart leaves [-2.4, 2.4].
+
+    :param S: the states, one per row.
+    """
+    theta = S[:, StateIndex.THETA]
+    x = S[:, StateIndex.X]
+    return (~((old_div(-np.pi, 15) < theta) & (theta < old_div(np.pi, 15))) |
+            ~((-2.4 < x) & (x < 2.4)))
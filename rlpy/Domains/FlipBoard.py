@@ -91,25 +91,31 @@ class FlipBoard(Domain):
         # raw_input()
 
     def step(self, a):
-        ns = self.state.copy()
-        ns = np.reshape(ns, (self.BOARD_SIZE, -1))
-        a_row, a_col = id2vec(a, [self.BOARD_SIZE, self.BOARD_SIZE])
-        # print a_row, a_col
-        # print ns
-        ns[a_row, :] = np.logical_not(ns[a_row,:])
-        ns[:, a_col] = np.logical_not(ns[:, a_col])
-        ns[a_row, a_col] = not ns[a_row, a_col]
+        ns = np.logical_xor(self.state, self._flips(a))
         if self.isTerminal():
             terminal = True
             r = 0
         else:
             terminal = False
             r = self.STEP_REWARD
-        # sleep(1)
-        ns = ns.flatten()
         self.state = ns.copy()
         return r, ns, terminal, self.possibleActions()
 
+    def _flips(self, a):
+        """
+        :return: read-only boolean mask of the cells flipped by action *a*,
+            i.e. the row and the column of the selected cell.
+        """
+        def flips():
+            mask = np.zeros((self.BOARD_SIZE, self.BOARD_SIZE), dtype=bool)
+            a_row, a_col = id2vec(a, [self.BOARD_SIZE, self.BOARD_SIZE])
+            mask[a_row, :] = True
+            mask[:, a_col] = True
+            mask = mask.flatten()
+            mask.setflags(write=False)
+            return mask
+        return self._memoized("flips", a, flips)
+
     def s0(self):
         self.state = np.array([[1, 0, 0, 0],
                                [0, 0, 0, 0],
@@ -311,22 +311,13 @@ class GridWorld(Domain):
 
     def step(self, a):
         r = self.STEP_REWARD
-        ns = self.state.copy()
         if self.random_state.random_sample() < self.NOISE:
             # Random Move
             a = self.random_state.choice(self.possibleActions())
 
-        # Take action
-        ns = self.state + self.ACTIONS[a]
-
-        # Check bounds on state values
-        if (ns[0] < 0 or ns[0] == self.ROWS or
-                ns[1] < 0 or ns[1] == self.COLS or
-                self.map[ns[0], ns[1]] == self.BLOCKED):
-            ns = self.state.copy()
-        else:
-            # If in bounds, update the current state
-            self.state = ns.copy()
+        # Take action, unless it leads out of bounds or into a blocked cell
+        ns = self._successors(self.state)[a].copy()
+        self.state = ns.copy()
 
         # Compute the reward
         if self.map[ns[0], ns[1]] == self.GOAL:
@@ -337,6 +328,74 @@ class GridWorld(Domain):
         terminal = self.isTerminal()
         return r, ns, terminal, self.possibleActions()
 
+    def step_batch(self, states, actions, random_state=None):
+        """
+        Vectorized version of :py:meth:`step` for a batch of states. The
+        internal ``self.state`` is not modified.
+
+        :param states: the current states, one per row.
+        :param actions: the action taken in each state.
+        :param random_state: (optional) random number generator used for
+            the noise, defaults to ``self.random_state``.
+
+        :return: The tuple (r, ns, t, p_actions) with one entry (row) per
+            state, where ``p_actions`` is the boolean mask of the actions
+            possible in each next state.
+
+        """
+        if random_state is None:
+            random_state = self.random_state
+        states = np.asarray(states, dtype=int)
+        actions = np.array(actions, dtype=int)
+        n = len(states)
+        noisy = random_state.random_sample(n) < self.NOISE
+        if noisy.any():
+            # Random Move among the possible actions
+            mask = self._possibleActionsMask(states[noisy])
+            k = (random_state.random_sample(noisy.sum())
+                 * mask.sum(axis=1)).astype(int)
+            actions[noisy] = np.argmax(
+                np.cumsum(mask, axis=1) > k[:, None], axis=1)
+
+        # Take action, unless it leads out of bounds or into a blocked cell
+        ns = states + self.ACTIONS[actions]
+        blocked = ~self._isFree(ns)
+        ns[blocked] = states[blocked]
+
+        cells = self.map[ns[:, 0], ns[:, 1]]
+        r = np.full(n, self.STEP_REWARD, dtype=float)
+        r[cells == self.GOAL] = self.GOAL_REWARD
+        r[cells == self.PIT] = self.PIT_REWARD
+        terminal = (cells == self.GOAL) | (cells == self.PIT)
+        return r, ns, terminal, self._possibleActionsMask(ns)
+
+    def _isFree(self, S):
+        """
+        :param S: integer array of cells with the row and column in the
+            last dimension.
+
+        :return: boolean array, True for the cells inside the map that are
+            not blocked.
+        """
+        inside = ((S[..., 0] >= 0) & (S[..., 0] < self.ROWS) &
+                  (S[..., 1] >= 0) & (S[..., 1] < self.COLS))
+        free = inside.copy()
+        free[inside] = self.map[S[..., 0][inside],
+                                S[..., 1][inside]] != self.BLOCKED
+        return free
+
+    def _possibleActionsMask(self, S):
+        """
+        Vectorized version of :py:meth:`possibleActions`.
+
+        :param S: the states, one per row.
+
+        :return: a boolean array with one row per state, True for the
+            possible actions.
+        """
+        S = np.asarray(S, dtype=int)
+        return self._isFree(S[:, None, :] + self.ACTIONS[None, :, :])
+
     def s0(self):
         self.state = self.start_state.copy()
         return self.state, self.isTerminal(), self.possibleActions()
@@ -353,17 +412,33 @@ class GridWorld(Domain):
     def possibleActions(self, s=None):
         if s is None:
             s = self.state
-        possibleA = np.array([], np.uint8)
-        for a in range(self.actions_num):
-            ns = s + self.ACTIONS[a]
-            if (
-                    ns[0] < 0 or ns[0] == self.ROWS or
-                    ns[1] < 0 or ns[1] == self.COLS or
-                    self.map[int(ns[0]), int(ns[1])] == self.BLOCKED):
-                continue
-            possibleA = np.append(possibleA, [a])
+        return self._memoized("possibleActions", self._stateID(s),
+                              lambda: self._possibleActions(s))
+
+    def _possibleActions(self, s):
+        """
+        Computes the entry of :py:meth:`possibleActions` for state *s*.
+        """
+        possibleA = np.flatnonzero(self._possibleActionsMask([s])[0])
+        if len(possibleA) == 0:
+            possibleA = np.array([], np.uint8)
+        possibleA.setflags(write=False)
         return possibleA
 
+    def _successors(self, s):
+        """
+        :return: read-only array with the deterministic next state of each
+            action in state *s*, one per row. Actions leading out of bounds
+            or into a blocked cell keep the agent in *s*.
+        """
+        def successors():
+            ns = np.asarray(s, dtype=int) + self.ACTIONS
+            blocked = ~self._isFree(ns)
+            ns[blocked] = s
+            ns.setflags(write=False)
+            return ns
+        return self._memoized("successors", self._stateID(s), successors)
+
     def expectedStep(self, s, a):
         # Returns k possible outcomes
         #  p: k-by-1    probability of each transition
@@ -377,6 +452,17 @@ class GridWorld(Domain):
         intended_action_index = findElemArray1D(a, actions)
         p = np.ones((k, 1)) * self.NOISE / (k * 1.)
         p[intended_action_index, 0] += 1 - self.NOISE
+        r, ns, t, pa = self._memoized("outcomes", self._stateID(s),
+                                      lambda: self._outcomes(s, actions))
+        return p, r, ns, t, pa
+
+    def _outcomes(self, s, actions):
+        """
+        Computes the outcomes of :py:meth:`expectedStep` which do not depend
+        on the action: the rewards, next states, terminal values and possible
+        actions of the next states reached by the possible *actions* in *s*.
+        """
+        k = len(actions)
         # Make next states
         ns = np.tile(s, (k, 1)).astype(int)
         actions = self.ACTIONS[actions]
@@ -393,7 +479,9 @@ class GridWorld(Domain):
         t = np.zeros((k, 1), bool)
         t[goal] = True
         t[pit] = True
-        return p, r, ns, t, pa
+        for x in (r, ns, t, pa):
+            x.setflags(write=False)
+        return r, ns, t, pa
 
     def allStates(self):
         if self.continuous_dims == []:
@@ -8,7 +8,6 @@ standard_library.install_aliases()
 from builtins import range
 from .Domain import Domain
 import numpy as np
-from scipy.integrate import odeint
 from rlpy.Tools import plt
 
 __copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
@@ -75,8 +74,7 @@ class HIVTreatment(Domain):
         #    s = np.power(10, s)
 
         eps1, eps2 = self.actions[a]
-        ns = odeint(dsdt, self.state, [0, self.dt],
-                    args=(eps1, eps2), mxstep=1000)[-1]
+        ns = integrate(self.state, eps1, eps2, self.dt)
         T1, T2, T1s, T2s, V, E = ns
         # the reward function penalizes treatment because of side-effects
         reward = - 0.1 * V - 2e4 * eps1 ** 2 - 2e3 * eps2 ** 2 + 1e3 * E
@@ -88,6 +86,35 @@ class HIVTreatment(Domain):
         self.episode_data[-1, self.t - 1] = a
         return reward, ns, False, self.possibleActions()
 
+    def step_batch(self, states, actions, random_state=None):
+        """
+        Vectorized version of :py:meth:`step` for a batch of patients. The
+        internal ``self.state`` and the episode data are not modified.
+
+        :param states: the current (observed) states, one per row.
+        :param actions: the action taken in each state.
+        :param random_state: (optional) unused, the dynamics are
+            deterministic.
+
+        :return: The tuple (r, ns, t, p_actions) with one entry (row) per
+            state, where ``p_actions`` is the boolean mask of the actions
+            possible in each next state.
+
+        """
+        states = np.asarray(states, dtype=float)
+        if self.logspace:
+            states = np.power(10., states)
+        eps = self.actions[np.asarray(actions, dtype=int)]
+        ns = integrate_batch(states, eps, self.dt)
+        n = len(ns)
+        # the reward function penalizes treatment because of side-effects
+        reward = - 0.1 * ns[:, 4] - 2e4 * eps[:, 0] ** 2 \
+            - 2e3 * eps[:, 1] ** 2 + 1e3 * ns[:, 5]
+        if self.logspace:
+            ns = np.log10(ns)
+        return (reward, ns, np.zeros(n, dtype=bool),
+                np.ones((n, self.actions_num), dtype=bool))
+
     def possibleActions(self):
         return np.arange(4)
 
@@ -185,8 +212,29 @@ def dsdt(s, t, eps1, eps2):
 
     return np.array([dT1, dT2, dT1s, dT2s, dV, dE])
 
+
+def integrate(s, eps1, eps2, dt, rtol=1.49012e-8, atol=1.49012e-8,
+              max_steps=100000):
+    """
+    Integrates the system from the state *s* over *dt* days with the drug
+    efficacies *eps1* and *eps2*.
+    """
+    from scipy.integrate import odeint
+    return odeint(dsdt, s, [0, dt], args=(eps1, eps2), rtol=rtol, atol=atol,
+                  mxstep=max_steps)[-1]
+
+
+def integrate_batch(states, eps, dt, **kwargs):
+    """
+    Batched version of :py:func:`integrate` for the states of many patients
+    (one per row) and their drug efficacies *eps* (n x 2).
+    """
+    return np.array([integrate(s, e[0], e[1], dt, **kwargs)
+                     for s, e in zip(np.atleast_2d(states),
+                                     np.reshape(eps, (-1, 2)))])
+
 try:
-    from .HIVTreatment_dynamics import dsdt
+    from .HIVTreatment_dynamics import dsdt, integrate, integrate_batch
 except Exception as e:
     print(e)
     print("Cython extension for HIVTreatment dynamics not available, expect slow runtime")
@@ -1,10 +1,18 @@
+#cython: boundscheck=False
+#cython: wraparound=False
+#cython: cdivision=True
 # -*- coding: utf-8 -*-
 """
 Dynamics for the HIVTreatment domain
+
+Besides the derivative ``dsdt``, the module integrates the system over a
+time interval entirely in C with an adaptive 4th order Rosenbrock method
+(Shampine's L-stable ROS4) which uses the analytic Jacobian of the system.
+This avoids calling back into Python for every evaluation of the
+derivative as ``scipy.integrate.odeint`` does.
 """
 import numpy as np
-#cython: boundscheck=False
-#cython: cdivision=True
+from libc.math cimport fabs, fmax, fmin, pow
 
 
 __copyright__ = "Copyright 2013, RLPy http://www.acl.mit.edu/RLPy"
@@ -15,47 +23,298 @@ __author__ = "Christoph Dann <cdann@cdann.de>"
 cimport numpy as np
 cimport cython
 
+# model parameter constants
+DEF lambda1 = 1e4
+DEF lambda2 = 31.98
+DEF d1 = 0.01
+DEF d2 = 0.01
+DEF f = .34
+DEF k1 = 8e-7
+DEF k2 = 1e-4
+DEF delta = .7
+DEF m1 = 1e-5
+DEF m2 = 1e-5
+DEF NT = 100.
+DEF c = 13.
+DEF rho1 = 1.
+DEF rho2 = 1.
+DEF lambdaE = 1.
+DEF bE = 0.3
+DEF Kb = 100.
+DEF d_E = 0.25
+DEF Kd = 500.
+DEF deltaE = 0.1
+
+# coefficients of ROS4 (Shampine 1982)
+DEF GAM = 0.5
+DEF A21 = 2.
+DEF A31 = 1.92
+DEF A32 = 0.24
+DEF C21 = -8.
+DEF C31 = 14.88
+DEF C32 = 2.4
+DEF C41 = -0.896
+DEF C42 = -0.432
+DEF C43 = -0.4
+DEF B1 = 19. / 9.
+DEF B2 = 0.5
+DEF B3 = 25. / 108.
+DEF B4 = 125. / 108.
+DEF E1 = 17. / 54.
+DEF E2 = 7. / 36.
+DEF E4 = 125. / 108.
+
+# step size control
+DEF SAFETY = 0.9
+DEF GROW = 1.5
+DEF PGROW = -0.25
+DEF SHRINK = 0.5
+DEF PSHRINK = -1. / 3.
+DEF ERRCON = 0.1296
+
+
+cdef inline void derivs(double* s, double eps1, double eps2,
+                        double* ds) nogil:
+    """ system derivate per time. The unit of time are days. """
+    cdef double T1 = s[0], T2 = s[1], T1s = s[2], T2s = s[3]
+    cdef double V = s[4], E = s[5]
+    cdef double tmp1 = (1. - eps1) * k1 * V * T1
+    cdef double tmp2 = (1. - f * eps1) * k2 * V * T2
+    ds[0] = lambda1 - d1 * T1 - tmp1
+    ds[1] = lambda2 - d2 * T2 - tmp2
+    ds[2] = tmp1 - delta * T1s - m1 * E * T1s
+    ds[3] = tmp2 - delta * T2s - m2 * E * T2s
+    ds[4] = (1. - eps2) * NT * delta * (T1s + T2s) - c * V \
+        - ((1. - eps1) * rho1 * k1 * T1 + (1. - f * eps1) * rho2 * k2 * T2) * V
+    ds[5] = lambdaE + bE * (T1s + T2s) / (T1s + T2s + Kb) * E \
+        - d_E * (T1s + T2s) / (T1s + T2s + Kd) * E - deltaE * E
+
+
+cdef inline void jacobian(double* s, double eps1, double eps2,
+                          double* J) nogil:
+    """ J[6 * i + j] = d ds[i] / d s[j] """
+    cdef double T1 = s[0], T2 = s[1], T1s = s[2], T2s = s[3]
+    cdef double V = s[4], E = s[5]
+    cdef double a1 = (1. - eps1) * k1
+    cdef double a2 = (1. - f * eps1) * k2
+    cdef double I = T1s + T2s
+    cdef double dEdI = bE * Kb / ((I + Kb) * (I + Kb)) * E \
+        - d_E * Kd / ((I + Kd) * (I + Kd)) * E
+    cdef int i
+    for i in range(36):
+        J[i] = 0.
+    J[0] = -d1 - a1 * V
+    J[4] = -a1 * T1
+    J[7] = -d2 - a2 * V
+    J[10] = -a2 * T2
+    J[12] = a1 * V
+    J[14] = -delta - m1 * E
+    J[16] = a1 * T1
+    J[17] = -m1 * T1s
+    J[19] = a2 * V
+    J[21] = -delta - m2 * E
+    J[22] = a2 * T2
+    J[23] = -m2 * T2s
+    J[24] = -a1 * rho1 * V
+    J[25] = -a2 * rho2 * V
+    J[26] = (1. - eps2) * NT * delta
+    J[27] = (1. - eps2) * NT * delta
+    J[28] = -c - (a1 * rho1 * T1 + a2 * rho2 * T2)
+    J[32] = dEdI
+    J[33] = dEdI
+    J[35] = bE * I / (I + Kb) - d_E * I / (I + Kd) - deltaE
+
+
+cdef int lu_factor(double* a, int* piv) nogil:
+    """ in-place LU decomposition of the 6x6 matrix *a* with partial
+    pivoting; returns 1 if *a* is singular """
+    cdef int i, j, k, p
+    cdef double m, tmp
+    for k in range(6):
+        p = k
+        m = fabs(a[6 * k + k])
+        for i in range(k + 1, 6):
+            if fabs(a[6 * i + k]) > m:
+                m = fabs(a[6 * i + k])
+                p = i
+        if m == 0.:
+            return 1
+        piv[k] = p
+        if p != k:
+            for j in range(6):
+                tmp = a[6 * k + j]
+                a[6 * k + j] = a[6 * p + j]
+                a[6 * p + j] = tmp
+        for i in range(k + 1, 6):
+            a[6 * i + k] /= a[6 * k + k]
+            for j in range(k + 1, 6):
+                a[6 * i + j] -= a[6 * i + k] * a[6 * k + j]
+    return 0
+
+
+cdef void lu_solve(double* a, int* piv, double* b) nogil:
+    """ solves a x = b in place with the factorization of lu_factor """
+    cdef int i, j
+    cdef double tmp
+    for i in range(6):
+        if piv[i] != i:
+            tmp = b[i]
+            b[i] = b[piv[i]]
+            b[piv[i]] = tmp
+    for i in range(6):
+        for j in range(i):
+            b[i] -= a[6 * i + j] * b[j]
+    for i in range(5, -1, -1):
+        for j in range(i + 1, 6):
+            b[i] -= a[6 * i + j] * b[j]
+        b[i] /= a[6 * i + i]
+
+
+cdef int c_integrate(double* s, double eps1, double eps2, double dt,
+                     double rtol, double atol, int max_steps) nogil:
+    """
+    integrates the state *s* in place over *dt* days.
+    Returns the number of steps or -1 if the integration failed.
+    """
+    cdef double J[36]
+    cdef double a[36]
+    cdef int piv[6]
+    cdef double ds[6]
+    cdef double ysav[6]
+    cdef double dysav[6]
+    cdef double y[6]
+    cdef double g1[6]
+    cdef double g2[6]
+    cdef double g3[6]
+    cdef double g4[6]
+    cdef double t = 0., h = fmin(dt, 0.01), errmax, err, scale
+    cdef int i, steps = 0
+    cdef bint last
+
+    for i in range(6):
+        ysav[i] = s[i]
+    while t < dt:
+        if steps >= max_steps:
+            return -1
+        last = t + h >= dt
+        if last:
+            h = dt - t
+        derivs(ysav, eps1, eps2, dysav)
+        jacobian(ysav, eps1, eps2, J)
+        while True:
+            # (I / (GAM h) - J) g = f(...) + ...
+            for i in range(36):
+                a[i] = -J[i]
+            for i in range(6):
+                a[7 * i] += 1. / (GAM * h)
+            if lu_factor(a, piv):
+                return -1
+            for i in range(6):
+                g1[i] = dysav[i]
+            lu_solve(a, piv, g1)
+            for i in range(6):
+                y[i] = ysav[i] + A21 * g1[i]
+            derivs(y, eps1, eps2, ds)
+            for i in range(6):
+                g2[i] = ds[i] + C21 * g1[i] / h
+            lu_solve(a, piv, g2)
+            for i in range(6):
+                y[i] = ysav[i] + A31 * g1[i] + A32 * g2[i]
+            derivs(y, eps1, eps2, ds)
+            for i in range(6):
+                g3[i] = ds[i] + (C31 * g1[i] + C32 * g2[i]) / h
+            lu_solve(a, piv, g3)
+            for i in range(6):
+                g4[i] = ds[i] + (C41 * g1[i] + C42 * g2[i] + C43 * g3[i]) / h
+            lu_solve(a, piv, g4)
+            errmax = 0.
+            for i in range(6):
+                y[i] = ysav[i] + B1 * g1[i] + B2 * g2[i] + B3 * g3[i] + \
+                    B4 * g4[i]
+                err = E1 * g1[i] + E2 * g2[i] + E4 * g4[i]
+                scale = atol + rtol * fmax(fabs(ysav[i]), fabs(y[i]))
+                errmax = fmax(errmax, fabs(err) / scale)
+            steps += 1
+            if errmax <= 1.:
+                break
+            # reject the step and retry with a smaller one
+            last = False
+            h = fmax(SAFETY * h * pow(errmax, PSHRINK), SHRINK * h)
+            if steps >= max_steps or t + h == t:
+                return -1
+        t = dt if last else t + h
+        for i in range(6):
+            ysav[i] = y[i]
+        if errmax > ERRCON:
+            h = SAFETY * h * pow(errmax, PGROW)
+        else:
+            h = GROW * h
+    for i in range(6):
+        s[i] = ysav[i]
+    return steps
+
+
+def integrate(s, double eps1, double eps2, double dt, double rtol=1.49012e-8,
+              double atol=1.49012e-8, int max_steps=100000):
+    """
+    Integrates the system from the state *s* over *dt* days with the drug
+    efficacies *eps1* and *eps2*.
+
+    :param rtol: relative tolerance of the local error of each step.
+    :param atol: absolute tolerance of the local error of each step.
+    :param max_steps: maximum number of (accepted and rejected) steps.
+
+    :return: the state after *dt* days.
+    """
+    cdef np.ndarray[np.double_t, ndim=1] ns = np.array(s, dtype=np.double)
+    if c_integrate(&ns[0], eps1, eps2, dt, rtol, atol, max_steps) < 0:
+        raise RuntimeError("Integration of the HIV dynamics failed")
+    return ns
+
+
+def integrate_batch(states, eps, double dt, double rtol=1.49012e-8,
+                    double atol=1.49012e-8, int max_steps=100000):
+    """
+    Batched version of :py:func:`integrate` which integrates the states of
+    many patients, one per row of *states*, each with the drug efficacies
+    in the same row of *eps* (n x 2).
+
+    :return: the states after *dt* days.
+    """
+    cdef np.ndarray[np.double_t, ndim=2] ns = np.array(
+        states, dtype=np.double, order="C", ndmin=2)
+    cdef np.ndarray[np.double_t, ndim=2] e = np.ascontiguousarray(
+        eps, dtype=np.double).reshape(-1, 2)
+    cdef int i, n = ns.shape[0], failed = -1
+    assert ns.shape[1] == 6 and e.shape[0] == n
+    with nogil:
+        for i in range(n):
+            if c_integrate(&ns[i, 0], e[i, 0], e[i, 1], dt, rtol, atol,
+                           max_steps) < 0:
+                failed = i
+                break
+    if failed >= 0:
+        raise RuntimeError("Integration of the HIV dynamics failed for "
+                           "state %d" % failed)
+    return ns
+
+
 def dsdt(np.ndarray[np.double_t, ndim=1] s, double t, double eps1, double eps2):
     """
     system derivate per time. The unit of time are days.
     """
-    # model parameter constants
-    cdef double lambda1 = 1e4
-    cdef double lambda2 = 31.98
-    cdef double d1 = 0.01
-    cdef double d2 = 0.01
-    cdef double f = .34
-    cdef double k1 = 8e-7
-    cdef double k2 = 1e-4
-    cdef double delta = .7
-    cdef double m1 = 1e-5
-    cdef double m2 = 1e-5
-    cdef double NT = 100.
-    cdef double c = 13.
-    cdef double rho1 = 1.
-    cdef double rho2 = 1.
-    cdef double lambdaE = 1
-    cdef double bE = 0.3
-    cdef double Kb = 100
-    cdef double d_E = 0.25
-    cdef double Kd = 500
-    cdef double deltaE = 0.1
-
-    # decompose state
-    cdef double T1, T2, T1s, T2s, V, E
-    T1, T2, T1s, T2s, V, E = s
-
-    # compute derivatives
-    cdef double tmp1 = (1. - eps1) * k1 * V * T1
-    cdef double tmp2 = (1. - f * eps1) * k2 * V * T2
-    cdef double dT1 = lambda1 - d1 * T1 - tmp1
-    cdef double dT2 = lambda2 - d2 * T2 - tmp2
-    cdef double dT1s = tmp1 - delta * T1s - m1 * E * T1s
-    cdef double dT2s = tmp2 - delta * T2s - m2 * E * T2s
-    cdef double dV = (1. - eps2) * NT * delta * (T1s + T2s) - c * V \
-               - ((1. - eps1) * rho1 * k1 * T1 + (1. - f * eps1) * rho2 * k2 * T2) * V
-    cdef double dE
-    dE = lambdaE + bE * (T1s + T2s) / (T1s + T2s + Kb) * E \
-            - d_E * (T1s + T2s) / (T1s + T2s + Kd) * E - deltaE * E
-
-    return np.array([dT1, dT2, dT1s, dT2s, dV, dE])
+    cdef np.ndarray[np.double_t, ndim=1] ds = np.empty(6)
+    cdef np.ndarray[np.double_t, ndim=1] s_c = np.ascontiguousarray(s)
+    derivs(&s_c[0], eps1, eps2, &ds[0])
+    return ds
+
+
+def dsdt_jacobian(np.ndarray[np.double_t, ndim=1] s, double t, double eps1,
+                  double eps2):
+    """
+    Jacobian of :py:func:`dsdt` with respect to the state (6 x 6).
+    """
+    cdef np.ndarray[np.double_t, ndim=2] J = np.empty((6, 6))
+    cdef np.ndarray[np.double_t, ndim=1] s_c = np.ascontiguousarray(s)
+    jacobian(&s_c[0], eps1, eps2, &J[0, 0])
+    return J
@@ -13,9 +13,7 @@ from .Domain import Domain
 import numpy as np
 import rlpy.Tools.transformations as trans
 from rlpy.Tools.GeneralTools import cartesian
-import matplotlib.pyplot as plt
-from matplotlib.patches import FancyArrowPatch, Circle, Ellipse
-from mpl_toolkits.mplot3d import proj3d
+from rlpy.Tools import plt, mpatches
 
 __copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
 __credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
@@ -24,21 +22,33 @@ __license__ = "BSD 3-Clause"
 __author__ = "Christoph Dann <cdann@cdann.de>"
 
 
-class Arrow3D(FancyArrowPatch):
+_Arrow3D = None
 
+
+def Arrow3D(xs, ys, zs, *args, **kwargs):
     """
-    Helper class for plotting arrows in 3d
+    Helper for plotting arrows in 3d. The arrow class derives from a
+    matplotlib class and is therefore only created when first used.
     """
+    global _Arrow3D
+    if _Arrow3D is None:
+        from mpl_toolkits.mplot3d import proj3d
+
+        class _Arrow3DPatch(mpatches.FancyArrowPatch):
 
-    def __init__(self, xs, ys, zs, *args, **kwargs):
-        FancyArrowPatch.__init__(self, (0, 0), (0, 0), *args, **kwargs)
-        self._verts3d = xs, ys, zs
+            def __init__(self, xs, ys, zs, *args, **kwargs):
+                mpatches.FancyArrowPatch.__init__(
+                    self, (0, 0), (0, 0), *args, **kwargs)
+                self._verts3d = xs, ys, zs
 
-    def draw(self, renderer):
-        xs3d, ys3d, zs3d = self._verts3d
-        xs, ys, zs = proj3d.proj_transform(xs3d, ys3d, zs3d, renderer.M)
-        self.set_positions((xs[0], ys[0]), (xs[1], ys[1]))
-        FancyArrowPatch.draw(self, renderer)
+            def draw(self, renderer):
+                xs3d, ys3d, zs3d = self._verts3d
+                xs, ys, zs = proj3d.proj_transform(xs3d, ys3d, zs3d,
+                                                   renderer.M)
+                self.set_positions((xs[0], ys[0]), (xs[1], ys[1]))
+                mpatches.FancyArrowPatch.draw(self, renderer)
+        _Arrow3D = _Arrow3DPatch
+    return _Arrow3D(xs, ys, zs, *args, **kwargs)
 
 
 class HelicopterHoverExtended(Domain):
@@ -277,8 +287,8 @@ class HelicopterHoverExtended(Domain):
             if a is None:
                 a = np.zeros((4))
             # main rotor
-            ax1.add_artist(Circle(np.zeros((2)), radius=0.6))
-            ax1.add_artist(Ellipse(np.array([0, 1.5]), height=0.3, width=0.02))
+            ax1.add_artist(mpatches.Circle(np.zeros((2)), radius=0.6))
+            ax1.add_artist(mpatches.Ellipse(np.array([0, 1.5]), height=0.3, width=0.02))
             # TODO make sure the actions are plotted right
             # main rotor direction?
             arr1 = ax1.arrow(0, 0, a[0], 0, **style)
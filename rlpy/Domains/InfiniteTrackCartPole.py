@@ -141,6 +141,32 @@ class InfTrackCartPole(CartPoleBase):
         possibleActions = self.possibleActions()
         return reward, ns, terminal, possibleActions
 
+    def step_batch(self, states, actions, random_state=None):
+        """
+        Vectorized version of :py:meth:`step` for a batch of states. The
+        internal ``self.state`` is not modified.
+
+        :param states: the current states, one per row.
+        :param actions: the action taken in each state.
+        :param random_state: (optional) random number generator used for
+            the noise, defaults to ``self.random_state``.
+
+        :return: The tuple (r, ns, t, p_actions) with one entry (row) per
+            state, where ``p_actions`` is the boolean mask of the actions
+            possible in each next state.
+
+        """
+        if random_state is None:
+            random_state = self.random_state
+        states = np.asarray(states, dtype=float)
+        # 0 cart position and velocity
+        S = np.hstack((states, np.zeros((len(states), 2))))
+        ns = self._stepFourStateBatch(S, actions, random_state)[:, 0:2]
+        terminal = self._isTerminalBatch(ns)
+        reward = self._getRewardBatch(actions, ns)
+        return (reward, ns, terminal,
+                np.ones((len(ns), self.actions_num), dtype=bool))
+
     def showDomain(self, a=0):
         """
         Display the 4-d state of the cartpole and arrow indicating current
@@ -242,6 +268,13 @@ class InfCartPoleBalance(InfTrackCartPole):
             not (old_div(-np.pi, 2.0) < s[StateIndex.THETA] < old_div(np.pi, 2.0))
         )
 
+    def _getRewardBatch(self, a, S):
+        return np.where(self._isTerminalBatch(S), self.FELL_REWARD, 0).astype(float)
+
+    def _isTerminalBatch(self, S):
+        theta = S[:, StateIndex.THETA]
+        return ~((old_div(-np.pi, 2.0) < theta) & (theta < old_div(np.pi, 2.0)))
+
 
 class InfCartPoleSwingUp(InfTrackCartPole):
 
@@ -295,5 +328,13 @@ class InfCartPoleSwingUp(InfTrackCartPole):
                 1] else 0
         )
 
+    def _getRewardBatch(self, a, S):
+        theta = S[:, StateIndex.THETA]
+        goal = (self.GOAL_LIMITS[0] < theta) & (theta < self.GOAL_LIMITS[1])
+        return np.where(goal, self.GOAL_REWARD, 0).astype(float)
+
     def isTerminal(self, s=None):
         return False
+
+    def _isTerminalBatch(self, S):
+        return np.zeros(len(S), dtype=bool)
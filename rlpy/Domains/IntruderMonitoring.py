@@ -181,12 +181,22 @@ class IntruderMonitoring(Domain):
     def possibleActionsPerAgent(self, s_i):
         """
         Returns all possible actions for a single (2-D) agent state *s_i* 
-        (where the domain state s = [s_0, ... s_i ... s_NUMBER_OF_AGENTS])
-        
+        (where the domain state s = [s_0, ... s_i ... s_NUMBER_OF_AGENTS]).
+        The actions are computed once per cell and looked up afterwards.
+        """
+        return self._memoized("possibleActionsPerAgent",
+                              (int(s_i[0]), int(s_i[1])),
+                              lambda: self._possibleActionsPerAgent(s_i))
+
+    def _possibleActionsPerAgent(self, s_i):
+        """
+        Computes the entry of :py:meth:`possibleActionsPerAgent` for the
+        agent state *s_i*:
+
             1. tile the [R,C] for all actions
             2. add all actions to the results
             3. Find feasible rows and add them as possible actions
-            
+
         """
         tile_s = np.tile(s_i, [len(self.ACTIONS_PER_AGENT), 1])
         next_states = tile_s + self.ACTIONS_PER_AGENT
@@ -200,6 +210,7 @@ class IntruderMonitoring(Domain):
             next_states_cols < self.COLS)
         possibleActions, _ = np.logical_and(
             possibleActions1, possibleActions2).reshape(-1, 1).nonzero()
+        possibleActions.setflags(write=False)
         return possibleActions
 
     def printDomain(self, s, a):
@@ -112,6 +112,42 @@ class MountainCar(Domain):
         self.state = ns.copy()
         return r, ns, terminal, self.possibleActions()
 
+    def step_batch(self, states, actions, random_state=None):
+        """
+        Vectorized version of :py:meth:`step` for a batch of states. The
+        internal ``self.state`` is not modified.
+
+        :param states: the current states, one per row.
+        :param actions: the action taken in each state.
+        :param random_state: (optional) random number generator used for
+            the noise, defaults to ``self.random_state``.
+
+        :return: The tuple (r, ns, t, p_actions) with one entry (row) per
+            state, where ``p_actions`` is the boolean mask of the actions
+            possible in each next state.
+
+        """
+        if random_state is None:
+            random_state = self.random_state
+        states = np.asarray(states, dtype=float)
+        n = len(states)
+        position = states[:, 0].copy()
+        velocity = states[:, 1].copy()
+        noise = self.accelerationFactor * self.noise * \
+            2 * (random_state.rand(n) - .5)
+        velocity += (noise +
+                     np.asarray(self.actions)[actions] * self.accelerationFactor +
+                     np.cos(self.hillPeakFrequency * position) * self.gravityFactor)
+        velocity = np.clip(velocity, self.XDOTMIN, self.XDOTMAX)
+        position += velocity
+        position = np.clip(position, self.XMIN, self.XMAX)
+        velocity[(position <= self.XMIN) & (velocity < 0)] = 0  # Bump into wall
+        # as in step(), the terminal flag is computed before the transition
+        terminal = states[:, 0] > self.GOAL
+        r = np.where(terminal, self.GOAL_REWARD, self.STEP_REWARD).astype(float)
+        ns = np.column_stack((position, velocity))
+        return r, ns, terminal, np.ones((n, self.actions_num), dtype=bool)
+
     def s0(self):
         self.state = self.INIT_STATE.copy()
         return self.state.copy(), self.isTerminal(), self.possibleActions()
@@ -19,9 +19,15 @@ from .Domain import Domain
 import numpy as np
 from itertools import tee
 import itertools
+import math
 from tkinter import Tk, Canvas
 import os
 from rlpy.Tools import __rlpy_location__
+try:
+    from .Pinball_dynamics import take_action as _take_action
+except ImportError:
+    _take_action = None
+    print("C-Extension for Pinball physics not available, expect slow runtime")
 
 __copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
 __credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
@@ -386,6 +392,9 @@ class PinballModel(object):
     STEP_PENALTY = -1
     THRUST_PENALTY = -5
     END_EPISODE = 10000
+    #: number of cells per dimension of the grid used to find the
+    #: obstacles near the ball
+    INDEX_RESOLUTION = 10
 
     def __init__(self, configuration, random_state=np.random.RandomState()):
         """ Read a configuration file for Pinball and draw the domain to screen
@@ -425,6 +434,45 @@ class PinballModel(object):
         self.start_pos = start_pos[0]
         a = self.random_state.randint(len(start_pos))
         self.ball = BallModel(list(start_pos[a]), ball_rad)
+        self._buildIndex()
+
+    def _buildIndex(self):
+        """ Stores the edges of the obstacles in contiguous arrays and
+        registers each obstacle in the cells of a uniform grid over the
+        unit square in which the ball can touch it. """
+        edges = [np.zeros((0, 4))]
+        obstacle_edges = [0]
+        for obs in self.obstacles:
+            points = np.array(obs.points, dtype=float)
+            # edges between consecutive points, the last one closes the polygon
+            edges.append(np.hstack((points, np.roll(points, -1, axis=0))))
+            obstacle_edges.append(obstacle_edges[-1] + len(points))
+        self._edges = np.ascontiguousarray(np.vstack(edges))
+        self._obstacle_edges = np.array(obstacle_edges, dtype=np.int64)
+        self._bounds = np.array(
+            [[obs.min_x, obs.max_x, obs.min_y, obs.max_y]
+             for obs in self.obstacles], dtype=float).reshape(-1, 4)
+
+        # the cells overlapping the bounding boxes grown by the ball radius
+        # (and a margin against rounding errors in the cell of the ball)
+        g = self.INDEX_RESOLUTION
+        margin = self.ball.radius + 1e-9
+        low = np.floor((self._bounds[:, [0, 2]] - margin) * g)
+        high = np.floor((self._bounds[:, [1, 3]] + margin) * g)
+        low = low.clip(0, g - 1).astype(int)
+        high = high.clip(0, g - 1).astype(int)
+        cells = [[] for c in range(g * g)]
+        for o in range(len(self.obstacles)):
+            for ix in range(low[o, 0], high[o, 0] + 1):
+                for iy in range(low[o, 1], high[o, 1] + 1):
+                    cells[g * ix + iy].append(o)
+        # outside of the unit square all obstacles are tested
+        cells.append(list(range(len(self.obstacles))))
+        self._cell_ptr = np.cumsum(
+            [0] + [len(c) for c in cells]).astype(np.int64)
+        self._cell_obstacles = np.array(
+            [o for c in cells for o in c], dtype=np.int64)
+        self._index_radius = self.ball.radius
 
     def get_state(self):
         """ Access the current 4-dimensional state vector
@@ -447,6 +495,9 @@ class PinballModel(object):
         :type action: int
 
         """
+        if _take_action is not None:
+            return self._take_action_compiled(action)
+
         for i in range(20):
             if i == 0:
                 self.ball.add_impulse(*self.action_effects[action])
@@ -482,6 +533,31 @@ class PinballModel(object):
 
         return self.THRUST_PENALTY
 
+    def _take_action_compiled(self, action):
+        """ :func:`take_action` with the substeps run by the C-Extension """
+        if self.ball.radius != self._index_radius:
+            self._buildIndex()
+        ball = np.array([self.ball.position[0], self.ball.position[1],
+                         self.ball.xdot, self.ball.ydot], dtype=float)
+        delta_xdot, delta_ydot = self.action_effects[action]
+        ended = _take_action(
+            ball, self.ball.radius, delta_xdot, delta_ydot, self._edges,
+            self._obstacle_edges, self._bounds, self._cell_ptr,
+            self._cell_obstacles, self.INDEX_RESOLUTION,
+            self.target_pos[0], self.target_pos[1], self.target_rad)
+        self.ball.position[0], self.ball.position[1] = ball[0], ball[1]
+        self.ball.xdot, self.ball.ydot = ball[2], ball[3]
+        if ended:
+            return self.END_EPISODE
+
+        self.ball.add_drag()
+        self._check_bounds()
+
+        if action == self.ACC_NONE:
+            return self.STEP_PENALTY
+
+        return self.THRUST_PENALTY
+
     def episode_ended(self):
         """ Find out if the ball reached the target
 
@@ -489,10 +565,10 @@ class PinballModel(object):
         :rtype: bool
 
         """
-        return (
-            np.linalg.norm(np.array(self.ball.position)
-                           - np.array(self.target_pos)) < self.target_rad
-        )
+        # same result as the norm of the difference
+        dx = self.ball.position[0] - self.target_pos[0]
+        dy = self.ball.position[1] - self.target_pos[1]
+        return math.sqrt(dx * dx + dy * dy) < self.target_rad
 
     def _check_bounds(self):
         """ Make sure that the ball stays within the environment """
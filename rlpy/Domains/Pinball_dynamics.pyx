@@ -0,0 +1,237 @@
+#cython: boundscheck=False
+#cython: wraparound=False
+#cython: cdivision=True
+# -*- coding: utf-8 -*-
+"""
+Physics of the Pinball domain
+
+Compiled version of the 20 substeps of ``PinballModel.take_action``. Each
+substep moves the ball, detects the collisions with the obstacles and
+changes the velocity of the ball. The obstacle edges are stored in
+contiguous arrays and only the obstacles registered in the cell of a
+uniform grid which contains the ball are tested. All floating point
+operations are carried out in the same order as in ``PinballObstacle``,
+so the trajectories are identical to the ones of the Python version.
+"""
+from libc.math cimport atan2, cos, sin, sqrt, fabs, M_PI
+
+__copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
+__credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
+               "William Dabney", "Jonathan P. How"]
+__license__ = "BSD 3-Clause"
+__author__ = ["Pierre-Luc Bacon",  # author of the original version
+              "Austin Hays"]  # adapted for RLPy and TKinter
+cimport numpy as np
+cimport cython
+
+ctypedef np.int64_t int64
+
+
+cdef inline double angle(double v1x, double v1y, double v2x,
+                         double v2y) nogil:
+    """ PinballObstacle._angle """
+    cdef double angle_diff = atan2(v1x, v1y) - atan2(v2x, v2y)
+    if angle_diff < 0:
+        angle_diff += 2 * M_PI
+    return angle_diff
+
+
+cdef inline bint intercept_edge(double* e, double px, double py,
+                                double xdot, double ydot,
+                                double radius) nogil:
+    """ PinballObstacle._intercept_edge for the edge e = (x0, y0, x1, y1) """
+    # Find the projection on an edge
+    cdef double ex = e[2] - e[0]
+    cdef double ey = e[3] - e[1]
+    cdef double dx = px - e[0]
+    cdef double dy = py - e[1]
+    cdef double scalar_proj = (dx * ex + dy * ey) / (ex * ex + ey * ey)
+    cdef double cx, cy, ox, oy, a
+    if scalar_proj > 1.0:
+        scalar_proj = 1.0
+    elif scalar_proj < 0.0:
+        scalar_proj = 0.0
+
+    # Compute the distance to the closest point
+    cx = e[0] + ex * scalar_proj
+    cy = e[1] + ey * scalar_proj
+    ox = px - cx
+    oy = py - cy
+    if ox * ox + oy * oy <= radius * radius:
+        # A collision only if the ball is not already moving away
+        a = angle(cx - px, cy - py, xdot, ydot)
+        if a > M_PI:
+            a = 2 * M_PI - a
+        if a > M_PI / 1.99:
+            return False
+        return True
+    return False
+
+
+cdef inline double* select_edge(double* e1, double* e2, double xdot,
+                                double ydot) nogil:
+    """ PinballObstacle._select_edge """
+    cdef double angle1 = angle(xdot, ydot, e1[2] - e1[0], e1[3] - e1[1])
+    cdef double angle2
+    if angle1 > M_PI:
+        angle1 -= M_PI
+    angle2 = angle(xdot, ydot, e2[2] - e2[0], e2[3] - e2[1])
+    if angle1 > M_PI:
+        angle2 -= M_PI
+    if fabs(angle1 - M_PI / 2.0) < fabs(angle2 - M_PI / 2.0):
+        return e1
+    return e2
+
+
+cdef inline bint collision(double[:, ::1] edges, int64 first, int64 last,
+                           double* bounds, double px, double py,
+                           double xdot, double ydot, double radius,
+                           double* effect) nogil:
+    """
+    PinballObstacle.collision followed by collision_effect for the obstacle
+    with the edges first, ..., last - 1 and the bounding box *bounds*
+    (min_x, max_x, min_y, max_y). Stores the change of velocity in *effect*.
+    """
+    cdef double* intercept = NULL
+    cdef bint double_collision = False
+    cdef double ox, oy, theta, velocity
+    cdef int64 i
+    if px - radius > bounds[1]:
+        return False
+    if px + radius < bounds[0]:
+        return False
+    if py - radius > bounds[3]:
+        return False
+    if py + radius < bounds[2]:
+        return False
+
+    for i in range(first, last):
+        if intercept_edge(&edges[i, 0], px, py, xdot, ydot, radius):
+            if intercept != NULL:
+                # Ball has hit a corner
+                intercept = select_edge(&edges[i, 0], intercept, xdot, ydot)
+                double_collision = True
+            else:
+                intercept = &edges[i, 0]
+    if intercept == NULL:
+        return False
+
+    if double_collision:
+        effect[0] = -xdot
+        effect[1] = -ydot
+        return True
+
+    # Normalize direction
+    ox = intercept[2] - intercept[0]
+    oy = intercept[3] - intercept[1]
+    if ox < 0:
+        ox = intercept[0] - intercept[2]
+        oy = intercept[1] - intercept[3]
+
+    theta = angle(xdot, ydot, ox, oy) - M_PI
+    if theta < 0:
+        theta += 2 * M_PI
+
+    theta += angle(-1., 0., ox, oy)
+
+    if theta > 2 * M_PI:
+        theta -= 2 * M_PI
+
+    velocity = sqrt(xdot * xdot + ydot * ydot)
+    effect[0] = velocity * cos(theta)
+    effect[1] = velocity * sin(theta)
+    return True
+
+
+def take_action(double[::1] ball, double radius, double delta_xdot,
+                double delta_ydot, double[:, ::1] edges,
+                int64[::1] obstacle_edges, double[:, ::1] bounds,
+                int64[::1] cell_ptr, int64[::1] cell_obstacles, int grid,
+                double target_x, double target_y, double target_rad):
+    """
+    Runs the 20 substeps of ``PinballModel.take_action`` (without the final
+    drag) on the ball state (x, y, xdot, ydot) in place.
+
+    :param radius: the radius of the ball.
+    :param delta_xdot: the impulse of the action in x direction.
+    :param delta_ydot: the impulse of the action in y direction.
+    :param edges: the edges (x0, y0, x1, y1) of all obstacles, one per row.
+    :param obstacle_edges: the edges of obstacle ``o`` are the rows
+        ``obstacle_edges[o]`` to ``obstacle_edges[o + 1] - 1``.
+    :param bounds: the bounding box (min_x, max_x, min_y, max_y) of each
+        obstacle.
+    :param cell_ptr: the obstacles near the ball when it is in cell
+        ``c = grid * ix + iy`` of the *grid* x *grid* cells covering the
+        unit square are ``cell_obstacles[cell_ptr[c]:cell_ptr[c + 1]]``.
+        The cell ``grid * grid`` contains all obstacles and is used if the
+        ball is outside of the unit square.
+    :param target_x, target_y, target_rad: the target hole.
+
+    :return: ``True`` if the ball reached the target.
+    """
+    cdef double px = ball[0], py = ball[1], xdot = ball[2], ydot = ball[3]
+    cdef double dx, dy, tx, ty
+    cdef double effect[2]
+    cdef int i, ncollision, ix, iy
+    cdef int64 j, o, cell
+    cdef bint ended = False
+
+    with nogil:
+        # BallModel.add_impulse
+        xdot += delta_xdot / 5.0
+        ydot += delta_ydot / 5.0
+        if xdot > 2:
+            xdot = 2
+        if xdot < -2:
+            xdot = -2
+        if ydot > 2:
+            ydot = 2
+        if ydot < -2:
+            ydot = -2
+
+        for i in range(20):
+            # BallModel.step
+            px += xdot * radius / 20.0
+            py += ydot * radius / 20.0
+
+            # Detect collisions
+            if 0. <= px <= 1. and 0. <= py <= 1.:
+                ix = min(<int>(px * grid), grid - 1)
+                iy = min(<int>(py * grid), grid - 1)
+                cell = grid * ix + iy
+            else:
+                cell = grid * grid
+            ncollision = 0
+            dx = 0.
+            dy = 0.
+            for j in range(cell_ptr[cell], cell_ptr[cell + 1]):
+                o = cell_obstacles[j]
+                if collision(edges, obstacle_edges[o], obstacle_edges[o + 1],
+                             &bounds[o, 0], px, py, xdot, ydot, radius,
+                             effect):
+                    dx = dx + effect[0]
+                    dy = dy + effect[1]
+                    ncollision += 1
+
+            if ncollision == 1:
+                xdot = dx
+                ydot = dy
+                if i == 19:
+                    px += xdot * radius / 20.0
+                    py += ydot * radius / 20.0
+            elif ncollision > 1:
+                xdot = -xdot
+                ydot = -ydot
+
+            # PinballModel.episode_ended
+            tx = px - target_x
+            ty = py - target_y
+            if sqrt(tx * tx + ty * ty) < target_rad:
+                ended = True
+                break
+
+    ball[0] = px
+    ball[1] = py
+    ball[2] = xdot
+    ball[3] = ydot
+    return ended
@@ -10,7 +10,7 @@ standard_library.install_aliases()
 from past.utils import old_div
 from .Domain import Domain
 import numpy as np
-import matplotlib.pyplot as plt
+from rlpy.Tools import plt
 
 __copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
 __credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
@@ -94,6 +94,51 @@ class PuddleWorld(Domain):
         self.state = ns.copy()
         return self._reward(ns), ns, self.isTerminal(), self.possibleActions()
 
+    def step_batch(self, states, actions, random_state=None):
+        """
+        Vectorized version of :py:meth:`step` for a batch of states. The
+        internal ``self.state`` is not modified.
+
+        :param states: the current states, one per row.
+        :param actions: the action taken in each state.
+        :param random_state: (optional) random number generator used for
+            the noise, defaults to ``self.random_state``.
+
+        :return: The tuple (r, ns, t, p_actions) with one entry (row) per
+            state, where ``p_actions`` is the boolean mask of the actions
+            possible in each next state.
+
+        """
+        if random_state is None:
+            random_state = self.random_state
+        states = np.asarray(states, dtype=float)
+        n = len(states)
+        noise = random_state.randn(n) * self.noise_level
+        ns = states + self.actions[actions] + noise[:, None]
+        # make sure we stay inside the [0,1]^2 region
+        ns = np.minimum(ns, 1.)
+        ns = np.maximum(ns, 0.)
+        terminal = ns.sum(axis=1) > 0.95 * 2
+        return (self._reward_batch(ns, terminal), ns, terminal,
+                np.ones((n, self.actions_num), dtype=bool))
+
+    def _reward_batch(self, S, terminal):
+        """
+        Vectorized version of :py:meth:`_reward` for the states *S* (one per
+        row) with the terminal flags *terminal*.
+        """
+        start = self.puddles[:, 0, :]
+        d = self.puddles[:, 1, :] - start
+        denom = (d ** 2).sum(axis=1)
+        # states x puddles
+        g = old_div(((S[:, None, :] - start) * d).sum(axis=2), denom)
+        g = np.minimum(g, 1)
+        g = np.maximum(g, 0)
+        dists = np.sqrt(((start + g[:, :, None] * d - S[:, None, :]) ** 2).sum(axis=2))
+        reward = -1 - 400 * np.maximum(0.1 - dists, 0).max(axis=1)
+        reward[terminal] = 0  # goal state reached
+        return reward
+
     def _reward(self, s):
         if self.isTerminal(s):
             return 0  # goal state reached
@@ -174,3 +219,8 @@ class PuddleGapWorld(PuddleWorld):
         if s[1] < .67 and s[1] >= .6:
             r = -1
         return r
+
+    def _reward_batch(self, S, terminal):
+        r = super(PuddleGapWorld, self)._reward_batch(S, terminal)
+        r[(S[:, 1] < .67) & (S[:, 1] >= .6)] = -1
+        return r
@@ -8,8 +8,8 @@ from builtins import super
 from future import standard_library
 standard_library.install_aliases()
 from past.utils import old_div
-from rlpy.Tools import plt, bound, wrap, mpatches, id2vec
-import matplotlib as mpl
+from rlpy.Tools import plt, bound, wrap, wrap_vec, mpatches, id2vec
+from rlpy.Tools import matplotlib as mpl
 from .Domain import Domain
 import numpy as np
 
@@ -126,6 +126,52 @@ class RCCar(Domain):
         r = self.GOAL_REWARD if terminal else self.STEP_REWARD
         return r, ns, terminal, self.possibleActions()
 
+    def step_batch(self, states, actions, random_state=None):
+        """
+        Vectorized version of :py:meth:`step` for a batch of states. The
+        internal ``self.state`` is not modified.
+
+        :param states: the current states, one per row.
+        :param actions: the action taken in each state.
+        :param random_state: (optional) unused, the dynamics are
+            deterministic.
+
+        :return: The tuple (r, ns, t, p_actions) with one entry (row) per
+            state, where ``p_actions`` is the boolean mask of the actions
+            possible in each next state.
+
+        """
+        states = np.asarray(states, dtype=float)
+        actions = np.asarray(actions, dtype=int)
+        n = len(states)
+        x, y, speed, heading = states.T
+        # same mapping as id2vec(a, [3, 3])
+        acc = actions % 3 - 1
+        turn = actions // 3 - 1
+
+        # Calculate next state
+        nx = x + speed * np.cos(heading) * self.delta_t
+        ny = y + speed * np.sin(heading) * self.delta_t
+        nspeed = speed + acc * self.ACCELERATION * self.delta_t
+        nheading = heading + speed / self.CAR_LENGTH * \
+            np.tan(turn * self.TURN_ANGLE) * self.delta_t
+
+        # Bound values
+        nx = np.clip(nx, self.XMIN, self.XMAX)
+        ny = np.clip(ny, self.YMIN, self.YMAX)
+        nspeed = np.clip(nspeed, self.SPEEDMIN, self.SPEEDMAX)
+        nheading = wrap_vec(nheading, self.HEADINGMIN, self.HEADINGMAX)
+
+        # Collision to wall => set the speed to zero
+        nspeed[(nx == self.XMIN) | (nx == self.XMAX) |
+               (ny == self.YMIN) | (ny == self.YMAX)] = 0
+
+        ns = np.column_stack((nx, ny, nspeed, nheading))
+        terminal = np.linalg.norm(ns[:, :2] - self.GOAL, axis=1) < \
+            self.GOAL_RADIUS
+        r = np.where(terminal, self.GOAL_REWARD, self.STEP_REWARD).astype(float)
+        return r, ns, terminal, np.ones((n, self.actions_num), dtype=bool)
+
     def s0(self):
         self.state = self.INIT_STATE.copy()
         return self.state.copy(), self.isTerminal(), self.possibleActions()
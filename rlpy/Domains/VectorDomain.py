@@ -0,0 +1,126 @@
+"""Batch of independent episodes of a domain"""
+from __future__ import division
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import absolute_import
+
+from future import standard_library
+standard_library.install_aliases()
+from builtins import range
+from builtins import object
+from copy import deepcopy
+import numpy as np
+from rlpy.Tools import hasFunction
+
+__copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
+__credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
+               "William Dabney", "Jonathan P. How"]
+__license__ = "BSD 3-Clause"
+
+
+class VectorDomain(object):
+
+    """
+    Runs *n* independent episodes of a domain side by side, with the states
+    of all episodes stored as one array (one row per episode).
+
+    Domains that implement ``step_batch(states, actions, random_state)``
+    (e.g. :py:class:`~rlpy.Domains.MountainCar.MountainCar`,
+    :py:class:`~rlpy.Domains.GridWorld.GridWorld` or the CartPole domains)
+    advance all episodes with a single vectorized call. ``step_batch`` does
+    not modify the state of the domain and returns the tuple
+    (r, ns, t, p_actions) with one entry per episode, where ``p_actions``
+    is a boolean mask of the possible actions.
+    For all other domains, the episodes are run on *n* copies of the domain,
+    one step at a time.
+
+    The possible actions are always given as a boolean
+    *n* x ``actions_num`` mask.
+
+    """
+
+    def __init__(self, domain, n):
+        """
+        :param domain: the :py:class:`~rlpy.Domains.Domain.Domain` to run.
+            Its random number generator is used for the initial states and
+            the transitions.
+        :param n: number of episodes.
+        """
+        self.domain = domain
+        self.n = n
+        self.actions_num = domain.actions_num
+        self.discount_factor = domain.discount_factor
+        self.episodeCap = domain.episodeCap
+        self.vectorized = hasFunction(domain, "step_batch")
+        self.states = None
+        if not self.vectorized:
+            self.domains = [deepcopy(domain) for i in range(n)]
+            self.init_randomization()
+
+    def init_randomization(self):
+        """
+        Seeds the copies of the domain from the random number generator of
+        the domain. Has to be called whenever ``domain.random_state`` is
+        replaced.
+        """
+        if not self.vectorized:
+            for d, seed in zip(self.domains,
+                               self.domain.random_state.randint(
+                                   np.iinfo(np.int32).max, size=self.n)):
+                d.random_state = np.random.RandomState(seed)
+
+    def _actionMask(self, p_actions):
+        mask = np.zeros(self.actions_num, dtype=bool)
+        mask[np.asarray(p_actions, dtype=int)] = True
+        return mask
+
+    def s0(self):
+        """
+        Starts a new episode in each slot.
+
+        :return: The tuple (states, terminal, p_actions) of the initial
+            states, their terminal flags and possible action masks.
+        """
+        domains = [self.domain] * self.n if self.vectorized else self.domains
+        states, terminal, p_actions = [], [], []
+        for d in domains:
+            s, t, pa = d.s0()
+            states.append(np.array(s, copy=True))
+            terminal.append(t)
+            p_actions.append(self._actionMask(pa))
+        self.states = np.array(states)
+        return (self.states.copy(), np.array(terminal, dtype=bool),
+                np.array(p_actions))
+
+    def step(self, actions, indices=None):
+        """
+        Performs one step in the selected episodes.
+
+        :param actions: the action of each selected episode.
+        :param indices: (optional) ids of the episodes to step; defaults to
+            all episodes.
+
+        :return: The tuple (r, ns, t, p_actions) of arrays with one entry
+            (row) per selected episode.
+        """
+        if indices is None:
+            indices = np.arange(self.n)
+        indices = np.asarray(indices, dtype=int)
+        actions = np.asarray(actions, dtype=int)
+        if self.vectorized:
+            r, ns, t, pa = self.domain.step_batch(self.states[indices], actions)
+        else:
+            r, ns, t, pa = [], [], [], []
+            for i, a in zip(indices, actions):
+                ri, nsi, ti, pai = self.domains[i].step(a)
+                r.append(ri)
+                ns.append(np.array(nsi, copy=True))
+                t.append(ti)
+                pa.append(self._actionMask(pai))
+            r, ns, t, pa = (np.array(r, dtype=float), np.array(ns),
+                            np.array(t, dtype=bool), np.array(pa))
+        ns = np.asarray(ns)
+        if not np.can_cast(ns.dtype, self.states.dtype):
+            self.states = self.states.astype(ns.dtype)
+        self.states[indices] = ns
+        return r, ns, t, pa
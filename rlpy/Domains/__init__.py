@@ -2,30 +2,38 @@ from __future__ import unicode_literals
 from __future__ import print_function
 from __future__ import division
 from __future__ import absolute_import
-#from Domain import Domain
 from future import standard_library
 standard_library.install_aliases()
-from .HelicopterHover import HelicopterHover, HelicopterHoverExtended
-from .HIVTreatment import HIVTreatment
-from .PuddleWorld import PuddleWorld
-from .GridWorld import GridWorld
-from .BlocksWorld import BlocksWorld
-from .MountainCar import MountainCar
-from .ChainMDP import ChainMDP
-from .SystemAdministrator import SystemAdministrator
-from .PST import PST
-from .Pacman import Pacman
-from .IntruderMonitoring import IntruderMonitoring
-from .FiftyChain import FiftyChain
-from .FlipBoard import FlipBoard
-from .RCCar import RCCar
-from .Acrobot import Acrobot, AcrobotLegacy
-from .Bicycle import BicycleBalancing, BicycleRiding
-from .Swimmer import Swimmer
-from .Pinball import Pinball
-from .FiniteTrackCartPole import (FiniteCartPoleBalance,
-                                 FiniteCartPoleBalanceOriginal,
-                                 FiniteCartPoleBalanceModern,
-                                 FiniteCartPoleSwingUp,
-                                 FiniteCartPoleSwingUpFriction)
-from .InfiniteTrackCartPole import InfCartPoleBalance, InfCartPoleSwingUp
+from rlpy.Tools.GeneralTools import lazyPackage
+
+# each domain is imported when it is first used
+lazyPackage(__name__, {
+    "HelicopterHover": ".HelicopterHover",
+    "HelicopterHoverExtended": ".HelicopterHover",
+    "HIVTreatment": ".HIVTreatment",
+    "PuddleWorld": ".PuddleWorld",
+    "GridWorld": ".GridWorld",
+    "BlocksWorld": ".BlocksWorld",
+    "MountainCar": ".MountainCar",
+    "ChainMDP": ".ChainMDP",
+    "SystemAdministrator": ".SystemAdministrator",
+    "PST": ".PST",
+    "Pacman": ".Pacman",
+    "IntruderMonitoring": ".IntruderMonitoring",
+    "FiftyChain": ".FiftyChain",
+    "FlipBoard": ".FlipBoard",
+    "RCCar": ".RCCar",
+    "Acrobot": ".Acrobot",
+    "AcrobotLegacy": ".Acrobot",
+    "BicycleBalancing": ".Bicycle",
+    "BicycleRiding": ".Bicycle",
+    "Swimmer": ".Swimmer",
+    "Pinball": ".Pinball",
+    "FiniteCartPoleBalance": ".FiniteTrackCartPole",
+    "FiniteCartPoleBalanceOriginal": ".FiniteTrackCartPole",
+    "FiniteCartPoleBalanceModern": ".FiniteTrackCartPole",
+    "FiniteCartPoleSwingUp": ".FiniteTrackCartPole",
+    "FiniteCartPoleSwingUpFriction": ".FiniteTrackCartPole",
+    "InfCartPoleBalance": ".InfiniteTrackCartPole",
+    "InfCartPoleSwingUp": ".InfiniteTrackCartPole",
+    "VectorDomain": ".VectorDomain"})
@@ -19,7 +19,8 @@ import re
 import argparse
 from rlpy.Tools import deltaT, clock, hhmmss
 from rlpy.Tools import className, checkNCreateDirectory
-from rlpy.Tools import printClass
+from rlpy.Tools import printClass, hasFunction, SampleStore
+from rlpy.Domains.VectorDomain import VectorDomain
 import rlpy.Tools.results
 # from rlpy.Tools import lower
 import os
@@ -97,6 +98,20 @@ class Experiment(object):
     # experiment
     num_policy_checks = 0
     log_interval = 0  # Number of seconds between log prints to console
+    #: (optional) function called with the experiment after each performance
+    #: evaluation, e.g. to report the progress of the experiment
+    evaluation_callback = None
+    #: Run all ``checks_per_policy`` episodes of an evaluation side by side
+    #: with batched action selection (see :py:meth:`performanceRunBatch`)
+    vectorized_evaluation = False
+    #: Record all transitions of the learning episodes as an offline dataset
+    #: (see :py:class:`~rlpy.Tools.SampleStore.SampleStore`)
+    record_samples = False
+    #: Record into memory-mapped files instead of a ``.npz`` file
+    record_memmap = False
+    #: The :py:class:`~rlpy.Tools.SampleStore.SampleStore` of the recorded
+    #: transitions of the last run
+    samples = None
 
     log_template = '{total_steps: >6}: E[{elapsed}]-R[{remaining}]: Return={totreturn: >10.4g}, Steps={steps: >4}, Features = {num_feat}'
     performance_log_template = '{total_steps: >6}: >>> E[{elapsed}]-R[{remaining}]: Return={totreturn: >10.4g}, Steps={steps: >4}, Features = {num_feat}'
@@ -104,7 +119,9 @@ class Experiment(object):
     def __init__(self, agent, domain, exp_id=1, max_steps=max_steps,
                  config_logging=True, num_policy_checks=10, log_interval=1,
                  path='Results/Temp',
-                 checks_per_policy=1, stat_bins_per_state_dim=0, **kwargs):
+                 checks_per_policy=1, stat_bins_per_state_dim=0,
+                 vectorized_evaluation=False, record_samples=False,
+                 record_memmap=False, **kwargs):
         """
         :param agent: the :py:class:`~Agents.Agent.Agent` to use for learning the task.
         :param domain: the problem :py:class:`~Domains.Domain.Domain` to learn
@@ -124,12 +141,26 @@ class Experiment(object):
             (Results are stored in ``path/output_filename``)
         :param checks_per_policy: defines how many episodes should be run to
             estimate the performance of a single policy
+        :param vectorized_evaluation: if True, the episodes of each
+            performance check are run together on a
+            :py:class:`~rlpy.Domains.VectorDomain.VectorDomain`, provided the
+            policy implements ``pi_batch``
+        :param record_samples: if True, all transitions (s, a, r, ns, na,
+            terminal and the possible actions) of the learning run are
+            recorded and written to ``path/<exp_id>-samples.npz``, which can
+            be replayed by
+            :py:class:`~rlpy.Experiments.OfflineExperiment.OfflineExperiment`
+        :param record_memmap: record into the memory-mapped files of the
+            directory ``path/<exp_id>-samples`` instead
 
         """
         self.exp_id = exp_id
         assert exp_id > 0
         self.agent = agent
         self.checks_per_policy = checks_per_policy
+        self.vectorized_evaluation = vectorized_evaluation
+        self.record_samples = record_samples or record_memmap
+        self.record_memmap = record_memmap
         self.domain = domain
         self.max_steps = max_steps
         self.num_policy_checks = num_policy_checks
@@ -171,6 +202,7 @@ class Experiment(object):
         """
         self._update_path(self.path)
         self.output_filename = '{:0>3}-results.json'.format(self.exp_id)
+        self.samples_filename = '{:0>3}-samples'.format(self.exp_id)
         np.random.seed(self.randomSeeds[self.exp_id - 1])
         self.domain.random_state = np.random.RandomState(
             self.randomSeeds[self.exp_id - 1])
@@ -240,6 +272,54 @@ class Experiment(object):
 
         return eps_return, eps_length, eps_term, eps_discount_return
 
+    def performanceRunBatch(self, n):
+        """
+        Execute *n* episodes at once using the current policy to evaluate
+        its performance. No exploration or learning is enabled.
+        All running episodes are advanced together with one call of the
+        policy's ``pi_batch`` and one (vectorized) step of the
+        :py:class:`~rlpy.Domains.VectorDomain.VectorDomain`.
+
+        :param n: int
+            number of episodes
+
+        :return: The arrays (returns, lengths, terminated, discounted returns)
+            with one entry per episode.
+        """
+        if (getattr(self, "performance_vector_domain", None) is None or
+                self.performance_vector_domain.n != n):
+            self.performance_vector_domain = VectorDomain(
+                self.performance_domain, n)
+        domain = self.performance_vector_domain
+        eps_length = np.zeros(n, dtype=int)
+        eps_return = np.zeros(n)
+        eps_discount_return = np.zeros(n)
+
+        self.agent.policy.turnOffExploration()
+
+        s, eps_term, p_actions = domain.s0()
+        # all running episodes have taken the same number of steps
+        running = np.flatnonzero(~eps_term)
+        steps = 0
+        while len(running) and steps < self.domain.episodeCap:
+            a = self.agent.policy.pi_batch(s[running], eps_term[running],
+                                           p_actions[running])
+            r, ns, term, pa = domain.step(a, running)
+            if hasattr(self, "state_counts_perf"):
+                for i in range(len(running)):
+                    self._gather_transition_statistics(
+                        s[running[i]], a[i], ns[i], r[i], learning=False)
+            s = domain.states.copy()
+            eps_term[running] = term
+            p_actions[running] = pa
+            eps_return[running] += r
+            eps_discount_return[running] += domain.discount_factor ** steps * r
+            eps_length[running] += 1
+            steps += 1
+            running = running[~term]
+        self.agent.policy.turnOnExploration()
+        return eps_return, eps_length, eps_term, eps_discount_return
+
     def printAll(self):
         """
         prints all information about the experiment
@@ -339,6 +419,7 @@ class Experiment(object):
         if debug_on_sigurg:
             rlpy.Tools.ipshell.ipdb_on_SIGURG()
         self.performance_domain = deepcopy(self.domain)
+        self.performance_vector_domain = None
         self.seed_components()
 
         self.result = defaultdict(list)
@@ -360,6 +441,9 @@ class Experiment(object):
         # do a first evaluation to get the quality of the inital policy
         self.evaluate(total_steps, episode_number, visualize_performance)
         self.total_eval_time = 0.
+        self.samples = None
+        if self.record_samples:
+            self._start_recording()
         terminal = True
         while total_steps < self.max_steps:
             if terminal or eps_steps >= self.domain.episodeCap:
@@ -399,6 +483,9 @@ class Experiment(object):
                                              steps=eps_steps,
                                              num_feat=self.agent.representation.features_num))
 
+            if self.samples is not None:
+                self.samples.add(s, a, r, ns, na, terminal, p_actions, np_actions)
+
             # learning
             self.agent.learn(s, p_actions, a, r, ns, np_actions, na, terminal)
             s, a, p_actions = ns, na, np_actions
@@ -427,8 +514,27 @@ class Experiment(object):
         # Visual
         if visualize_steps:
             self.domain.show(a, self.agent.representation)
+        if self.samples is not None:
+            self._stop_recording()
         self.logger.info("Total Experiment Duration %s" % (hhmmss(deltaT(self.start_time))))
 
+    def _start_recording(self):
+        path = os.path.join(self.full_path, self.samples_filename)
+        self.samples = SampleStore(
+            self.max_steps, self.domain.state_space_dims,
+            actions_num=self.domain.actions_num, masks=True,
+            directory=path if self.record_memmap else None)
+
+    def _stop_recording(self):
+        path = os.path.join(self.full_path, self.samples_filename)
+        if self.record_memmap:
+            self.samples.flush()
+        else:
+            self.samples.save(path + ".npz")
+            path += ".npz"
+        self.logger.info("Recorded %d transitions to %s" %
+                         (self.samples.size, path))
+
     def evaluate(self, total_steps, episode_number, visualize=0):
         """
         Evaluate the current agent within an experiment
@@ -451,13 +557,22 @@ class Experiment(object):
         performance_steps = 0.
         performance_term = 0.
         performance_discounted_return = 0.
-        for j in range(self.checks_per_policy):
-            p_ret, p_step, p_term, p_dret = self.performanceRun(
-                total_steps, visualize=visualize > j)
-            performance_return += p_ret
-            performance_steps += p_step
-            performance_term += p_term
-            performance_discounted_return += p_dret
+        if (self.vectorized_evaluation and not visualize and
+                hasFunction(self.agent.policy, "pi_batch")):
+            p_ret, p_step, p_term, p_dret = self.performanceRunBatch(
+                self.checks_per_policy)
+            performance_return += p_ret.sum()
+            performance_steps += p_step.sum()
+            performance_term += p_term.sum()
+            performance_discounted_return += p_dret.sum()
+        else:
+            for j in range(self.checks_per_policy):
+                p_ret, p_step, p_term, p_dret = self.performanceRun(
+                    total_steps, visualize=visualize > j)
+                performance_return += p_ret
+                performance_steps += p_step
+                performance_term += p_term
+                performance_discounted_return += p_dret
         performance_return /= self.checks_per_policy
         performance_steps /= self.checks_per_policy
         performance_term /= self.checks_per_policy
@@ -470,6 +585,8 @@ class Experiment(object):
         self.result["terminated"].append(performance_term)
         self.result["learning_episode"].append(episode_number)
         self.result["discounted_return"].append(performance_discounted_return)
+        if self.evaluation_callback is not None:
+            self.evaluation_callback(self)
         # reset start time such that performanceRuns don't count
         self.start_time = clock() - elapsedTime
         if total_steps > 0:
@@ -0,0 +1,144 @@
+"""Experiment for Learning Control from recorded transitions."""
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import absolute_import
+
+from future import standard_library
+standard_library.install_aliases()
+from builtins import range
+from past.utils import old_div
+import os
+import numpy as np
+from copy import deepcopy
+from collections import defaultdict
+from rlpy.Tools import deltaT, clock, hhmmss, hasFunction, SampleStore
+import rlpy.Tools.ipshell
+from .Experiment import Experiment
+
+__copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
+__credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
+               "William Dabney", "Jonathan P. How"]
+__license__ = "BSD 3-Clause"
+
+
+class OfflineExperiment(Experiment):
+
+    """
+    Learns from a dataset of transitions instead of interacting with the
+    domain. The dataset is read in chronological chunks, so that the same
+    samples can be used for many runs of batch algorithms and
+    hyperparameters without simulating the domain again. Datasets are
+    recorded by :py:class:`~rlpy.Experiments.Experiment.Experiment` with
+    ``record_samples=True`` (or ``record_memmap=True``).
+
+    Batch agents (e.g. :py:class:`~rlpy.Agents.LSPI.LSPI`, which also
+    expands representations with ``batchDiscover`` such as iFDD) receive
+    each chunk with ``addSamples`` and learn on all samples so far with
+    ``batch_learn`` before each performance check. All other agents learn
+    from the transitions one after another as in an online run.
+
+    The domain is only used to evaluate the performance of the policies.
+    """
+
+    #: Number of transitions read from the dataset at once
+    chunk_size = 10000
+
+    def __init__(self, agent, domain, dataset, chunk_size=10000,
+                 max_steps=0, **kwargs):
+        """
+        :param dataset: the recorded transitions: a
+            :py:class:`~rlpy.Tools.SampleStore.SampleStore`, the path of a
+            ``.npz`` file written by
+            :py:meth:`~rlpy.Tools.SampleStore.SampleStore.save` or of a
+            directory of memory-mapped files.
+        :param chunk_size: number of transitions read from the dataset at once.
+        :param max_steps: number of transitions to learn from; 0 for all
+            transitions of the dataset.
+
+        The other parameters are the ones of
+        :py:class:`~rlpy.Experiments.Experiment.Experiment`.
+        """
+        if not isinstance(dataset, SampleStore):
+            if os.path.isdir(dataset):
+                dataset = SampleStore.open(dataset, mode="r")
+            else:
+                dataset = SampleStore.load(dataset)
+        self.dataset = dataset
+        self.chunk_size = chunk_size
+        if max_steps <= 0 or max_steps > dataset.size:
+            max_steps = dataset.size
+        super(OfflineExperiment, self).__init__(
+            agent, domain, max_steps=max_steps, **kwargs)
+
+    def _learnChunk(self, chunk):
+        agent = self.agent
+        if hasFunction(agent, "addSamples"):
+            agent.addSamples(chunk["s"], chunk["a"], chunk["r"], chunk["ns"],
+                             chunk["na"], chunk["terminal"])
+            return
+        all_actions = np.arange(self.domain.actions_num)
+        for i in range(len(chunk["r"])):
+            if self.dataset.masks:
+                p_actions = np.flatnonzero(chunk["p_actions"][i])
+                np_actions = np.flatnonzero(chunk["np_actions"][i])
+            else:
+                p_actions = np_actions = all_actions
+            agent.learn(chunk["s"][i], p_actions, int(chunk["a"][i, 0]),
+                        float(chunk["r"][i, 0]), chunk["ns"][i], np_actions,
+                        int(chunk["na"][i, 0]), bool(chunk["terminal"][i, 0]))
+
+    def run(self, visualize_performance=0, visualize_learning=False,
+            debug_on_sigurg=False):
+        """
+        Run the experiment on the dataset and collect statistics / generate
+        the results. See :py:meth:`~rlpy.Experiments.Experiment.Experiment.run`
+        for the parameters.
+        """
+        if debug_on_sigurg:
+            rlpy.Tools.ipshell.ipdb_on_SIGURG()
+        self.performance_domain = deepcopy(self.domain)
+        self.performance_vector_domain = None
+        self.seed_components()
+
+        self.result = defaultdict(list)
+        self.result["seed"] = self.exp_id
+        total_steps = 0
+        episode_number = 0
+        batch = hasFunction(self.agent, "addSamples")
+
+        self.start_time = clock()
+        self.elapsed_time = 0
+        self.evaluate(total_steps, episode_number, visualize_performance)
+        self.total_eval_time = 0.
+        check_interval = max(1, old_div(self.max_steps, self.num_policy_checks))
+        next_check = check_interval
+        chunks = self.dataset.chunks(self.chunk_size, self.max_steps)
+        chunk = None
+        while total_steps < self.max_steps:
+            if chunk is None or len(chunk["r"]) == 0:
+                chunk = next(chunks)
+            # do not learn past the next performance check
+            n = min(len(chunk["r"]), next_check - total_steps)
+            part = dict((name, value[:n]) for name, value in chunk.items())
+            chunk = dict((name, value[n:]) for name, value in chunk.items())
+            self._learnChunk(part)
+            total_steps += n
+            episode_number += int(np.sum(part["terminal"]))
+
+            if total_steps == next_check or total_steps == self.max_steps:
+                next_check += check_interval
+                if batch:
+                    self.agent.batch_learn()
+                self.elapsed_time = deltaT(
+                    self.start_time) - self.total_eval_time
+                if visualize_learning:
+                    self.domain.showLearning(self.agent.representation)
+                self.evaluate(
+                    total_steps,
+                    episode_number,
+                    visualize_performance)
+                self.total_eval_time += deltaT(self.start_time) - \
+                    self.elapsed_time - \
+                    self.total_eval_time
+        self.logger.info("Total Experiment Duration %s" % (hhmmss(deltaT(self.start_time))))
@@ -6,5 +6,6 @@ from future import standard_library
 standard_library.install_aliases()
 from .Experiment import Experiment
 from .MDPSolverExperiment import MDPSolverExperiment
+from .OfflineExperiment import OfflineExperiment
 # for backward compatibility with existing experiment scripts
 OnlineExperiment = Experiment
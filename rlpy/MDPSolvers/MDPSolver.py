@@ -11,7 +11,8 @@ from abc import ABCMeta, abstractmethod
 import numpy as np
 import logging
 from copy import deepcopy
-from rlpy.Tools import className, deltaT, hhmmss, clock, l_norm, vec2id, checkNCreateDirectory
+from rlpy.Tools import className, deltaT, hhmmss, clock, l_norm, vec2id, checkNCreateDirectory, hasFunction
+from .TabularModel import TabularModel
 from collections import defaultdict
 import os
 import json
@@ -48,6 +49,11 @@ class MDPSolver(with_metaclass(ABCMeta, object)):
 
         show (bool):    Enable visualization?
 
+        compile_model (bool):   Compile the domain into a
+            :py:class:`~rlpy.MDPSolvers.TabularModel.TabularModel` and perform
+            the Bellman backups of all states at once, if the representation
+            is tabular and the domain implements ``expectedStep``.
+
     """
 
     representation = None  # Link to the representation object
@@ -73,10 +79,13 @@ class MDPSolver(with_metaclass(ABCMeta, object)):
     # planners may use this)
     log_interval = None
     show = None  # Show the learning if possible?
+    # Compiled model of the domain (see compileModel)
+    model = None
 
     def __init__(
             self, job_id, representation, domain, planning_time=np.inf,
-            convergence_threshold=.005, ns_samples=100, project_path='.', log_interval=5000, show=False):
+            convergence_threshold=.005, ns_samples=100, project_path='.', log_interval=5000, show=False,
+            compile_model=True):
         self.exp_id = job_id
         self.representation = representation
         self.domain = domain
@@ -87,6 +96,7 @@ class MDPSolver(with_metaclass(ABCMeta, object)):
         self.log_interval = log_interval
         self.show = show
         self.convergence_threshold = convergence_threshold
+        self.compile_model = compile_model
 
         # Set random seed for this job id
         np.random.seed(self.mainSeed)
@@ -134,6 +144,27 @@ class MDPSolver(with_metaclass(ABCMeta, object)):
         weight_vec_index = int(self.representation.agg_states_num * a + s_index)
         self.representation.weight_vec[weight_vec_index] = Q
 
+    def compileModel(self):
+        """
+        Returns the :py:class:`~rlpy.MDPSolvers.TabularModel.TabularModel` of
+        the domain over the states of the representation. The model is built
+        on the first call. Returns None if ``compile_model`` is off, the
+        representation is not tabular or the domain does not implement
+        ``expectedStep``; the solvers then sweep the states one by one.
+        """
+        if (not self.compile_model or
+                not self.IsTabularRepresentation() or
+                not hasFunction(self.domain, 'expectedStep')):
+            return None
+        if self.model is None:
+            start_time = clock()
+            self.model = TabularModel(self.representation)
+            self.logger.info(
+                'Compiled model with %d states and %d transitions in %s' %
+                (self.model.states_num, self.model.P.nnz,
+                 hhmmss(deltaT(start_time))))
+        return self.model
+
     def performanceRun(self):
         """Set Exploration to zero and sample one episode from the domain."""
 
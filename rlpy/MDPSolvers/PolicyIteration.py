@@ -47,11 +47,20 @@ class PolicyIteration(MDPSolver):
 
         max_PE_iterations (int):    Maximum number of Policy evaluation iterations to run.
 
+        compile_model (bool):   Back up all states at once with the compiled
+            model of the domain (see
+            :py:meth:`~rlpy.MDPSolvers.MDPSolver.MDPSolver.compileModel`).
+            Otherwise the state space is swept one state at a time.
+
+        direct_PE (bool):   Evaluate the policy exactly with a sparse linear
+            solve instead of iterated backups (requires a compiled model).
+
     """
 
     def __init__(
             self, job_id, representation, domain, planning_time=np.inf, convergence_threshold=.005,
-            ns_samples=100, project_path='.', log_interval=5000, show=False, max_PE_iterations=10):
+            ns_samples=100, project_path='.', log_interval=5000, show=False, max_PE_iterations=10,
+            compile_model=True, direct_PE=False):
         super(PolicyIteration, self).__init__(job_id,
                                              representation,
                                              domain,
@@ -60,8 +69,10 @@ class PolicyIteration(MDPSolver):
                                              ns_samples,
                                              project_path,
                                              log_interval,
-                                             show)
+                                             show,
+                                             compile_model)
         self.max_PE_iterations = max_PE_iterations
+        self.direct_PE = direct_PE
         self.bellmanUpdates = 0
         self.logger.info('Max PE Iterations:\t%d' % self.max_PE_iterations)
 
@@ -75,47 +86,67 @@ class PolicyIteration(MDPSolver):
         '''
         converged = False
         policy_evaluation_iteration = 0
+        model = self.model
+        if model is not None:
+            # the actions of the policy and the rows of the weight vector
+            # updated for the non-terminal states with possible actions
+            pi = model.greedyPolicy(policy.representation.weight_vec)
+            evaluated = ~model.terminal & model.possible_actions.any(axis=1)
+            rows = model.policyRows(pi)[evaluated]
         while (not converged and
                 self.hasTime() and
                 policy_evaluation_iteration < self.max_PE_iterations
                 ):
             policy_evaluation_iteration += 1
-
-            # Sweep The State Space
-            for i in range(0, self.representation.agg_states_num):
-
-                # Check for solver time
-                if not self.hasTime(): break
-
-                # Map an state ID to state
-                s = self.representation.stateID2state(i)
-
-                # Skip terminal states and states with no possible action
-                possible_actions = self.domain.possibleActions(s=s)
-                if (self.domain.isTerminal(s) or
-                    len(possible_actions) == 0):
-                    continue
-
-                # Apply Bellman Backup
-                self.BellmanBackup(
-                    s,
-                    policy.pi(s, False, possible_actions),
-                    self.ns_samples,
-                    policy)
-
-                # Update number of backups
-                self.bellmanUpdates += 1
-
-                # Check for the performance
-                if self.bellmanUpdates % self.log_interval == 0:
-                    performance_return = self.performanceRun()[0]
-                    self.logger.info(
-                        '[%s]: BellmanUpdates=%d, Return=%0.4f' %
-                        (hhmmss(deltaT(self.start_time)), self.bellmanUpdates, performance_return))
+            if model is not None:
+                if self.direct_PE:
+                    # Solve for the value of the policy directly
+                    self.representation.weight_vec[rows] = model.evaluatePolicy(
+                        self.representation.weight_vec, pi, evaluated)
+                else:
+                    # Back up the actions of the policy in all states at once
+                    Q = model.policyBackup(self.representation.weight_vec, pi)
+                    self.representation.weight_vec[rows] = Q[rows]
+                self.bellmanUpdates += len(rows)
+            else:
+                # Sweep The State Space
+                for i in range(0, self.representation.agg_states_num):
+
+                    # Check for solver time
+                    if not self.hasTime(): break
+
+                    # Map an state ID to state
+                    s = self.representation.stateID2state(i)
+
+                    # Skip terminal states and states with no possible action
+                    possible_actions = self.domain.possibleActions(s=s)
+                    if (self.domain.isTerminal(s) or
+                        len(possible_actions) == 0):
+                        continue
+
+                    # Apply Bellman Backup
+                    self.BellmanBackup(
+                        s,
+                        policy.pi(s, False, possible_actions),
+                        self.ns_samples,
+                        policy)
+
+                    # Update number of backups
+                    self.bellmanUpdates += 1
+
+                    # Check for the performance
+                    if self.bellmanUpdates % self.log_interval == 0:
+                        performance_return = self.performanceRun()[0]
+                        self.logger.info(
+                            '[%s]: BellmanUpdates=%d, Return=%0.4f' %
+                            (hhmmss(deltaT(self.start_time)), self.bellmanUpdates, performance_return))
 
             # check for convergence: L_infinity norm of the difference between the to the weight vector of representation
             weight_vec_change = l_norm(policy.representation.weight_vec - self.representation.weight_vec, np.inf)
             converged = weight_vec_change < self.convergence_threshold
+            if model is not None and self.direct_PE:
+                # the policy has been evaluated exactly
+                converged = True
 
             # Log Status
             self.logger.info(
@@ -124,10 +155,7 @@ class PolicyIteration(MDPSolver):
 
             # Show Plots
             if self.show:
-                self.domain.show(
-                                 policy.pi(s, False, possible_actions),
-                                 self.representation,
-                                 s=s)
+                self.domain.show(representation=self.representation)
         return converged
 
     def policyImprovement(self, policy):
@@ -135,17 +163,30 @@ class PolicyIteration(MDPSolver):
             Returns the new policy
         '''
         policyChanges = 0
-        i = 0
-        while i < self.representation.agg_states_num and self.hasTime():
-            s = self.representation.stateID2state(i)
-            if not self.domain.isTerminal(s) and len(self.domain.possibleActions(s)):
-                for a in self.domain.possibleActions(s):
-                    if not self.hasTime():
-                        break
-                    self.BellmanBackup(s, a, self.ns_samples, policy)
-                if policy.pi(s, False, self.domain.possibleActions(s=s)) != self.representation.bestAction(s, False, self.domain.possibleActions(s=s)):
-                    policyChanges += 1
-            i += 1
+        model = self.model
+        if model is not None:
+            pi = model.greedyPolicy(policy.representation.weight_vec)
+            improved = ~model.terminal & model.possible_actions.any(axis=1)
+            rows = model.valid & np.tile(improved, model.actions_num)
+            Q = model.policyBackup(self.representation.weight_vec, pi)
+            self.representation.weight_vec[rows] = Q[rows]
+            self.bellmanUpdates += int(rows.sum())
+            # the policy changes where its action is no longer a best action
+            V = model.values(self.representation.weight_vec)
+            pi_values = self.representation.weight_vec[model.policyRows(pi)]
+            policyChanges = int(np.sum(pi_values[improved] != V[improved]))
+        else:
+            i = 0
+            while i < self.representation.agg_states_num and self.hasTime():
+                s = self.representation.stateID2state(i)
+                if not self.domain.isTerminal(s) and len(self.domain.possibleActions(s)):
+                    for a in self.domain.possibleActions(s):
+                        if not self.hasTime():
+                            break
+                        self.BellmanBackup(s, a, self.ns_samples, policy)
+                    if policy.pi(s, False, self.domain.possibleActions(s=s)) != self.representation.bestAction(s, False, self.domain.possibleActions(s=s)):
+                        policyChanges += 1
+                i += 1
         # This will cause the policy to be copied over
         policy.representation.weight_vec = self.representation.weight_vec.copy()
         performance_return, performance_steps, performance_term, performance_discounted_return = self.performanceRun(
@@ -183,6 +224,8 @@ class PolicyIteration(MDPSolver):
             self.logger.error("Policy Iteration works only with a tabular representation.")
             return 0
 
+        self.compileModel()
+
         # Initialize the policy
         policy = eGreedy(
             deepcopy(self.representation),
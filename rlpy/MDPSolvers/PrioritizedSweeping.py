@@ -0,0 +1,154 @@
+"""Prioritized Sweeping
+Asynchronous value iteration that backs up the states with the largest
+Bellman error first.
+"""
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+from builtins import super
+from future import standard_library
+standard_library.install_aliases()
+from .MDPSolver import MDPSolver
+from rlpy.Tools import hhmmss, deltaT, clock, PriorityQueueWithNovelty
+import numpy as np
+
+__copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
+__credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
+               "William Dabney", "Jonathan P. How"]
+__license__ = "BSD 3-Clause"
+
+
+class PrioritizedSweeping(MDPSolver):
+
+    """Prioritized Sweeping MDP Solver [Moore and Atkeson, 1993].
+
+    Instead of sweeping through all states in a fixed order, the states are
+    kept in a priority queue keyed by an upper bound of their Bellman error.
+    The state with the largest error is backed up (Gauss-Seidel style) and
+    the priorities of its predecessors are increased by the resulting change
+    of its value, weighted by the discounted transition probability. States
+    whose value has converged are therefore not backed up again.
+
+    The solver runs on the compiled model of the domain (see
+    :py:meth:`~rlpy.MDPSolvers.MDPSolver.MDPSolver.compileModel`), so it
+    requires a tabular representation and a domain that implements
+    ``expectedStep``.
+
+    Args:
+        job_id (int):   Job ID number used for running multiple jobs on a cluster.
+
+        representation (Representation):    Representation used for the value function.
+
+        domain (Domain):    Domain (MDP) to solve.
+
+        planning_time (int):    Maximum amount of time in seconds allowed for planning. Defaults to inf (unlimited).
+
+        convergence_threshold (float):  The solver stops when no state has a
+            Bellman error above this threshold.
+
+        ns_samples (int):   How many samples of the successor states to take.
+
+        project_path (str): Output path for saving the results of running the MDPSolver on a domain.
+
+        log_interval (int): Number of state backups between displaying logged information.
+
+        show (bool):    Enable visualization?
+
+    .. seealso::
+        Andrew W. Moore and Christopher G. Atkeson.
+        Prioritized sweeping: Reinforcement learning with less data and less
+        time. Machine Learning, 13(1):103-130, 1993.
+    """
+
+    def solve(self):
+        """Solve the domain MDP."""
+
+        self.start_time = clock()  # Used to show the total time took the process
+        bellmanUpdates = 0  # used to track the performance improvement.
+        stateBackups = 0
+
+        # Check for Tabular Representation
+        if not self.IsTabularRepresentation():
+            self.logger.error("Prioritized Sweeping works only with a tabular representation.")
+            return 0
+
+        model = self.compileModel()
+        if model is None:
+            self.logger.error("Prioritized Sweeping requires a domain with expectedStep.")
+            return 0
+
+        predecessors = model.predecessors()
+        discount_factor = model.discount_factor
+        weight_vec = self.representation.weight_vec
+
+        # Start with one backup of all state-action pairs so that the
+        # Q-values of every state are consistent with the state values
+        Q = model.bellmanBackup(weight_vec)
+        weight_vec[model.valid] = Q[model.valid]
+        bellmanUpdates += int(model.valid.sum())
+        V = model.values(weight_vec)
+
+        # The priority of each state bounds its Bellman error. Entries of the
+        # queue whose priority is outdated are skipped when they are popped.
+        priority = np.abs(model.values(model.bellmanBackup(weight_vec)) - V)
+        queue = PriorityQueueWithNovelty()
+        for s in np.flatnonzero(priority > self.convergence_threshold):
+            queue.push(-priority[s], (s, priority[s]))
+
+        while not queue.empty() and self.hasTime():
+            s, p = queue.pop()
+            if p != priority[s]:
+                continue
+            priority[s] = 0.
+
+            # Back up the state
+            value = model.backupState(weight_vec, V, s)
+            change = abs(value - V[s])
+            V[s] = value
+            bellmanUpdates += int(model.possible_actions[s].sum())
+            stateBackups += 1
+
+            # Increase the Bellman error bound of the predecessors
+            start, end = predecessors.indptr[s], predecessors.indptr[s + 1]
+            for pred, prob in zip(predecessors.indices[start:end],
+                                  predecessors.data[start:end]):
+                priority[pred] += discount_factor * prob * change
+                if priority[pred] > self.convergence_threshold:
+                    queue.push(-priority[pred], (pred, priority[pred]))
+
+            # Create Log
+            if stateBackups % self.log_interval == 0:
+                self.logStats(bellmanUpdates, stateBackups,
+                              priority.max())
+
+        converged = priority.max() <= self.convergence_threshold
+        self.logStats(bellmanUpdates, stateBackups, priority.max())
+        if converged: self.logger.info('Converged!')
+        super(PrioritizedSweeping, self).solve()
+
+    def logStats(self, bellmanUpdates, stateBackups, max_priority):
+        """Runs a performance episode, logs it and stores the stats."""
+        performance_return, performance_steps, performance_term, performance_discounted_return = self.performanceRun()
+        self.logger.info(
+            '[%s]: BellmanUpdates=%d, StateBackups=%d, Max Priority=%0.4f, Return=%0.4f, Steps=%d' %
+            (hhmmss(deltaT(self.start_time)),
+             bellmanUpdates,
+             stateBackups,
+             max_priority,
+             performance_return,
+             performance_steps))
+
+        # Show the domain and value function
+        if self.show:
+            self.domain.show(representation=self.representation)
+
+        # store stats
+        self.result["bellman_updates"].append(bellmanUpdates)
+        self.result["state_backups"].append(stateBackups)
+        self.result["return"].append(performance_return)
+        self.result["planning_time"].append(deltaT(self.start_time))
+        self.result["num_features"].append(self.representation.features_num)
+        self.result["steps"].append(performance_steps)
+        self.result["terminated"].append(performance_term)
+        self.result["discounted_return"].append(performance_discounted_return)
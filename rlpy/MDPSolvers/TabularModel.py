@@ -0,0 +1,235 @@
+"""Explicit transition and reward model of a finite MDP"""
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+from future import standard_library
+standard_library.install_aliases()
+from builtins import range
+from builtins import object
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import spsolve
+
+__copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
+__credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
+               "William Dabney", "Jonathan P. How"]
+__license__ = "BSD 3-Clause"
+
+
+class TabularModel(object):
+
+    """
+    Transition and reward model of a domain compiled over the states of a
+    :py:class:`~rlpy.Representations.Tabular.Tabular` representation.
+
+    All states are enumerated once and ``expectedStep`` is called for every
+    possible state-action pair. The outcomes are stored as a sparse matrix
+    so that the Bellman backups of all state-action pairs can be done with
+    a single sparse matrix-vector product.
+
+    The rows of the model are indexed like the weight vector of the tabular
+    representation, i.e. ``a * states_num + s``, so a weight vector can be
+    used directly as the vector of Q-values.
+
+    Attributes:
+        states_num (int):   number of states of the representation.
+
+        actions_num (int):  number of actions of the domain.
+
+        possible_actions (ndarray):  ``states_num`` x ``actions_num`` boolean
+            array; True for the actions possible in a state.
+
+        terminal (ndarray): True for the terminal states.
+
+        valid (ndarray):    True for the rows of possible state-action pairs.
+
+        P (csr_matrix): (``actions_num * states_num``) x ``states_num``
+            matrix of the probabilities to reach each non-terminal next
+            state that has possible actions. The value of all other next
+            states is zero.
+
+        R (ndarray):    expected immediate reward of each row.
+
+        R_eval (ndarray):   expected immediate reward of each row, without
+            the transitions to states that do not have possible actions.
+            Policy evaluation skips such transitions entirely (see
+            :py:meth:`~rlpy.Representations.Representation.Representation.Q_oneStepLookAhead`).
+
+    """
+
+    def __init__(self, representation):
+        """
+        :param representation: the tabular representation whose states are
+            enumerated. Its domain has to implement ``expectedStep``.
+        """
+        domain = representation.domain
+        self.discount_factor = domain.discount_factor
+        self.states_num = S = int(representation.agg_states_num)
+        self.actions_num = A = int(domain.actions_num)
+        self.possible_actions = np.zeros((S, A), dtype=bool)
+        self.terminal = np.zeros(S, dtype=bool)
+
+        rows, probs, rewards, next_states, terminals = [], [], [], [], []
+        for i in range(S):
+            s = representation.stateID2state(i)
+            p_actions = np.asarray(domain.possibleActions(s), dtype=int)
+            self.possible_actions[i, p_actions] = True
+            self.terminal[i] = domain.isTerminal(s)
+            for a in p_actions:
+                p, r, ns, t, _ = domain.expectedStep(s, a)
+                rows.append(np.repeat(a * S + i, len(p)))
+                probs.append(np.ravel(p))
+                rewards.append(np.ravel(r))
+                next_states.append(np.reshape(ns, (len(p), -1)))
+                terminals.append(np.ravel(t))
+        self.valid = self.possible_actions.T.ravel()
+
+        if len(rows) == 0:
+            self.P = sp.csr_matrix((A * S, S))
+            self.R = np.zeros(A * S)
+            self.R_eval = np.zeros(A * S)
+            return
+        rows = np.hstack(rows)
+        probs = np.hstack(probs).astype(float)
+        expected_rewards = probs * np.hstack(rewards)
+        ns_ids = representation.hashStates(np.vstack(next_states))
+        terminals = np.hstack(terminals).astype(bool)
+
+        has_actions = self.possible_actions[ns_ids].any(axis=1)
+        cont = has_actions & ~terminals
+        # duplicate entries are summed up by the conversion to csr
+        self.P = sp.coo_matrix((probs[cont], (rows[cont], ns_ids[cont])),
+                               shape=(A * S, S)).tocsr()
+        self.R = np.bincount(rows, weights=expected_rewards, minlength=A * S)
+        self.R_eval = np.bincount(rows[has_actions],
+                                  weights=expected_rewards[has_actions],
+                                  minlength=A * S)
+
+    def values(self, Q):
+        """
+        :param Q: the Q-values of all rows (e.g. the weight vector).
+
+        :return: the value of each state, i.e. the maximum Q-value over the
+            possible actions (0 for states without possible actions).
+        """
+        Qs = np.where(self.possible_actions,
+                      np.reshape(Q, (self.actions_num, self.states_num)).T,
+                      -np.inf)
+        V = Qs.max(axis=1)
+        V[~self.possible_actions.any(axis=1)] = 0
+        return V
+
+    def greedyPolicy(self, Q):
+        """
+        :param Q: the Q-values of all rows (e.g. the weight vector).
+
+        :return: the greedy action of each state. Ties are broken in favor
+            of the action with the smallest id as in
+            :py:class:`~rlpy.Policies.eGreedy.eGreedy` with
+            ``forcedDeterministicAmongBestActions``. States without possible
+            actions get action 0.
+        """
+        Qs = np.where(self.possible_actions,
+                      np.reshape(Q, (self.actions_num, self.states_num)).T,
+                      -np.inf)
+        return Qs.argmax(axis=1)
+
+    def backupState(self, Q, V, s):
+        """
+        Applies the Bellman optimality backup to the possible actions of the
+        single state *s* in place.
+
+        :param Q: the Q-values of all rows, updated in place.
+        :param V: the values of all states (see :py:meth:`values`) used for
+            the next states.
+        :param s: the id of the state.
+
+        :return: the new value of *s* (0 if it has no possible actions).
+        """
+        P = self.P
+        value = -np.inf
+        for a in np.flatnonzero(self.possible_actions[s]):
+            row = a * self.states_num + s
+            start, end = P.indptr[row], P.indptr[row + 1]
+            Q[row] = self.R[row] + self.discount_factor * \
+                np.dot(P.data[start:end], V[P.indices[start:end]])
+            value = max(value, Q[row])
+        return value if value > -np.inf else 0.
+
+    def predecessors(self):
+        """
+        :return: a ``states_num`` x ``states_num`` csr matrix whose row *s*
+            holds the predecessors of state *s*, i.e. the states from which
+            *s* can be reached in one step. The entries are the largest
+            transition probability to *s* over the actions of the
+            predecessor.
+        """
+        P = self.P.tocoo()
+        S = self.states_num
+        predecessor = P.row % S
+        # largest probability of each (successor, predecessor) pair
+        keys = P.col.astype(np.int64) * S + predecessor
+        order = np.argsort(keys, kind="mergesort")
+        keys = keys[order]
+        if len(keys) == 0:
+            return sp.csr_matrix((S, S))
+        starts = np.flatnonzero(np.hstack(([True], keys[1:] != keys[:-1])))
+        data = np.maximum.reduceat(P.data[order], starts)
+        keys = keys[starts]
+        return sp.csr_matrix((data, (keys // S, keys % S)), shape=(S, S))
+
+    def policyRows(self, policy):
+        """
+        :param policy: an action for every state.
+
+        :return: the row of the state-action pair (s, policy[s]) of each state.
+        """
+        return np.asarray(policy) * self.states_num + np.arange(self.states_num)
+
+    def bellmanBackup(self, Q):
+        """
+        Applies the Bellman optimality backup to all rows at once:
+        ``Q(s,a) = E[r + discount_factor * V(s')]``.
+
+        :param Q: the current Q-values of all rows.
+
+        :return: the backed up Q-values (only meaningful for valid rows).
+        """
+        return self.R + self.discount_factor * (self.P * self.values(Q))
+
+    def policyBackup(self, Q, policy):
+        """
+        Applies the Bellman backup for a fixed policy to all rows at once:
+        ``Q(s,a) = E[r + discount_factor * Q(s', policy(s'))]``.
+
+        :param Q: the current Q-values of all rows.
+        :param policy: the action of the policy in every state.
+
+        :return: the backed up Q-values (only meaningful for valid rows).
+        """
+        Q_pi = np.asarray(Q)[self.policyRows(policy)]
+        return self.R_eval + self.discount_factor * (self.P * Q_pi)
+
+    def evaluatePolicy(self, Q, policy, states):
+        """
+        Computes the fixed point of :py:meth:`policyBackup` for the rows of
+        the policy in *states* with a direct sparse linear solve. The
+        Q-values of all other rows are treated as constants.
+
+        :param Q: the current Q-values of all rows.
+        :param policy: the action of the policy in every state.
+        :param states: boolean mask of the states to evaluate.
+
+        :return: the Q-values of the rows ``policyRows(policy)[states]``.
+        """
+        Q_pi = np.asarray(Q)[self.policyRows(policy)]
+        rows = self.policyRows(policy)[states]
+        P_pi = self.P[rows]
+        P_in = P_pi[:, states]
+        # contribution of the states that are not evaluated
+        b = self.R_eval[rows] + self.discount_factor * \
+            (P_pi[:, ~states] * Q_pi[~states])
+        M = sp.identity(len(rows), format="csc") - \
+            self.discount_factor * P_in.tocsc()
+        return np.atleast_1d(spsolve(M, b))
@@ -17,7 +17,7 @@ from future import standard_library
 standard_library.install_aliases()
 from builtins import range
 from .MDPSolver import MDPSolver
-from rlpy.Tools import className, hhmmss, deltaT, randSet, hasFunction, solveLinear, regularize, clock, padZeros, l_norm
+from rlpy.Tools import className, hhmmss, deltaT, randSet, hasFunction, linearSolver, regularize, clock, padZeros, l_norm
 from rlpy.Policies import eGreedy
 import numpy as np
 from copy import deepcopy
@@ -56,6 +56,10 @@ class TrajectoryBasedPolicyIteration(MDPSolver):
 
         max_PE_iterations (int):    Maximum number of Policy evaluation iterations to run.
 
+        solver (str or LinearSolver):   Solver of the policy evaluation systems (see
+        :py:func:`~rlpy.Tools.LinearSolvers.linearSolver`). Iterative solvers start from the current weights.
+        "cholesky" and "cg" need a symmetric positive definite A.
+
     """
 
     # Probability of taking a random action during each decision making
@@ -71,7 +75,7 @@ class TrajectoryBasedPolicyIteration(MDPSolver):
 
     def __init__(
             self, job_id, representation, domain, planning_time=np.inf, convergence_threshold=.005,
-            ns_samples=100, project_path='.', log_interval=500, show=False, epsilon=.1, max_PE_iterations=10):
+            ns_samples=100, project_path='.', log_interval=500, show=False, epsilon=.1, max_PE_iterations=10, solver=None):
         super(
             TrajectoryBasedPolicyIteration,
             self).__init__(job_id,
@@ -86,6 +90,7 @@ class TrajectoryBasedPolicyIteration(MDPSolver):
 
         self.epsilon = epsilon
         self.max_PE_iterations = max_PE_iterations
+        self.solver = linearSolver(solver)
         if self.IsTabularRepresentation(): self.alpha = 1
 
     def sample_ns_na(self, policy, action=None, start_trajectory=False):
@@ -263,7 +268,8 @@ class TrajectoryBasedPolicyIteration(MDPSolver):
                 self.b += phi_s_a * R[i, 0]
 
             #  3. calculate new_weight_vec, and delta_weight_vec
-            new_weight_vec, solve_time = solveLinear(regularize(self.A), self.b)
+            new_weight_vec, solve_time = self.solver.solve(
+                regularize(self.A), self.b, x0=self.representation.weight_vec)
             iteration += 1
             if solve_time > 1:
                 self.logger.info(
@@ -43,6 +43,11 @@ class ValueIteration(MDPSolver):
 
         show (bool):    Enable visualization?
 
+        compile_model (bool):   Back up all states at once with the compiled
+            model of the domain (see
+            :py:meth:`~rlpy.MDPSolvers.MDPSolver.MDPSolver.compileModel`).
+            Otherwise the state space is swept one state at a time.
+
     .. warning::
 
         THE CURRENT IMPLEMENTATION ASSUMES *DETERMINISTIC* TRANSITIONS:
@@ -66,6 +71,7 @@ class ValueIteration(MDPSolver):
             return 0
 
         no_of_states = self.representation.agg_states_num
+        model = self.compileModel()
 
         while self.hasTime() and not converged:
 
@@ -74,26 +80,32 @@ class ValueIteration(MDPSolver):
             # Store the weight vector for comparison
             prev_weight_vec = self.representation.weight_vec.copy()
 
-            # Sweep The State Space
-            for i in range(no_of_states):
+            if model is not None:
+                # Back up all possible state-action pairs at once
+                Q = model.bellmanBackup(prev_weight_vec)
+                self.representation.weight_vec[model.valid] = Q[model.valid]
+                bellmanUpdates += int(model.valid.sum())
+            else:
+                # Sweep The State Space
+                for i in range(no_of_states):
 
-                s = self.representation.stateID2state(i)
+                    s = self.representation.stateID2state(i)
 
-                # Sweep through possible actions
-                for a in self.domain.possibleActions(s):
+                    # Sweep through possible actions
+                    for a in self.domain.possibleActions(s):
 
-                    # Check for available planning time
-                    if not self.hasTime(): break
+                        # Check for available planning time
+                        if not self.hasTime(): break
 
-                    self.BellmanBackup(s, a, ns_samples=self.ns_samples)
-                    bellmanUpdates += 1
+                        self.BellmanBackup(s, a, ns_samples=self.ns_samples)
+                        bellmanUpdates += 1
 
-                    # Create Log
-                    if bellmanUpdates % self.log_interval == 0:
-                        performance_return, _, _, _ = self.performanceRun()
-                        self.logger.info(
-                            '[%s]: BellmanUpdates=%d, Return=%0.4f' %
-                            (hhmmss(deltaT(self.start_time)), bellmanUpdates, performance_return))
+                        # Create Log
+                        if bellmanUpdates % self.log_interval == 0:
+                            performance_return, _, _, _ = self.performanceRun()
+                            self.logger.info(
+                                '[%s]: BellmanUpdates=%d, Return=%0.4f' %
+                                (hhmmss(deltaT(self.start_time)), bellmanUpdates, performance_return))
 
             # check for convergence
             weight_vec_change = l_norm(prev_weight_vec - self.representation.weight_vec, np.inf)
@@ -111,7 +123,7 @@ class ValueIteration(MDPSolver):
 
             # Show the domain and value function
             if self.show:
-                self.domain.show(a, s=s, representation=self.representation)
+                self.domain.show(representation=self.representation)
 
             # store stats
             self.result["bellman_updates"].append(bellmanUpdates)
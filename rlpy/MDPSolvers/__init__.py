@@ -4,7 +4,12 @@ from __future__ import division
 from __future__ import absolute_import
 from future import standard_library
 standard_library.install_aliases()
-from .ValueIteration import ValueIteration
-from .PolicyIteration import PolicyIteration
-from .TrajectoryBasedValueIteration import TrajectoryBasedValueIteration
-from .TrajectoryBasedPolicyIteration import TrajectoryBasedPolicyIteration
+from rlpy.Tools.GeneralTools import lazyPackage
+
+# each solver is imported when it is first used
+lazyPackage(__name__, {
+    "ValueIteration": ".ValueIteration",
+    "PolicyIteration": ".PolicyIteration",
+    "PrioritizedSweeping": ".PrioritizedSweeping",
+    "TrajectoryBasedValueIteration": ".TrajectoryBasedValueIteration",
+    "TrajectoryBasedPolicyIteration": ".TrajectoryBasedPolicyIteration"})
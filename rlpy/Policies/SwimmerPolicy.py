@@ -8,7 +8,6 @@ standard_library.install_aliases()
 from .Policy import Policy
 
 import numpy as np
-from scipy.io import loadmat
 from rlpy.Tools import __rlpy_location__, cartesian
 import os
 
@@ -34,6 +33,8 @@ class SwimmerPolicy(Policy):
     def __init__(self, representation,
                  filename=default_location, epsilon=0.1, seed=1):
         super(SwimmerPolicy, self).__init__(representation, seed)
+        # scipy.io is slow to import and only needed here
+        from scipy.io import loadmat
         E = loadmat(filename)["E"]
         self.locs = E["Locs"][0][0]
         self.nlocs = E["Nlocs"][0][0]
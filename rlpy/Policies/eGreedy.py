@@ -55,6 +55,40 @@ class eGreedy(Policy):
             else:
                 return self.random_state.choice(b_actions)
 
+    def pi_batch(self, S, terminal, p_actions):
+        """
+        Batch version of :py:meth:`pi`, which selects the actions of many
+        states with a single evaluation of the Q-values
+        (see :py:meth:`~rlpy.Representations.Representation.Representation.Qs_batch`).
+
+        :param S: the states, one per row.
+        :param terminal: boolean array of the terminal flags of the states.
+        :param p_actions: *p* x *|A|* boolean mask of the possible actions.
+
+        :return: the selected action of each state.
+        """
+        p_actions = np.asarray(p_actions, dtype=bool)
+        p = len(p_actions)
+        Qs = self.representation.Qs_batch(S, terminal)
+        Qs = np.where(p_actions, Qs, -np.inf)
+        b_actions = p_actions & (Qs == Qs.max(axis=1)[:, None])
+        if self.forcedDeterministicAmongBestActions:
+            actions = np.argmax(b_actions, axis=1)
+        else:
+            actions = self._randomChoice(b_actions)
+        coin = self.random_state.rand(p) < self.epsilon
+        if coin.any():
+            actions[coin] = self._randomChoice(p_actions[coin])
+        return actions
+
+    def _randomChoice(self, mask):
+        """
+        :return: for each row of the boolean array *mask*, a column chosen
+            uniformly at random among the True entries.
+        """
+        return np.argmax(np.where(mask, self.random_state.rand(*mask.shape), -1),
+                         axis=1)
+
     def prob(self, s, terminal, p_actions):
         p = old_div(np.ones(len(p_actions)), len(p_actions))
         p *= self.epsilon
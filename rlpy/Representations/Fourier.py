@@ -57,6 +57,11 @@ class Fourier(Representation):
         norm_state = old_div((s - s_min), (s_max - s_min))
         return cos(pi * dot(self.coeffs, norm_state))
 
+    def phi_batch_nonTerminal(self, S):
+        s_min, s_max = self.domain.statespace_limits.T
+        norm_states = old_div((S - s_min), (s_max - s_min))
+        return cos(pi * dot(norm_states, self.coeffs.T))
+
     def featureType(self):
         return float
 
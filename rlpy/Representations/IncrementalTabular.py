@@ -48,6 +48,12 @@ class IncrementalTabular(Representation):
             F_s[hashVal] = 1
         return F_s
 
+    def phi_active_nonTerminal(self, s):
+        hashVal = self.hash.get(self.hashState(s))
+        if hashVal is None:
+            return np.zeros(0, dtype=int), np.zeros(0)
+        return np.array([hashVal], dtype=int), np.ones(1)
+
     def pre_discover(self, s, terminal, a, sn, terminaln):
         return self._add_state(s) + self._add_state(sn)
 
@@ -49,6 +49,13 @@ class IndependentDiscretization(Representation):
         F_s[self.activeInitialFeatures(s)] = 1
         return F_s
 
+    def phi_active_nonTerminal(self, s):
+        indices = self.activeInitialFeatures(s).astype(int)
+        return indices, np.ones(len(indices))
+
+    def phi_batch_nonTerminal(self, S):
+        return self._activeBatchToCSR(self.activeInitialFeaturesBatch(S))
+
     def getDimNumber(self, f):
         # Returns the dimension number corresponding to this feature
         dim = np.searchsorted(self.maxFeatureIDperDimension, f)
@@ -66,6 +66,12 @@ class IndependentDiscretizationCompactBinary(Representation):
             F_s[-1] = 1  # Activate the last feature
         return F_s
 
+    def phi_active_nonTerminal(self, s):
+        indices = self.activeInitialFeaturesCompactBinary(s).astype(int)
+        if not len(indices):
+            indices = np.array([self.features_num - 1])  # the last feature
+        return indices, np.ones(len(indices))
+
     def activeInitialFeaturesCompactBinary(self, s):
         """
         Same as :py:meth:`~rlpy.Representations.Representation.activeInitialFeatures`
@@ -14,8 +14,7 @@ from builtins import object
 import numpy as np
 from .Representation import Representation
 from itertools import combinations
-from rlpy.Tools import addNewElementForAllActions, PriorityQueueWithNovelty
-import matplotlib.pyplot as plt
+from rlpy.Tools import PriorityQueueWithNovelty, plt
 
 __copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
 __credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
@@ -103,6 +102,7 @@ class KernelizediFDD(Representation):
         self.features = []
         self.base_features_ids = []
         self.max_relevance = 0.
+        self.isDynamic = True
     def show_features(self):
         l = self.sorted_ids.toList()[:]
         key = lambda x: (
@@ -434,14 +434,9 @@ class KernelizediFDD(Representation):
 
         # add parameter dimension
         if self.normalization:
-            self.weight_vec = addNewElementForAllActions(
-                self.weight_vec,
-                self.domain.actions_num,
-                Q)
+            self.addNewWeight(Q)
         else:
-            self.weight_vec = addNewElementForAllActions(
-                self.weight_vec,
-                self.domain.actions_num)
+            self.addNewWeight()
         return self.features_num - 1
 
     def add_refined_feature(self, index1, index2, Q):
@@ -486,14 +481,9 @@ class KernelizediFDD(Representation):
         self.logger.debug("{} candidates".format(len(self.candidates)))
         self.features_num += 1
         if self.normalization:
-            self.weight_vec = addNewElementForAllActions(
-                self.weight_vec,
-                self.domain.actions_num,
-                Q)
+            self.addNewWeight(Q)
         else:
-            self.weight_vec = addNewElementForAllActions(
-                self.weight_vec,
-                self.domain.actions_num)
+            self.addNewWeight()
 
         return self.features_num - 1
 
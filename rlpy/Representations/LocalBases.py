@@ -14,13 +14,13 @@ from builtins import range
 from past.utils import old_div
 from .Representation import Representation
 import numpy as np
-from rlpy.Tools.GeneralTools import addNewElementForAllActions
-import matplotlib.pyplot as plt
+from rlpy.Tools import plt
 try:
     from .kernels import batch
 except ImportError:
     from .slow_kernels import batch
     print("C-Extensions for kernels not available, expect slow runtime")
+from .slow_kernels import states_batch
 
 __copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
 __credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
@@ -48,6 +48,7 @@ class LocalBases(Representation):
         
         """
         self.kernel = batch[kernel.__name__]
+        self.states_kernel = states_batch[kernel.__name__]
         self.normalization = normalization
         self.centers = np.zeros((0, domain.statespace_limits.shape[0]))
         self.widths = np.zeros((0, domain.statespace_limits.shape[0]))
@@ -60,6 +61,21 @@ class LocalBases(Representation):
             v /= v.sum()
         return v
 
+    def phi_batch_nonTerminal(self, S):
+        S = np.asarray(S, dtype=float)
+        Phi = np.zeros((len(S), self.features_num))
+        # evaluate the kernels for chunks of states to bound the size of the
+        # temporary (states x centers x dimensions) array
+        chunk = max(1, old_div(2 ** 20, max(1, self.centers.size)))
+        for i in range(0, len(S), chunk):
+            Phi[i:i + chunk] = self.states_kernel(
+                S[i:i + chunk], self.centers, self.widths)
+        if self.normalization:
+            sums = Phi.sum(axis=1)
+            nonzero = sums != 0.
+            Phi[nonzero] /= sums[nonzero, np.newaxis]
+        return Phi
+
     def plot_2d_feature_centers(self, d1=None, d2=None):
         """
         :param d1: 1 (of 2 possible) indices of dimensions to plot; ignore all 
@@ -104,6 +120,7 @@ class NonparametricLocalBases(LocalBases):
         self.common_width = old_div((domain.statespace_limits[:, 1]
                              - domain.statespace_limits[:, 0]), resolution)
         self.features_num = 0
+        self.isDynamic = True
         super(
             NonparametricLocalBases,
             self).__init__(
@@ -134,10 +151,7 @@ class NonparametricLocalBases(LocalBases):
         self.widths = np.vstack((self.widths, self.common_width))
         # TODO if normalized, use Q estimate for center to fill weight_vec
         new = np.zeros((self.domain.actions_num, 1))
-        self.weight_vec = addNewElementForAllActions(
-            self.weight_vec,
-            self.domain.actions_num,
-            new)
+        self.addNewWeight(new)
 
 
 class RandomLocalBases(LocalBases):
@@ -12,6 +12,7 @@ from builtins import range
 from past.utils import old_div
 from .Representation import Representation
 import numpy as np
+import scipy.sparse as sp
 from .iFDD import iFDD
 from rlpy.Tools import className, plt
 from copy import deepcopy
@@ -123,22 +124,33 @@ class OMPTD(Representation):
         execution.  (In the feature matrix, each column is a feature function, 
         each row is a state; thus the matrix has rows phi(s1)', phi(s2)', ...).
 
+        """
+        self.fullphi = self._normalizedFullPhi(states).toarray()
+
+    def _normalizedFullPhi(self, states):
+        """
+        Returns the sparse feature matrix of all features in the bag
+        (selected or not) for *states*, with each feature (column)
+        normalized to unit L2-Norm.
         """
         p = len(states)
-        self.fullphi = np.empty((p, self.totalFeatureSize))
         o_s = self.domain.state
+        nonTerminal = np.zeros(p, dtype=bool)
         for i, s in enumerate(states):
             self.domain.state = s
-            if not self.domain.isTerminal(s):
-                self.fullphi[i, :] = self.iFDD.phi_nonTerminal(s)
+            nonTerminal[i] = not self.domain.isTerminal(s)
         self.domain.state = o_s
+        phi = sp.csr_matrix((p, self.totalFeatureSize))
+        if np.any(nonTerminal):
+            phi_nt = sp.coo_matrix(self.iFDD.phi_batch_nonTerminal(
+                np.asarray(states)[nonTerminal]))
+            phi = sp.csr_matrix(
+                (phi_nt.data, (np.flatnonzero(nonTerminal)[phi_nt.row], phi_nt.col)),
+                shape=(p, self.totalFeatureSize))
         # Normalize features
-        for f in range(self.totalFeatureSize):
-            phi_f = self.fullphi[:, f]
-            norm_phi_f = np.linalg.norm(phi_f)    # L2-Norm of phi_f
-            if norm_phi_f == 0:
-                norm_phi_f = 1          # This helps to avoid divide by zero
-            self.fullphi[:, f] = old_div(phi_f, norm_phi_f)
+        norm_phi = np.sqrt(np.asarray(phi.multiply(phi).sum(axis=0)).ravel())
+        norm_phi[norm_phi == 0] = 1  # This helps to avoid divide by zero
+        return phi * sp.diags(old_div(1., norm_phi))
 
     def batchDiscover(self, td_errors, phi, states):
         """
@@ -160,12 +172,8 @@ class OMPTD(Representation):
             return False
 
         SHOW_RELEVANCES = 0      # Plot the relevances
-        self.calculateFullPhiNormalized(states)
-
-        relevances = np.zeros(len(self.remainingFeatures))
-        for i, f in enumerate(self.remainingFeatures):
-            phi_f = self.fullphi[:, f]
-            relevances[i] = np.abs(np.dot(phi_f, td_errors))
+        fullphi = self._normalizedFullPhi(states)[:, self.remainingFeatures]
+        relevances = np.abs(fullphi.T * np.asarray(td_errors, dtype=float).ravel())
 
         if SHOW_RELEVANCES:
             e_vec = relevances.flatten()
@@ -132,6 +132,25 @@ class RBF(Representation):
             F_s /= F_s.sum()
         return F_s
 
+    def phi_batch_nonTerminal(self, S):
+        Phi = np.ones((len(S), self.features_num))
+        if self.state_dimensions is not None:
+            S = S[:, self.state_dimensions]
+        # evaluate the RBFs for chunks of states to bound the size of the
+        # temporary (states x rbfs x dimensions) array
+        chunk = max(1, old_div(2 ** 20, max(1, self.rbfs_mu.size)))
+        for i in range(0, len(S), chunk):
+            diff = old_div((S[i:i + chunk, np.newaxis, :] - self.rbfs_mu),
+                           self.rbfs_sigma)
+            exponent = np.sum(0.5 * diff ** 2, axis=2)
+            Phi[i:i + chunk, :self.num_rbfs] = np.exp(-exponent)
+
+        if self.normalize:
+            sums = Phi.sum(axis=1)
+            nonzero = sums != 0.
+            Phi[nonzero] /= sums[nonzero, np.newaxis]
+        return Phi
+
     def _uniformRBFs(self, bins_per_dimension, domain, includeBorders=False):
         """
         :param bins_per_dimension: Determines the number of RBFs to place
@@ -12,7 +12,8 @@ from builtins import object
 from past.utils import old_div
 import logging
 from copy import deepcopy
-from rlpy.Tools import className, addNewElementForAllActions
+from collections import OrderedDict
+from rlpy.Tools import className, WeightBuffer
 from rlpy.Tools import vec2id, bin2state, findElemArray1D
 from rlpy.Tools import hasFunction, id2vec, closestDiscretization
 import scipy.sparse as sp
@@ -87,6 +88,16 @@ class Representation(object):
     isDynamic = False
     #: A dictionary used to cache expected results of step(). Used for planning algorithms
     expectedStepCached = None
+    #: Number of recently visited states whose features are kept in the
+    #: feature cache (see :py:meth:`~rlpy.Representations.Representation.Representation.phi`).
+    #: Set to 0 to disable the cache.
+    feature_cache_size = 4
+    # maps the most recent states to their [phi, (indices, values)]
+    _feature_cache = None
+    # number of features when the entries of the feature cache were computed
+    _feature_cache_features_num = None
+    # growable storage of weight_vec used by addNewWeight
+    _weight_buffer = None
 
     def __init__(self, domain, discretization=20, seed=1):
         """
@@ -189,6 +200,52 @@ class Representation(object):
         # stacks phi_s in cache
         return Q
 
+    def Qs_active(self, s, terminal, active=None):
+        """
+        Sparse counterpart of
+        :py:meth:`~rlpy.Representations.Representation.Representation.Qs`.
+        Only the weight columns of the active features are touched, so the
+        cost is proportional to the number of active features times the
+        number of actions.
+
+        :param s: The queried state
+        :param terminal: Whether or not *s* is a terminal state
+        :param active: (optional) The tuple (indices, values) returned by
+            :py:meth:`~rlpy.Representations.Representation.Representation.phi_active`.
+            If it has already been computed, pass it here so that it need
+            not be computed again.
+
+        :return: an array of Q(s,a), the values of each action at *s*.
+        """
+        if active is None:
+            active = self.phi_active(s, terminal)
+        indices, values = active
+        if len(indices) == 0:
+            return np.zeros((self.actions_num))
+        weight_vec_prime = self.weight_vec.reshape(-1, self.features_num)
+        return np.dot(weight_vec_prime[:, indices], values)
+
+    def Qs_batch(self, S, terminal_mask=None, phi_S=None):
+        """
+        Batch version of
+        :py:meth:`~rlpy.Representations.Representation.Representation.Qs`.
+
+        :param S: The queried states, one per row.
+        :param terminal_mask: (optional) boolean array marking the terminal
+            states, whose Q-values are zero.
+        :param phi_S: (optional) The feature matrix of the states as returned
+            by :py:meth:`~rlpy.Representations.Representation.Representation.phi_batch`.
+
+        :return: *p* x *|A|* array of the Q-values of all actions in each state.
+        """
+        if phi_S is None:
+            phi_S = self.phi_batch(S, terminal_mask, use_sparse=True)
+        if self.features_num == 0:
+            return np.zeros((phi_S.shape[0], self.actions_num))
+        weight_vec_prime = self.weight_vec.reshape(-1, self.features_num)
+        Q = phi_S.dot(weight_vec_prime.T)
+        return np.asarray(Q)
+
     def Q(self, s, terminal, a, phi_s=None):
         """ Returns the learned value of a state-action pair, *Q(s,a)*.
 
@@ -228,8 +285,189 @@ class Representation(object):
         """
         if terminal or self.features_num == 0:
             return np.zeros(self.features_num, 'bool')
-        else:
+        entry = self._featureCacheEntry(s)
+        if entry is None:
             return self.phi_nonTerminal(s)
+        if entry[0] is None:
+            if entry[1] is not None:
+                phi_s = np.zeros(self.features_num)
+                phi_s[entry[1][0]] = entry[1][1]
+            else:
+                phi_s = self.phi_nonTerminal(s)
+            phi_s.flags.writeable = False
+            entry[0] = phi_s
+        return entry[0]
+
+    def phi_active(self, s, terminal):
+        """
+        Returns the sparse form of
+        :py:meth:`~rlpy.Representations.Representation.Representation.phi`,
+        i.e. only the indices and values of the nonzero features at *s*.
+        Most representations (Tabular, TileCoding, iFDD, ...) activate only
+        a handful of features, so learning algorithms that work on this form
+        scale with the number of active features instead of ``features_num``.
+
+        :param s: The state for which to compute the active features
+        :param terminal: Whether or not *s* is a terminal state
+
+        :return: The tuple (indices, values) where ``indices`` is an integer
+            array of the active feature ids (without duplicates) and
+            ``values`` is a float array of the corresponding feature values.
+            Both arrays are empty in a terminal state.
+        """
+        if terminal or self.features_num == 0:
+            return np.zeros(0, dtype=int), np.zeros(0)
+        entry = self._featureCacheEntry(s)
+        if entry is None:
+            return self.phi_active_nonTerminal(s)
+        if entry[1] is None:
+            if entry[0] is not None:
+                indices = entry[0].nonzero()[0]
+                values = entry[0][indices].astype(float)
+            else:
+                indices, values = self.phi_active_nonTerminal(s)
+            indices.flags.writeable = False
+            values.flags.writeable = False
+            entry[1] = (indices, values)
+        return entry[1]
+
+    def _featureCacheEntry(self, s):
+        """
+        Returns the entry [phi, (indices, values)] of the feature cache for
+        state *s*, creating an empty one if *s* has not been seen recently.
+        Within one step of an :py:class:`~rlpy.Experiments.Experiment.Experiment`
+        the policy and the agent query the features of the same states, so
+        they share these entries instead of computing the features again.
+        Entries are keyed by the value of the state and are dropped whenever
+        the number of features changes.
+
+        :return: the cache entry (a list), or None if the cache is disabled.
+        """
+        if not self.feature_cache_size:
+            return None
+        if self._feature_cache is None or \
+                self._feature_cache_features_num != self.features_num:
+            self.clearFeatureCache()
+        s = np.asarray(s)
+        key = (s.dtype.char, s.shape, s.tobytes())
+        cache = self._feature_cache
+        entry = cache.get(key)
+        if entry is None:
+            if len(cache) >= self.feature_cache_size:
+                cache.popitem(last=False)
+            entry = [None, None]
+            cache[key] = entry
+        return entry
+
+    def clearFeatureCache(self):
+        """
+        Empties the feature cache. Representations have to call this
+        method whenever the features of already visited states change without
+        a change of ``features_num``.
+        """
+        self._feature_cache = OrderedDict()
+        self._feature_cache_features_num = self.features_num
+
+    def phi_active_nonTerminal(self, s):
+        """
+        Returns the active features of
+        :py:meth:`~rlpy.Representations.Representation.Representation.phi_nonTerminal`
+        as the tuple (indices, values); see
+        :py:meth:`~rlpy.Representations.Representation.Representation.phi_active`.
+
+        The default implementation builds the dense feature vector and
+        extracts its nonzero entries. Representations that can find their
+        active features directly should override this method.
+
+        :param s: The given state
+
+        :return: The tuple (indices, values) of the active features at *s*.
+        """
+        phi_s = self.phi_nonTerminal(s)
+        indices = phi_s.nonzero()[0]
+        return indices, phi_s[indices].astype(float)
+
+    def phi_batch(self, S, terminal_mask=None, use_sparse=False):
+        """
+        Returns the feature vectors of a batch of states, i.e. the batch
+        version of :py:meth:`~rlpy.Representations.Representation.Representation.phi`.
+
+        :param S: The states, one per row (*p* x *d*).
+        :param terminal_mask: (optional) boolean array of length *p* marking
+            the terminal states, whose feature vectors are zero.
+        :param use_sparse: If True, return a ``scipy.sparse.csr_matrix``.
+
+        :return: The *p* x *n* matrix of feature vectors (one row per state),
+            a dense float array or a CSR matrix depending on *use_sparse*.
+        """
+        S = np.asarray(S)
+        if S.ndim == 1:
+            S = S.reshape(-1, self.state_space_dims)
+        p, n = S.shape[0], self.features_num
+        if terminal_mask is None:
+            rows = np.arange(p)
+        else:
+            rows = np.flatnonzero(~np.asarray(terminal_mask, dtype=bool).ravel())
+        if n == 0 or len(rows) == 0:
+            return sp.csr_matrix((p, n)) if use_sparse else np.zeros((p, n))
+        Phi = self.phi_batch_nonTerminal(S[rows])
+        if len(rows) < p:
+            # put the rows of the non-terminal states at their positions
+            if sp.issparse(Phi):
+                select = sp.csr_matrix((np.ones(len(rows)), (rows, np.arange(len(rows)))),
+                                       shape=(p, len(rows)))
+                Phi = select * Phi
+            else:
+                Phi_all = np.zeros((p, n))
+                Phi_all[rows] = Phi
+                Phi = Phi_all
+        if use_sparse:
+            return sp.csr_matrix(Phi)
+        elif sp.issparse(Phi):
+            return Phi.toarray()
+        return Phi
+
+    def phi_batch_nonTerminal(self, S):
+        """
+        Returns the feature vectors of a batch of non-terminal states, see
+        :py:meth:`~rlpy.Representations.Representation.Representation.phi_batch`.
+
+        The default implementation calls
+        :py:meth:`~rlpy.Representations.Representation.Representation.phi_nonTerminal`
+        for every state. Representations should override it with a
+        vectorized version.
+
+        :param S: The states, one per row (*p* x *d*).
+
+        :return: The *p* x *n* matrix of feature vectors, either as a dense
+            array or as a sparse matrix.
+        """
+        Phi = np.zeros((len(S), self.features_num))
+        for i, s in enumerate(S):
+            Phi[i] = self.phi_nonTerminal(s)
+        return Phi
+
+    def _activeBatchToCSR(self, indices, values=None):
+        """
+        Builds the sparse *p* x *n* feature matrix from the ids of the active
+        features of each state.
+
+        :param indices: integer array of shape (p, k), the ids of the k
+            active features of each state (repetitions are allowed).
+        :param values: (optional) the values of the features, same shape as
+            *indices*. If not specified, all active features are set to 1.
+
+        :return: the feature matrix as ``scipy.sparse.csr_matrix``.
+        """
+        p, k = indices.shape
+        rows = np.repeat(np.arange(p), k)
+        data = np.ones(p * k) if values is None else np.ravel(values)
+        Phi = sp.csr_matrix((data, (rows, np.ravel(indices))),
+                            shape=(p, self.features_num))
+        Phi.sum_duplicates()
+        if values is None:
+            Phi.data[:] = 1.
+        return Phi
 
     def phi_sa(self, s, terminal, a, phi_s=None, snippet=False):
         """
@@ -288,14 +526,24 @@ class Representation(object):
         #F_sa = kron(A,F_s)
         return phi_sa
 
-    def addNewWeight(self):
+    def addNewWeight(self, newElem=None):
         """
-        Add a new zero weight, corresponding to a newly added feature,
+        Add a new weight, corresponding to a newly added feature,
         to all actions.
+
+        The weights are kept in a :py:class:`~rlpy.Tools.WeightBuffer.WeightBuffer`
+        so that adding features does not copy ``weight_vec`` into a new
+        array every time.
+
+        :param newElem: (optional) array of shape (actions_num, k) with the
+            weights of k new features for each action. If not specified,
+            a single feature with zero weights is added.
         """
-        self.weight_vec = addNewElementForAllActions(
+        if self._weight_buffer is None:
+            self._weight_buffer = WeightBuffer(self.actions_num)
+        self.weight_vec = self._weight_buffer.addFeatures(
             self.weight_vec,
-            self.actions_num)
+            newElem)
 
     def hashState(self, s,):
         """
@@ -327,6 +575,38 @@ class Representation(object):
                     domain.statespace_limits[d, 0]
             self.binWidth_per_dim[d] = old_div((domain.statespace_limits[d,1] - domain.statespace_limits[d, 0]), (self.bins_per_dim[d] * 1.))
 
+    def binStates(self, S):
+        """
+        Batch version of
+        :py:meth:`~rlpy.Representations.Representation.Representation.binState`.
+
+        :param S: The states, one per row (*p* x *d*).
+
+        :return: The *p* x *d* array of the bin numbers of each state.
+        """
+        S = np.asarray(S)
+        limits = self.domain.statespace_limits
+        assert (np.all(S >= limits[:, 0]))
+        assert (np.all(S <= limits[:, 1]))
+        width = limits[:, 1] - limits[:, 0]
+        diff = S - limits[:, 0]
+        bs = (diff * self.bins_per_dim / width).astype("uint32")
+        return np.minimum(bs, self.bins_per_dim - 1).astype("uint32")
+
+    def hashStates(self, S):
+        """
+        Batch version of
+        :py:meth:`~rlpy.Representations.Representation.Representation.hashState`.
+
+        :param S: The states, one per row (*p* x *d*).
+
+        :return: The array of the *p* state ids.
+        """
+        bs = self.binStates(S).astype(np.int64)
+        multipliers = np.cumprod(
+            np.hstack((1, self.bins_per_dim[:-1]))).astype(np.int64)
+        return np.dot(bs, multipliers)
+
     def binState(self, s):
         """
         Returns a vector where each element is the zero-indexed bin number
@@ -351,7 +631,7 @@ class Representation(object):
         bs[m] = self.bins_per_dim[m] - 1
         return bs
 
-    def bestActions(self, s, terminal, p_actions, phi_s=None):
+    def bestActions(self, s, terminal, p_actions, phi_s=None, active=None):
         """
         Returns a list of the best actions at a given state.
         If *phi_s* [the feature vector at state *s*] is given, it is used to
@@ -362,10 +642,18 @@ class Representation(object):
         :param s: The given state
         :param terminal: Whether or not the state *s* is a terminal one.
         :param phi_s: (optional) the feature vector at state (s).
+        :param active: (optional) the active features (indices, values) at
+            state (s). Unless *phi_s* is given, the Q-values are computed
+            sparsely with
+            :py:meth:`~rlpy.Representations.Representation.Representation.Qs_active`
+            from *active* or from the feature cache.
         :return: A list of the best actions at the given state.
 
         """
-        Qs = self.Qs(s, terminal, phi_s)
+        if phi_s is not None:
+            Qs = self.Qs(s, terminal, phi_s)
+        else:
+            Qs = self.Qs_active(s, terminal, active)
         Qs = Qs[p_actions]
         # Find the index of best actions
         ind = findElemArray1D(Qs, Qs.max())
@@ -418,7 +706,7 @@ class Representation(object):
         """
         return 0
 
-    def bestAction(self, s, terminal, p_actions, phi_s=None):
+    def bestAction(self, s, terminal, p_actions, phi_s=None, active=None):
         """
         Returns the best action at a given state.
         If there are multiple best actions, this method selects one of them
@@ -431,9 +719,12 @@ class Representation(object):
         :param s: The given state
         :param terminal: Whether or not the state *s* is a terminal one.
         :param phi_s: (optional) the feature vector at state (s).
+        :param active: (optional) the active features (indices, values) at
+            state (s), as returned by
+            :py:meth:`~rlpy.Representations.Representation.Representation.phi_active`.
         :return: The best action at the given state.
         """
-        bestA = self.bestActions(s, terminal, p_actions, phi_s)
+        bestA = self.bestActions(s, terminal, p_actions, phi_s, active)
         if isinstance(bestA, int):
             return bestA
         elif len(bestA) > 1:
@@ -469,6 +760,19 @@ class Representation(object):
         index = bs + shifts
         return index.astype('uint32')
 
+    def activeInitialFeaturesBatch(self, S):
+        """
+        Batch version of
+        :py:meth:`~rlpy.Representations.Representation.Representation.activeInitialFeatures`.
+
+        :param S: The states, one per row (*p* x *d*).
+
+        :return: The *p* x *d* array of active initial features of each state.
+        """
+        bs = self.binStates(S).astype(int)
+        shifts = np.hstack((0, np.cumsum(self.bins_per_dim)[:-1])).astype(int)
+        return bs + shifts
+
     def batchPhi_s_a(self, all_phi_s, all_actions,
                      all_phi_s_a=None, use_sparse=False):
         """
@@ -510,7 +814,7 @@ class Representation(object):
         return phi_s_a
 
     def batchBestAction(self, all_s, all_phi_s,
-                        action_mask=None, useSparse=True):
+                        action_mask=None, useSparse=True, returnPhi=True):
         """
         Accepts a batch of states, returns the best action associated with each.
 
@@ -521,16 +825,25 @@ class Representation(object):
         :param all_phi_s: The feature vectors evaluated at a series of states.
             Has dimension *p* x *n*, where *p* is the number of states
             (indexed by row), and *n* is the number of features.
+            If None, they are computed with
+            :py:meth:`~rlpy.Representations.Representation.Representation.phi_batch`.
         :param action_mask: (optional) a *p* x *|A|* mask on the possible
             actions to consider, where *|A|* is the size of the action space.
             The mask is a binary 2-d array, where 1 indicates an active mask
             (action is unavailable) while 0 indicates a possible action.
         :param useSparse: Determines whether or not to use sparse matrix
             libraries provided with numpy.
+        :param returnPhi: If False, only the best actions are computed and
+            None is returned instead of phi_s_a.
 
-        :return: An array of the best action associated with each state.
+        :return: The tuple (best_action, phi_s_a, action_mask) of the best
+            action associated with each state, the feature vectors of the
+            states paired with these actions (a CSR matrix if *useSparse*)
+            and the action mask.
 
         """
+        if all_phi_s is None:
+            all_phi_s = self.phi_batch(all_s, use_sparse=useSparse)
         p, n = all_phi_s.shape
         a_num = self.actions_num
 
@@ -539,25 +852,29 @@ class Representation(object):
             for i, s in enumerate(all_s):
                 action_mask[i, self.domain.possibleActions(s)] = 0
 
-        a_num = self.actions_num
-        if useSparse:
-            # all_phi_s_a will be ap-by-an
-            all_phi_s_a = sp.kron(np.eye(a_num, a_num), all_phi_s)
-            all_q_s_a = all_phi_s_a * self.weight_vec.reshape(-1, 1)  # ap-by-1
+        # Q-values of all state-action pairs: the weights of action a are the
+        # a-th block of weight_vec, so Q = phi_s * W^T (p-by-a)
+        W = self.weight_vec.reshape(a_num, -1)
+        if sp.issparse(all_phi_s):
+            all_phi_s = sp.csr_matrix(all_phi_s)
+            all_q_s_a = np.asarray(all_phi_s.dot(W.T))
         else:
-            # all_phi_s_a will be ap-by-an
-            all_phi_s_a = np.kron(np.eye(a_num, a_num), all_phi_s)
-            all_q_s_a = np.dot(all_phi_s_a, self.weight_vec.T)  # ap-by-1
-        all_q_s_a = all_q_s_a.reshape((a_num, -1)).T  # a-by-p
-        all_q_s_a = np.ma.masked_array(all_q_s_a, mask=action_mask)
+            all_q_s_a = np.dot(all_phi_s, W.T)
+        all_q_s_a = np.where(np.asarray(action_mask, dtype=bool), -np.inf, all_q_s_a)
         best_action = np.argmax(all_q_s_a, axis=1)
+        if not returnPhi:
+            return best_action, None, action_mask
 
         # Calculate the corresponding phi_s_a
-        phi_s_a = self.batchPhi_s_a(
-            all_phi_s,
-            best_action,
-            all_phi_s_a,
-            useSparse)
+        if useSparse:
+            # copy the row of phi_s into the block of the best action
+            all_phi_s = sp.csr_matrix(all_phi_s)
+            nnz_actions = np.repeat(best_action, np.diff(all_phi_s.indptr))
+            phi_s_a = sp.csr_matrix(
+                (all_phi_s.data, all_phi_s.indices + nnz_actions * n,
+                 all_phi_s.indptr), shape=(p, n * a_num))
+        else:
+            phi_s_a = self.batchPhi_s_a(all_phi_s, best_action)
         return best_action, phi_s_a, action_mask
 
     def featureType(self):
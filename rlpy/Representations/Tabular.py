@@ -41,5 +41,11 @@ class Tabular(Representation):
         F_s[hashVal] = 1
         return F_s
 
+    def phi_active_nonTerminal(self, s):
+        return np.array([self.hashState(s)], dtype=int), np.ones(1)
+
+    def phi_batch_nonTerminal(self, S):
+        return self._activeBatchToCSR(self.hashStates(S).reshape(-1, 1))
+
     def featureType(self):
         return bool
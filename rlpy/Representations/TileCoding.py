@@ -12,6 +12,12 @@ from builtins import range
 from past.utils import old_div
 import numpy as np
 from .Representation import Representation
+try:
+    from .hashing import active_tiles
+    from .hashing import SUPER, LAZY, NONE
+except ImportError:
+    active_tiles = None
+    print("C-Extension for TileCoding hashing not available, expect slow runtime")
 
 __copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
 __credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
@@ -114,33 +120,38 @@ class TileCoding(Representation):
         if safety == "super":
             size = self.domain.state_space_dims + 1
             self.check_data = - \
-                np.ones((self.features_num, size), dtype=np.long)
-        elif safety == "lazy":
-            size = 1
+                np.ones((self.features_num, size), dtype=np.int64)
         else:
-            self.check_data = -np.ones((self.features_num), dtype=np.long)
-        self.counts = np.zeros(self.features_num, dtype=np.long)
+            # lazy and none store a second hash of the virtual address
+            self.check_data = -np.ones((self.features_num), dtype=np.int64)
+        self.counts = np.zeros(self.features_num, dtype=np.int64)
         self.collisions = 0
         self.init_randomization()
 
     def init_randomization(self):
         self.R = self.random_state.randint(old_div(self.BIG_INT, 4),
-            size=self.features_num).astype(np.int)
+            size=self.features_num).astype(np.int64)
 
-        if self.safety == "none":
-            try:
-                from . import hashing as h
-                f = lambda self, A: h.physical_addr(A, self.R, self.check_data,
-                                                    self.counts)[0]
-                self._physical_addr = type(TileCoding._physical_addr)(f, self, TileCoding)
-                print("Use cython extension for TileCoding hashing trick")
-            except Exception as e:
-                print(e)
-                print("Cython extension for TileCoding hashing trick not available")
-        
     def phi_nonTerminal(self, s):
 
         phi = np.zeros((self.features_num))
+        phi[self._active_tiles(s)] = 1
+        return phi
+
+    def phi_active_nonTerminal(self, s):
+        # several tilings may hash to the same physical address
+        indices = np.unique(self._active_tiles(s))
+        return indices, np.ones(len(indices))
+
+    def _active_tiles(self, s):
+        """
+        Returns the physical address of the active tile of every tiling
+        for state *s* (one entry per tiling, possibly with repetitions).
+        """
+        if active_tiles is not None:
+            return self._active_tiles_compiled(np.reshape(s, (1, -1)))[0]
+        tiles = np.empty(sum(self.num_tilings), dtype=int)
+        k = 0
         sn = np.empty((len(s) + 1), dtype="int")
         for e, n_t in enumerate(self.num_tilings):
             # first dimension is used to avoid collisions between different
@@ -152,9 +163,72 @@ class TileCoding(Representation):
                 # compute "virtual" address
                 A = sn - np.mod(sn - i, n_t)
                 # compute "physical" address
-                j = self._physical_addr(A)
-                phi[j] = 1
-        return phi
+                tiles[k] = self._physical_addr(A)
+                k += 1
+        return tiles
+
+    def phi_batch_nonTerminal(self, S):
+        return self._activeBatchToCSR(self._active_tiles_batch(S))
+
+    def _active_tiles_batch(self, S):
+        """
+        Batch version of :py:meth:`_active_tiles`: returns the *p* x
+        (number of tilings) array of the physical addresses of the active
+        tiles of each state.
+        The virtual addresses are computed with array operations and each
+        distinct virtual address is hashed only once, in the order of first
+        appearance, so the result (including the assignment of new tiles)
+        is the same as calling :py:meth:`_active_tiles` for each state.
+        If the C-extension is available, all states are hashed with a single
+        call of the compiled kernel instead.
+        """
+        if active_tiles is not None:
+            return self._active_tiles_compiled(S)
+        if self.safety == "none":
+            # repeated lookups of a colliding address count as collisions
+            return np.array([self._active_tiles(s) for s in S], dtype=int)
+        S = np.asarray(S)
+        p = len(S)
+        A = np.empty((p, sum(self.num_tilings), S.shape[1] + 1), dtype="int")
+        k = 0
+        sn = np.empty((p, S.shape[1] + 1), dtype="int")
+        for e, n_t in enumerate(self.num_tilings):
+            sn[:, 0] = e
+            sn[:, 1:] = old_div((S - self.domain.statespace_limits[:, 0]),
+                                self.scaling_matrix[e])
+            for i in range(n_t):
+                A[:, k, :] = sn - np.mod(sn - i, n_t)
+                k += 1
+        A = A.reshape(p * k, -1)
+        virtual, first, inverse = np.unique(A, axis=0, return_index=True,
+                                            return_inverse=True)
+        physical = np.empty(len(virtual), dtype=int)
+        for j in np.argsort(first):
+            physical[j] = self._physical_addr(virtual[j])
+        tiles = physical[inverse]
+        # account for the repeated lookups of the same virtual addresses
+        np.add.at(self.counts, tiles, 1)
+        np.add.at(self.counts, physical, -1)
+        return tiles.reshape(p, k)
+
+    def _active_tiles_compiled(self, S):
+        """
+        Computes :py:meth:`_active_tiles` for each state in *S* (one per row)
+        with the C-extension, which hashes all tilings of all states in a
+        single call.
+        """
+        safety = {"super": SUPER, "lazy": LAZY}.get(self.safety, NONE)
+        tiles, collisions, overflows = active_tiles(
+            np.ascontiguousarray(S, dtype=float),
+            np.ascontiguousarray(self.domain.statespace_limits[:, 0], dtype=float),
+            np.ascontiguousarray(self.scaling_matrix, dtype=float),
+            np.asarray(self.num_tilings, dtype=np.int64),
+            self.R, self.check_data.reshape(self.features_num, -1),
+            self.counts, safety)
+        self.collisions += collisions
+        if overflows:
+            self.logger.warn("Tile memory too small")
+        return tiles
 
     def _hash(self, A, increment=449, max=None):
         """
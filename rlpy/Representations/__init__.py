@@ -4,17 +4,23 @@ from __future__ import division
 from __future__ import absolute_import
 from future import standard_library
 standard_library.install_aliases()
-from .Tabular import Tabular
-from .IncrementalTabular import IncrementalTabular
-from .IndependentDiscretization import IndependentDiscretization
-from .IndependentDiscretizationCompactBinary import IndependentDiscretizationCompactBinary
-from .RBF import RBF
-from .iFDD import iFDD, iFDDK
-from .Fourier import Fourier
-from .BEBF import BEBF
-from .OMPTD import OMPTD
-from .TileCoding import TileCoding
+from rlpy.Tools.GeneralTools import lazyPackage
 
-from .KernelizediFDD import linf_triangle_kernel, gaussian_kernel, KernelizediFDD
-from .LocalBases import RandomLocalBases
-from .LocalBases import NonparametricLocalBases
+# each representation is imported when it is first used
+lazyPackage(__name__, {
+    "Tabular": ".Tabular",
+    "IncrementalTabular": ".IncrementalTabular",
+    "IndependentDiscretization": ".IndependentDiscretization",
+    "IndependentDiscretizationCompactBinary": ".IndependentDiscretizationCompactBinary",
+    "RBF": ".RBF",
+    "iFDD": ".iFDD",
+    "iFDDK": ".iFDD",
+    "Fourier": ".Fourier",
+    "BEBF": ".BEBF",
+    "OMPTD": ".OMPTD",
+    "TileCoding": ".TileCoding",
+    "linf_triangle_kernel": ".KernelizediFDD",
+    "gaussian_kernel": ".KernelizediFDD",
+    "KernelizediFDD": ".KernelizediFDD",
+    "RandomLocalBases": ".LocalBases",
+    "NonparametricLocalBases": ".LocalBases"})
@@ -1,48 +1,155 @@
+#cython: boundscheck=False
+#cython: wraparound=False
+#cython: cdivision=True
+"""
+Hashing trick of the TileCoding representation.
+
+The functions reproduce ``TileCoding._active_tiles`` and
+``TileCoding._physical_addr`` exactly, including the collision checks,
+the double hashing used to resolve collisions and the bookkeeping in
+``check_data`` and ``counts``.
+"""
 cimport numpy as np
 import numpy as np
 cimport cython
 
-cdef int BIG_INT = 2147483647
-
-@cython.boundscheck(False)
-@cython.cdivision(True)
-cdef long hash(long [:] A, long [:] R, int increment, int max):
-    cdef int i = 0
-    cdef int n = R.shape[0]
-    cdef int l = A.shape[0]
-    cdef int ind
-    cdef long result = 0
-    for i in range(l):
-        ind = (A[i] + (increment * i)) % n
-        result += R[ind]
-    result = result % max
-    return result
-
-@cython.boundscheck(False)
-@cython.cdivision(True)
-def physical_addr(np.ndarray[np.npy_long, ndim=1] A,
-                   np.ndarray[np.npy_long, ndim=1] R,
-                   np.ndarray[np.npy_longlong, ndim=1] counts,
-                   np.ndarray[np.npy_longlong, ndim=1] check_data):
+ctypedef np.int64_t int64
+
+cdef int64 BIG_INT = 2147483647
+
+# collision checking of TileCoding; see its ``safety`` parameter
+cdef enum:
+    C_SUPER = 0
+    C_LAZY = 1
+    C_NONE = 2
+
+SUPER, LAZY, NONE = C_SUPER, C_LAZY, C_NONE
+
+
+cdef inline int64 pymod(int64 a, int64 n) nogil:
+    """ modulo with the sign of the divisor, as ``np.mod`` """
+    cdef int64 m = a % n
+    if m < 0:
+        m += n
+    return m
+
+
+cdef int64 hash(int64[::1] A, int64[::1] R, int64 increment,
+                int64 max) nogil:
+    cdef Py_ssize_t i
+    cdef int64 n = R.shape[0]
+    cdef int64 result = 0
+    for i in range(A.shape[0]):
+        result += R[pymod(A[i] + increment * i, n)]
+    return pymod(result, max)
+
+
+cdef inline bint matches(int64[:, ::1] check_data, int64 h,
+                         int64[::1] check_val) nogil:
+    cdef Py_ssize_t j
+    for j in range(check_val.shape[0]):
+        if check_data[h, j] != check_val[j]:
+            return False
+    return True
+
+
+cdef inline int64 occupy(int64[:, ::1] check_data, int64[::1] counts,
+                         int64 h, int64[::1] check_val) nogil:
+    cdef Py_ssize_t j
+    for j in range(check_val.shape[0]):
+        check_data[h, j] = check_val[j]
+    counts[h] += 1
+    return h
+
+
+cdef int64 physical_addr(int64[::1] A, int64[::1] R,
+                         int64[:, ::1] check_data, int64[::1] counts,
+                         int safety, int64[::1] check_val,
+                         int64 *collisions, int64 *overflows) nogil:
     """
     Map a virtual vector address A to a physical address i.e. the actual
     feature number.
-    This is the actual hashing trick
     """
-    cdef long [:] A_view = A
-    cdef long [:] R_view = R
-
-    cdef int h1 = hash(A_view, R_view, 449, R.shape[0])
-    cdef int check_val = hash(A_view, R_view, 457, BIG_INT)
-
-    if counts[h1] == 0:
-        check_data[h1] = check_val
-        counts[h1] = counts[h1] + 1
-        return h1, 0
-    elif np.all(check_val == check_data[h1]):
-        # clear hit, everything's fine
-        counts[h1] = counts[h1] + 1
-        return h1, 0
+    cdef Py_ssize_t j
+    cdef int64 i, h2
+    cdef int64 features_num = R.shape[0]
+    cdef int64 h1 = hash(A, R, 449, features_num)
+    if safety == C_SUPER:
+        # use full value to detect collisions
+        for j in range(A.shape[0]):
+            check_val[j] = A[j]
     else:
-        return h1, 1
+        # use second hash
+        check_val[0] = hash(A, R, 457, BIG_INT)
+
+    if counts[h1] == 0 or matches(check_data, h1, check_val):
+        return occupy(check_data, counts, h1, check_val)
+    elif safety == C_NONE:
+        collisions[0] += 1
+        return h1
+    h2 = 1 + 2 * hash(A, R, 449, BIG_INT // 4)
+    for i in range(features_num):
+        h1 = (h1 + h2) % features_num
+        if counts[h1] == 0 or matches(check_data, h1, check_val):
+            return occupy(check_data, counts, h1, check_val)
+    collisions[0] += 1
+    overflows[0] += 1
+    return h1
 
+
+def active_tiles(double[:, ::1] S, double[::1] low,
+                 double[:, ::1] scaling_matrix, int64[::1] num_tilings,
+                 int64[::1] R, int64[:, ::1] check_data, int64[::1] counts,
+                 int safety):
+    """
+    Computes the physical addresses of the active tiles of a batch of
+    states, hashing the states one after another.
+
+    :param S: the states, one per row.
+    :param low: the lower limits of the state dimensions.
+    :param scaling_matrix: the width of the tiles of each tiling type in
+        each dimension.
+    :param num_tilings: the number of tilings of each tiling type.
+    :param R: the random numbers of the hash function.
+    :param check_data: the collision check data (one row per feature),
+        updated in place. Either the virtual addresses (``SUPER``) or a
+        second hash of them (one column).
+    :param counts: the number of lookups of each feature, updated in place.
+    :param safety: one of ``SUPER``, ``LAZY`` and ``NONE``.
+
+    :return: The tuple (tiles, collisions, overflows) of the *p* x
+        (number of tilings) array of addresses, the number of unresolved
+        collisions and the number of failed searches for a free feature.
+    """
+    cdef Py_ssize_t p, j, e, k
+    cdef int64 i, n_t
+    cdef Py_ssize_t d = S.shape[1]
+    cdef int64 collisions = 0, overflows = 0
+    cdef int64 total = 0
+    for e in range(num_tilings.shape[0]):
+        total += num_tilings[e]
+    tiles_arr = np.empty((S.shape[0], total), dtype=np.int64)
+    cdef int64[:, ::1] tiles = tiles_arr
+    cdef int64[::1] sn = np.empty(d + 1, dtype=np.int64)
+    cdef int64[::1] A = np.empty(d + 1, dtype=np.int64)
+    cdef int64[::1] check_val = np.empty(check_data.shape[1], dtype=np.int64)
+    with nogil:
+        for p in range(S.shape[0]):
+            k = 0
+            for e in range(num_tilings.shape[0]):
+                n_t = num_tilings[e]
+                # first dimension is used to avoid collisions between
+                # different tilings
+                sn[0] = e
+                for j in range(d):
+                    sn[j + 1] = <int64>((S[p, j] - low[j]) / scaling_matrix[e, j])
+                for i in range(n_t):
+                    # compute "virtual" address
+                    for j in range(d + 1):
+                        A[j] = sn[j] - pymod(sn[j] - i, n_t)
+                    # compute "physical" address
+                    tiles[p, k] = physical_addr(A, R, check_data, counts,
+                                                safety, check_val,
+                                                &collisions, &overflows)
+                    k += 1
+    return tiles_arr, collisions, overflows
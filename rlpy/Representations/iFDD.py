@@ -14,9 +14,10 @@ from past.utils import old_div
 from builtins import object
 from copy import deepcopy
 import numpy as np
+import scipy.sparse as sp
 
-from rlpy.Tools import printClass, PriorityQueueWithNovelty
-from rlpy.Tools import powerset, combinations, addNewElementForAllActions
+from rlpy.Tools import printClass, PriorityQueueWithNovelty, LRUSetCache
+from rlpy.Tools import powerset, combinations
 from rlpy.Tools import plt
 from .Representation import Representation
 import warnings
@@ -107,6 +108,165 @@ class iFDD_potential(object):
         printClass(self)
 
 
+class iFDD_potential_store(object):
+    ''' Compact storage of the potential features of iFDD.
+        Each potential occupies a slot of a set of arrays (one array per
+        statistic, e.g. cumtderr, plus the parents p1 and p2). Potentials are
+        found through two hash tables with integer keys: one maps the packed
+        pair of parent indices to the slot, the other the hash of the
+        conjunction (f_set) to the slot, so that different pairs leading to the
+        same conjunction share their statistics. The f_set itself is not
+        stored; it is the union of the f_sets of the parents.
+    '''
+    LIVE = 1  # status of a slot holding a potential
+    DISCOVERED = 2  # status of a slot whose potential became a feature
+    EVICTED = 3  # status of a slot whose potential was dropped
+
+    def __init__(self, columns, capacity=64):
+        """
+        :param columns: dictionary mapping the name of each statistic to the
+            tuple (dtype, initial value).
+        :param capacity: initial number of slots.
+        """
+        self.columns = columns
+        self.capacity = capacity
+        self.size = 0  # number of slots in use (including dead ones)
+        self.live = 0  # number of potentials
+        self.evictions = 0
+        # time stamp of the last update, for evicting stale potentials
+        self.clock = 0
+        self.p1 = np.zeros(capacity, dtype=np.int64)
+        self.p2 = np.zeros(capacity, dtype=np.int64)
+        self.status = np.zeros(capacity, dtype=np.int8)
+        self.lastVisit = np.zeros(capacity, dtype=np.int64)
+        self.data = dict((name, np.zeros(capacity, dtype=dtype))
+                         for name, (dtype, _) in columns.items())
+        # packed pair of parents -> slot (-1 if the conjunction is a feature)
+        self.pairs = {}
+        # hash of the conjunction -> slot
+        self.sets = {}
+        # conjunction -> slot, for conjunctions with colliding hashes
+        self.collisions = {}
+
+    def __len__(self):
+        return self.live
+
+    def __getitem__(self, name):
+        return self.data[name]
+
+    @staticmethod
+    def pairKey(g_index, h_index):
+        if g_index > h_index:
+            g_index, h_index = h_index, g_index
+        return (g_index << 32) | h_index
+
+    def getPair(self, g_index, h_index):
+        """
+        :return: the slot of the pair of features, -1 if their conjunction is
+            already a feature and None if the pair is unknown.
+        """
+        slot = self.pairs.get(self.pairKey(g_index, h_index))
+        if slot is None or slot < 0:
+            return slot
+        status = self.status[slot]
+        if status == self.DISCOVERED:
+            return -1
+        if status == self.EVICTED:
+            return None
+        return slot
+
+    def setPair(self, g_index, h_index, slot):
+        self.pairs[self.pairKey(g_index, h_index)] = slot
+
+    def findSet(self, f_set, setOf):
+        """
+        :param f_set: the conjunction.
+        :param setOf: function returning the conjunction of a slot.
+        :return: the slot of the potential of *f_set* or None.
+        """
+        slot = self.sets.get(hash(f_set))
+        if slot is not None and self.status[slot] == self.LIVE and setOf(slot) == f_set:
+            return slot
+        slot = self.collisions.get(f_set)
+        if slot is not None and self.status[slot] == self.LIVE:
+            return slot
+        return None
+
+    def add(self, f_set, p1, p2):
+        """ Adds a new potential and returns its slot. """
+        if self.size == self.capacity:
+            self._resize(2 * self.capacity)
+        slot = self.size
+        self.size += 1
+        self.live += 1
+        self.p1[slot] = p1
+        self.p2[slot] = p2
+        self.status[slot] = self.LIVE
+        self.lastVisit[slot] = self.clock
+        for name, (_, value) in self.columns.items():
+            self.data[name][slot] = value
+        h = hash(f_set)
+        other = self.sets.get(h)
+        if other is not None and self.status[other] == self.LIVE:
+            self.collisions[f_set] = slot
+        else:
+            self.sets[h] = slot
+        return slot
+
+    def liveSlots(self):
+        return np.flatnonzero(self.status[:self.size] == self.LIVE)
+
+    def discover(self, slot):
+        self.status[slot] = self.DISCOVERED
+        self.live -= 1
+
+    def evict(self, slots):
+        self.status[slots] = self.EVICTED
+        self.live -= len(slots)
+        self.evictions += len(slots)
+
+    def _resize(self, capacity):
+        for name in ["p1", "p2", "status", "lastVisit"]:
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+        for name, old in list(self.data.items()):
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            self.data[name] = new
+        self.capacity = capacity
+
+    def compact(self):
+        """
+        Removes the slots of discovered and evicted potentials if they make
+        up more than half of the store. Slots of the remaining potentials
+        change, so no slots may be held across calls.
+        """
+        if self.size <= 64 or 2 * self.live >= self.size:
+            return
+        keep = self.liveSlots()
+        remap = np.full(self.size, -1, dtype=np.int64)
+        remap[keep] = np.arange(len(keep))
+        status = self.status[:self.size]
+        pairs = {}
+        for key, slot in self.pairs.items():
+            if slot < 0 or status[slot] == self.DISCOVERED:
+                pairs[key] = -1
+            elif status[slot] == self.LIVE:
+                pairs[key] = int(remap[slot])
+        self.pairs = pairs
+        self.sets = dict((h, int(remap[slot])) for h, slot in self.sets.items()
+                         if status[slot] == self.LIVE)
+        self.collisions = dict((f, int(remap[slot])) for f, slot in self.collisions.items()
+                               if status[slot] == self.LIVE)
+        for name in ["p1", "p2", "status", "lastVisit"]:
+            getattr(self, name)[:len(keep)] = getattr(self, name)[keep]
+        for column in self.data.values():
+            column[:len(keep)] = column[keep]
+        self.size = len(keep)
+
+
 class iFDD(Representation):
     ''' The incremental Feature Dependency Discovery Representation based on
     [Geramifard et al. 2011 ICML paper]. This representation starts with a set of given
@@ -125,18 +285,28 @@ class iFDD(Representation):
     sparsify = None
     # dictionary mapping initial feature sets to iFDD_feature
     iFDD_features = None
-    # dictionary mapping initial feature sets to iFDD_potential
+    # iFDD_potential_store holding the statistics of the potential features
     iFDD_potentials = None
+    # Maximum number of potentials (None for unbounded). When exceeded, the
+    # potentials with the lowest relevance are dropped, the least recently
+    # visited first.
+    maxPotentials = None
     # dictionary mapping each feature index (ID) to its feature object
     featureIndex2feature = None
+    # inverted index mapping each initial feature index to the indices of
+    # all features whose f_set contains it
+    featuresContaining = None
     debug = 0  # Print more stuff
-    # dictionary mapping  initial active feature set phi_0(s) to its
+    # LRUSetCache mapping  initial active feature set phi_0(s) to its
     # corresponding active features at phi(s). Based on Tuna's Trick to speed
     # up iFDD
     cache = None
     # this should only increase speed. If results are different something is
     # wrong
     useCache = 0
+    # Maximum number of entries of the cache (None for unbounded). The least
+    # recently used entries are evicted first.
+    cacheSize = None
     # Number of features to be expanded in the batch setting
     maxBatchDiscovery = 0
     # Minimum value of feature relevance for the batch setting
@@ -161,11 +331,15 @@ class iFDD(Representation):
     def __init__(
             self, domain, discovery_threshold, initial_representation,
             sparsify=True, discretization=20, debug=0, useCache=0,
-            maxBatchDiscovery=1, batchThreshold=0, iFDDPlus=1, seed=1):
+            maxBatchDiscovery=1, batchThreshold=0, iFDDPlus=1, seed=1,
+            cacheSize=100000, maxPotentials=None):
         self.iFDD_features = {}
-        self.iFDD_potentials = {}
+        self.iFDD_potentials = iFDD_potential_store(self._potentialColumns())
+        self.maxPotentials = maxPotentials
         self.featureIndex2feature = {}
-        self.cache = {}
+        self.featuresContaining = defaultdict(list)
+        self.cacheSize = cacheSize
+        self.cache = LRUSetCache(cacheSize)
         self.discovery_threshold = discovery_threshold
         self.sparsify = sparsify
         self.setBinsPerDimension(domain, discretization)
@@ -184,9 +358,28 @@ class iFDD(Representation):
     def phi_nonTerminal(self, s):
         """ Based on Tuna's Master Thesis 2012 """
         F_s = np.zeros(self.features_num, 'bool')
-        F_s_0 = self.initial_representation.phi_nonTerminal(
+        F_s[self._final_active_indices(s)] = 1
+        return F_s
+
+    def phi_active_nonTerminal(self, s):
+        indices = np.array(self._final_active_indices(s), dtype=int)
+        return indices, np.ones(len(indices))
+
+    def _final_active_indices(self, s):
+        """
+        Returns the ids of the active features of phi(s), given the active
+        features of the initial representation at *s*.
+        """
+        activeIndices, _ = self.initial_representation.phi_active_nonTerminal(
             s)
-        activeIndices = np.where(F_s_0 != 0)[0]
+        return self._final_from_initial(activeIndices)
+
+    def _final_from_initial(self, activeIndices):
+        """
+        Returns the ids of the final active features given the ids
+        *activeIndices* of the active initial features (using the cache if
+        enabled).
+        """
         if self.useCache:
             finalActiveIndices = self.cache.get(frozenset(activeIndices))
             if finalActiveIndices is None:
@@ -196,8 +389,42 @@ class iFDD(Representation):
         else:
             finalActiveIndices = self.findFinalActiveFeatures(
                 activeIndices)
-        F_s[finalActiveIndices] = 1
-        return F_s
+        return finalActiveIndices
+
+    def phi_batch_nonTerminal(self, S):
+        initial = sp.csr_matrix(
+            self.initial_representation.phi_batch(S, use_sparse=True))
+        p = initial.shape[0]
+        initial.sort_indices()
+        # group the states by their set of active initial features, so
+        # that the final active features are only found once per set
+        nnz = np.diff(initial.indptr)
+        if p > 0 and nnz[0] > 0 and np.all(nnz == nnz[0]):
+            keys = initial.indices.reshape(p, nnz[0])
+            initial_sets, inverse = np.unique(keys, axis=0,
+                                              return_inverse=True)
+        else:
+            groups = {}
+            inverse = np.empty(p, dtype=int)
+            initial_sets = []
+            for i in range(p):
+                key = tuple(initial.indices[initial.indptr[i]:initial.indptr[i + 1]])
+                if key not in groups:
+                    groups[key] = len(initial_sets)
+                    initial_sets.append(key)
+                inverse[i] = groups[key]
+        final_sets = [np.array(self._final_from_initial(np.array(s, dtype=int)),
+                               dtype=int) for s in initial_sets]
+        lengths = np.array([len(f) for f in final_sets], dtype=int)
+        # one row per set of initial features
+        unique_phi = sp.csr_matrix(
+            (np.ones(lengths.sum()),
+             np.concatenate(final_sets + [np.zeros(0, dtype=int)]),
+             np.hstack((0, np.cumsum(lengths)))),
+            shape=(len(final_sets), self.features_num))
+        select = sp.csr_matrix((np.ones(p), (np.arange(p), inverse)),
+                               shape=(p, len(final_sets)))
+        return select * unique_phi
 
     def findFinalActiveFeatures(self, intialActiveFeatures):
         """
@@ -207,65 +434,54 @@ class iFDD(Representation):
         k = len(intialActiveFeatures)
         initialSet = set(intialActiveFeatures)
 
-        if 2 ** k <= self.features_num:
+        if self.use_chirstoph_ordered_features:
+            # Only the features reachable from the active initial features
+            # through the inverted index are candidates. A feature is a
+            # candidate if all of its initial features are active.
+            hits = defaultdict(int)
+            for f in initialSet:
+                for index in self.featuresContaining.get(f, ()):
+                    hits[index] += 1
+            candidates = [self.featureIndex2feature[index]
+                          for index, count in hits.items()
+                          if count == len(self.featureIndex2feature[index].f_set)]
+            # largest features first, recent features (big ids) first among
+            # features of the same size (same order as sortediFDDFeatures)
+            candidates.sort(key=lambda f: (len(f.f_set), f.index), reverse=True)
+            for feature in candidates:
+                if len(initialSet) == 0:
+                    # No more initial features to be mapped to extended ones
+                    break
+                # This was missing from ICML 2011 paper algorithm.
+                # Example: [0,1,20], [0,20] is discovered, but if [0]
+                # is checked before [1] it will be added even though it
+                # is already covered by [0,20]
+                if initialSet.issuperset(feature.f_set):
+                    finalActiveFeatures.append(feature.index)
+                    if self.sparsify:
+                        initialSet = initialSet - feature.f_set
+        elif 2 ** k <= self.features_num:
             # k can be big which can cause this part to be very slow
             # if k is large then find active features by enumerating on the
             # discovered features.
-            if self.use_chirstoph_ordered_features:
-                for i in range(k, 0, -1):
-                    if len(initialSet) == 0:
-                        break
-                    # generate list of all combinations with i elements
-                    cand_i = [(c, self.iFDD_features[frozenset(c)].index)
-                              for c in combinations(initialSet, i)
-                              if frozenset(c) in self.iFDD_features]
-                    # sort (recent features (big ids) first)
-                    cand_i.sort(key=lambda x: x[1], reverse=True)
-                    # idx = -1
-                    for candidate, ind in cand_i:
-                        # the next block is for testing only
-                        # cur_idx = self.iFDD_features[frozenset(candidate)].index
-                        # if idx > 0:
-                        #    assert(idx > cur_idx)
-                        # idx = cur_idx
-
-                        if len(initialSet) == 0:
-                            # No more initial features to be mapped to extended
-                            # ones
-                            break
-
-                        # This was missing from ICML 2011 paper algorithm.
-                        # Example: [0,1,20], [0,20] is discovered, but if [0]
-                        # is checked before [1] it will be added even though it
-                        # is already covered by [0,20]
-                        if initialSet.issuperset(set(candidate)):
-                            feature = self.iFDD_features.get(
-                                frozenset(candidate))
-                            if feature is not None:
-                                finalActiveFeatures.append(feature.index)
-                                if self.sparsify:
-                                    # print "Sets:", initialSet, feature.f_set
-                                    initialSet = initialSet - feature.f_set
-                                    # print "Remaining Set:", initialSet
-            else:
-                for candidate in powerset(initialSet, ascending=0):
-                    if len(initialSet) == 0:
-                        # No more initial features to be mapped to extended
-                        # ones
-                        break
-
-                    # This was missing from ICML 2011 paper algorithm. Example:
-                    # [0,1,20], [0,20] is discovered, but if [0] is checked
-                    # before [1] it will be added even though it is already
-                    # covered by [0,20]
-                    if initialSet.issuperset(set(candidate)):
-                        feature = self.iFDD_features.get(frozenset(candidate))
-                        if feature is not None:
-                            finalActiveFeatures.append(feature.index)
-                            if self.sparsify:
-                                # print "Sets:", initialSet, feature.f_set
-                                initialSet = initialSet - feature.f_set
-                                # print "Remaining Set:", initialSet
+            for candidate in powerset(initialSet, ascending=0):
+                if len(initialSet) == 0:
+                    # No more initial features to be mapped to extended
+                    # ones
+                    break
+
+                # This was missing from ICML 2011 paper algorithm. Example:
+                # [0,1,20], [0,20] is discovered, but if [0] is checked
+                # before [1] it will be added even though it is already
+                # covered by [0,20]
+                if initialSet.issuperset(set(candidate)):
+                    feature = self.iFDD_features.get(frozenset(candidate))
+                    if feature is not None:
+                        finalActiveFeatures.append(feature.index)
+                        if self.sparsify:
+                            # print "Sets:", initialSet, feature.f_set
+                            initialSet = initialSet - feature.f_set
+                            # print "Remaining Set:", initialSet
         else:
             # print "********** Using Alternative: %d > %d" % (2**k, self.features_num)
             # Loop on all features sorted on their size and then novelty and
@@ -292,50 +508,146 @@ class iFDD(Representation):
         """
         # Indices of non-zero elements of vector phi_s
         activeFeatures = phi_s.nonzero()[0]
-        discovered = 0
-        for g_index, h_index in combinations(activeFeatures, 2):
-            discovered += self.inspectPair(g_index, h_index, td_error)
-        return discovered
+        # all pairs of active features in the order of combinations()
+        g, h = np.triu_indices(len(activeFeatures), 1)
+        return self._inspectPairs(activeFeatures[g], activeFeatures[h],
+                                  td_error)
 
     def inspectPair(self, g_index, h_index, td_error):
         # Inspect feature f = g union h where g_index and h_index are the indices of features g and h
         # If the relevance is > Threshold add it to the list of features
         # Returns True if a new feature is added
-        g = self.featureIndex2feature[g_index].f_set
-        h = self.featureIndex2feature[h_index].f_set
-        f = g.union(h)
-        feature = self.iFDD_features.get(f)
-        if not self.iFDDPlus:
-            td_error = abs(td_error)
+        return self._inspectPairs([g_index], [h_index], td_error) > 0
 
-        if feature is not None:
-            # Already exists
-            return False
+    def _potentialColumns(self):
+        # statistics of each potential feature: name -> (dtype, initial value)
+        return {"cumtderr": (np.float64, 0.), "cumabstderr": (np.float64, 0.),
+                "count": (np.int64, 1)}
 
-        # Look it up in potentials
-        potential = self.iFDD_potentials.get(f)
-        if potential is None:
-            # Generate a new potential and put it in the dictionary
-            potential = iFDD_potential(f, g_index, h_index)
-            self.iFDD_potentials[f] = potential
+    def _potentialSet(self, slot):
+        # the conjunction of a potential is the union of its parents
+        store = self.iFDD_potentials
+        return (self.featureIndex2feature[store.p1[slot]].f_set |
+                self.featureIndex2feature[store.p2[slot]].f_set)
 
-        potential.cumtderr += td_error
-        potential.cumabstderr += abs(td_error)
-        potential.count += 1
-        # Check for discovery
+    def _potentialSlot(self, g_index, h_index):
+        """
+        Returns the slot of the potential of the conjunction of features
+        *g_index* and *h_index* (created if needed) or -1 if the conjunction
+        is already a feature.
+        """
+        store = self.iFDD_potentials
+        slot = store.getPair(g_index, h_index)
+        if slot is None:
+            f = self.featureIndex2feature[g_index].f_set.union(
+                self.featureIndex2feature[h_index].f_set)
+            if f in self.iFDD_features:
+                # Already exists
+                slot = -1
+            else:
+                slot = store.findSet(f, self._potentialSet)
+                if slot is None:
+                    slot = store.add(f, g_index, h_index)
+            store.setPair(g_index, h_index, slot)
+        return slot
+
+    def _discoverPotential(self, slot):
+        # Turns the potential of the slot into a feature
+        store = self.iFDD_potentials
+        potential = iFDD_potential(self._potentialSet(slot),
+                                   int(store.p1[slot]), int(store.p2[slot]))
+        store.discover(slot)
+        self.addFeature(potential)
+
+    def _inspectPairs(self, g_indices, h_indices, *args):
+        """
+        Updates the potentials of the pairs of features (g_indices[i],
+        h_indices[i]) in order and adds the ones that become relevant
+        enough as features. The pairs are processed in chunks of distinct
+        potentials; a chunk ends at the first discovery as features added
+        before a pair may change its potential.
 
-        if self.random_state.rand() < self.iFDDPlus:
-            relevance = old_div(abs(potential.cumtderr), np.sqrt(potential.count))
-        else:
-            relevance = potential.cumabstderr
+        Returns the number of added features.
+        """
+        g_indices = np.asarray(g_indices, dtype=int).tolist()
+        h_indices = np.asarray(h_indices, dtype=int).tolist()
+        discovered = 0
+        start = 0
+        while start < len(g_indices):
+            slots = []
+            seen = set()
+            for g_index, h_index in zip(g_indices[start:], h_indices[start:]):
+                slot = self._potentialSlot(g_index, h_index)
+                if slot in seen:
+                    break
+                if slot >= 0:
+                    seen.add(slot)
+                slots.append(slot)
+            end = start + len(slots)
+            processed, added = self._updatePotentials(
+                np.array(slots, dtype=int), g_indices[start:end],
+                h_indices[start:end], *args)
+            start += processed
+            discovered += added
+        self._maintainPotentials()
+        return discovered
 
-        if relevance >= self.discovery_threshold:
+    def _updatePotentials(self, slots, g_indices, h_indices, td_error):
+        """
+        Updates the statistics of the distinct potentials *slots* (-1 for
+        pairs that are features already) with the TD-error until the first
+        one is discovered.
+
+        Returns the tuple (number of processed pairs, number of added
+        features).
+        """
+        store = self.iFDD_potentials
+        if not self.iFDDPlus:
+            td_error = abs(td_error)
+        pairs = len(slots)
+        valid = np.flatnonzero(slots >= 0)
+        slots = slots[valid]
+        cumtderr = store["cumtderr"][slots] + td_error
+        cumabstderr = store["cumabstderr"][slots] + abs(td_error)
+        count = store["count"][slots] + 1
+        # Check for discovery
+        state = self.random_state.get_state()
+        plus = self.random_state.rand(len(slots)) < self.iFDDPlus
+        relevance = np.where(
+            plus, old_div(np.abs(cumtderr), np.sqrt(count)), cumabstderr)
+        discoveries = np.flatnonzero(relevance >= self.discovery_threshold)
+        n = discoveries[0] + 1 if len(discoveries) else len(slots)
+        if n < len(slots):
+            # the remaining pairs are processed after the discovery
+            self.random_state.set_state(state)
+            self.random_state.rand(n)
+        store["cumtderr"][slots[:n]] = cumtderr[:n]
+        store["cumabstderr"][slots[:n]] = cumabstderr[:n]
+        store["count"][slots[:n]] = count[:n]
+        store.lastVisit[slots[:n]] = store.clock
+        if len(discoveries):
             self.maxRelevance = -np.inf
-            self.addFeature(potential)
-            return True
-        else:
-            self.updateMaxRelevance(relevance)
-            return False
+            self._discoverPotential(slots[n - 1])
+            return int(valid[n - 1]) + 1, 1
+        if len(slots):
+            self.updateMaxRelevance(relevance.max())
+        return pairs, 0
+
+    def _potentialScores(self, slots):
+        # upper bound on the relevance of the potentials
+        return self.iFDD_potentials["cumabstderr"][slots]
+
+    def _maintainPotentials(self):
+        # drops stale low-relevance potentials if there are too many
+        store = self.iFDD_potentials
+        store.clock += 1
+        if self.maxPotentials is not None and len(store) > self.maxPotentials:
+            slots = store.liveSlots()
+            order = np.lexsort((store.lastVisit[slots],
+                                np.nan_to_num(self._potentialScores(slots))))
+            # evict a quarter at once so that the sorting is amortized
+            store.evict(slots[order[:len(slots) - 3 * self.maxPotentials // 4]])
+        store.compact()
 
     def show(self):
         self.showFeatures()
@@ -346,7 +658,6 @@ class iFDD(Representation):
         # Add a new weight corresponding to the new added feature for all actions.
         # The new weight is set to zero if sparsify = False, and equal to the
         # sum of weights corresponding to the parents if sparsify = True
-        a = self.domain.actions_num
         # Number of feature before adding the new one
         f = self.features_num - 1
         if self.sparsify:
@@ -354,7 +665,7 @@ class iFDD(Representation):
                        self.weight_vec[p2_index::f]).reshape((-1, 1))
         else:
             newElem = None
-        self.weight_vec = addNewElementForAllActions(self.weight_vec, a, newElem)
+        self.addNewWeight(newElem)
         # We dont want to reuse the hased phi because phi function is changed!
         self.hashed_s = None
 
@@ -364,6 +675,7 @@ class iFDD(Representation):
             # shout(self,self.iFDD_features[frozenset([i])].index)
             self.iFDD_features[frozenset([i])] = feature
             self.featureIndex2feature[feature.index] = feature
+            self.featuresContaining[i].append(feature.index)
             # priority is 1/number of initial features corresponding to the
             # feature
             priority = 1
@@ -380,6 +692,8 @@ class iFDD(Representation):
         self.updateWeight(feature.p1, feature.p2)
         # Update the index to feature dictionary
         self.featureIndex2feature[feature.index] = feature
+        for f in feature.f_set:
+            self.featuresContaining[f].append(feature.index)
         # print "IN IFDD, New Feature = %d => Total Features = %d" % (feature.index, self.features_num)
         # Update the sorted list of features
         # priority is 1/number of initial features corresponding to the feature
@@ -389,55 +703,49 @@ class iFDD(Representation):
         # If you use cache, you should invalidate entries that their initial
         # set contains the set corresponding to the new feature
         if self.useCache:
-            for initialActiveFeatures in list(self.cache.keys()):
-                if initialActiveFeatures.issuperset(feature.f_set):
-                    if self.sparsify:
-                        self.cache.pop(initialActiveFeatures)
-                    else:
-                        # If sparsification is not used, simply add the new
-                        # feature id to all cached values that have feature set
-                        # which is a super set of the features corresponding to
-                        # the new discovered feature
-                        self.cache[initialActiveFeatures].append(feature.index)
+            for initialActiveFeatures in self.cache.supersets(feature.f_set):
+                if self.sparsify:
+                    self.cache.pop(initialActiveFeatures)
+                else:
+                    # If sparsification is not used, simply add the new
+                    # feature id to all cached values that have feature set
+                    # which is a super set of the features corresponding to
+                    # the new discovered feature
+                    self.cache[initialActiveFeatures].append(feature.index)
+        # phi changes for all states that activate the new feature
+        self.clearFeatureCache()
         if self.debug:
             self.show()
 
     def batchDiscover(self, td_errors, phi, states):
         # Discovers features using iFDD in batch setting.
         # TD_Error: p-by-1 (How much error observed for each sample)
-        # phi: n-by-p features corresponding to all samples (each column corresponds to one sample)
+        # phi: p-by-n features corresponding to all samples (each row corresponds to one sample), dense or sparse
         # self.batchThreshold is the minimum relevance value for the feature to
         # be expanded
         SHOW_PLOT = 0  # Shows the histogram of relevances
         maxDiscovery = self.maxBatchDiscovery
-        n = self.features_num  # number of features
-        p = len(td_errors)  # Number of samples
-        counts = np.zeros((n, n))
-        relevances = np.zeros((n, n))
-        for i in range(p):
-            phiphiT = np.outer(phi[i, :], phi[i, :])
-            if self.iFDDPlus:
-                relevances += phiphiT * td_errors[i]
-            else:
-                relevances += phiphiT * abs(td_errors[i])
-            counts += phiphiT
-        # Remove Diagonal and upper part of the relevances as they are useless
-        relevances = np.triu(relevances, 1)
-        non_zero_index = np.nonzero(relevances)
+        td_errors = np.asarray(td_errors, dtype=float).ravel()
+        if not self.iFDDPlus:
+            td_errors = np.abs(td_errors)
+        phi = sp.csr_matrix(phi, dtype=float)
+        # Sum of td-errors and number of samples for each pair of features
+        # (only the upper triangle, the diagonal and lower part are useless)
+        relevances = sp.triu(
+            phi.T * sp.diags(td_errors) * phi, 1, format="csr")
+        relevances.eliminate_zeros()
+        relevances.sort_indices()
+        # F1 and F2 are the parents of the potentials
+        F1, F2 = relevances.nonzero()
+        relevances = relevances.data
         if self.iFDDPlus:
             # Calculate relevances based on theoretical results of ICML 2013
             # potential submission
-            relevances[non_zero_index] = np.divide(
-                np.abs(relevances[non_zero_index]),
-                np.sqrt(counts[non_zero_index]))
-        else:
-            # Based on Geramifard11_ICML Paper
-            relevances[non_zero_index] = relevances[non_zero_index]
-
-        # Find indexes to non-zero excited pairs
-        # F1 and F2 are the parents of the potentials
-        (F1, F2) = relevances.nonzero()
-        relevances = relevances[F1, F2]
+            counts = sp.csr_matrix(phi.T * phi)
+            relevances = np.divide(
+                np.abs(relevances),
+                np.sqrt(np.asarray(counts[F1, F2]).ravel()))
+        # else: Based on Geramifard11_ICML Paper
         if len(relevances) == 0:
             # No feature to add
             self.logger.debug("iFDD Batch: Max Relevance = 0")
@@ -501,12 +809,16 @@ class iFDD(Representation):
         print("-" * 30)
         print(" index\t| f_set\t| relevance\t| count\t| p1\t| p2")
         print("-" * 30)
-        for _, potential in self.iFDD_potentials.items():
-            print(" %d\t| %s\t| %0.2f\t| %d\t| %s\t| %s" % (potential.index, str(np.sort(list(potential.f_set))), potential.relevance, potential.count, potential.p1, potential.p2))
+        store = self.iFDD_potentials
+        for slot in store.liveSlots():
+            relevance = old_div(abs(store["cumtderr"][slot]), np.sqrt(store["count"][slot])) \
+                if self.iFDDPlus else store["cumabstderr"][slot]
+            print(" %d\t| %s\t| %0.2f\t| %d\t| %s\t| %s" % (-1, str(np.sort(list(self._potentialSet(slot)))), relevance, store["count"][slot], store.p1[slot], store.p2[slot]))
 
     def showCache(self):
         if self.useCache:
-            print("Cache:")
+            print("Cache: %(size)d entries, %(hits)d hits, %(misses)d misses, "
+                  "%(evictions)d evictions" % self.cache.stats())
             if len(self.cache) == 0:
                 print('EMPTY!')
                 return
@@ -555,16 +867,16 @@ class iFDD(Representation):
             self.useCache,
             self.maxBatchDiscovery,
             self.batchThreshold,
-            self.iFDDPlus)
+            self.iFDDPlus,
+            cacheSize=self.cacheSize,
+            maxPotentials=self.maxPotentials)
         for s, f in list(self.iFDD_features.items()):
             new_f = deepcopy(f)
             new_s = deepcopy(s)
             ifdd.iFDD_features[new_s] = new_f
             ifdd.featureIndex2feature[new_f.index] = new_f
-        for s, p in list(self.iFDD_potentials.items()):
-            new_s = deepcopy(s)
-            new_p = deepcopy(p)
-            ifdd.iFDD_potentials[new_s] = deepcopy(new_p)
+        ifdd.featuresContaining = deepcopy(self.featuresContaining)
+        ifdd.iFDD_potentials = deepcopy(self.iFDD_potentials)
         ifdd.cache = deepcopy(self.cache)
         ifdd.sortediFDDFeatures = deepcopy(self.sortediFDDFeatures)
         ifdd.features_num = self.features_num
@@ -572,116 +884,6 @@ class iFDD(Representation):
         return ifdd
 
 
-class iFDDK_potential(iFDD_potential):
-    f_set = None  # Set of features it corresponds to [Immutable]
-    index = None  # If this feature has been discovered set this to its index else 0
-    p1 = None  # Parent 1 feature index
-    p2 = None  # Parent 2 feature index
-    a = None  # tE[phi |\delta|] estimate
-    b = None  # tE[phi \delta] estimate
-    c = 0.  # || phi ||^2_d estimate
-    n_crho = 0  # rho episode index of last update
-    e = None  # eligibility trace
-
-    nu = 0.  # w value of last statistics update
-    x_a = 0.  # y_a value of last statistics update
-    x_b = 0.  # y_b value of last stistics update
-    l = 0  # t value of last statistics update
-
-    def __init__(self, f_set, parent1, parent2):
-        self.f_set = deepcopy(f_set)
-        self.index = -1  # -1 means it has not been discovered yet
-        self.p1 = parent1
-        self.p2 = parent2
-        try:
-            self.hp_dtype = np.dtype('float128')
-        except TypeError:
-            self.hp_dtype = np.dtype('float64')
-        self.a = np.array(0., dtype=self.hp_dtype)
-        self.b = np.array(0., dtype=self.hp_dtype)
-        self.e = np.array(0., dtype=self.hp_dtype)
-
-    def relevance(self, kappa=None, plus=None):
-        if plus is None:
-            assert(kappa is not None)
-            plus = self.random_state.rand() >= kappa
-
-        if plus:
-            return old_div(np.abs(self.b), np.sqrt(self.c))
-        else:
-            return old_div(self.a, np.sqrt(self.c))
-
-    def update_statistics(self, rho, td_error, lambda_, discount_factor, phi, n_rho):
-        # phi = phi_s[self.p1] * phi_s[self.p2]
-        if n_rho > self.n_crho:
-            self.e = 0
-        self.e = rho * (lambda_ * discount_factor * self.e + phi)
-
-        self.a += np.abs(td_error) * self.e
-        self.b += td_error * self.e
-        self.c += phi ** 2
-
-        self.n_crho = n_rho
-
-    def update_lazy_statistics(self, rho, td_error, lambda_, discount_factor, phi, y_a, y_b, t_rho, w, t, n_rho):
-        # phi = phi_s[self.p1] * phi_s[self.p2]
-        if lambda_ > 0:
-            # catch up on old updates
-            gl = np.power(np.array(discount_factor * lambda_, dtype=self.hp_dtype), t_rho[n_rho] - self.l)
-            sa, sb = self.a.copy(), self.b.copy()
-            self.a += self.e * (y_a[self.n_crho] - self.x_a) * np.exp(-self.nu) * gl
-            self.b += self.e * (y_b[self.n_crho] - self.x_b) * np.exp(-self.nu) * gl
-            if not np.isfinite(self.a):
-                self.a = sa
-                warnings.warn("Overflow in potential relevance estimate")
-            if not np.isfinite(self.b):
-                self.b = sb
-                warnings.warn("Overflow in potential relevance estimate")
-            if n_rho > self.n_crho:
-                self.e = 0
-                # TODO clean up y_a and y_b
-            else:
-                self.e *= gl * (lambda_ * discount_factor) ** (t - 1 - t_rho[n_rho]) * np.exp(w - self.nu)
-
-        # updates based on current transition
-        # np.seterr(under="warn")
-        self.e = rho * (lambda_ * discount_factor * self.e + phi)
-
-        self.a += np.abs(td_error) * self.e
-        self.b += td_error * self.e
-        # np.seterr(under="raise")
-        self.c += phi ** 2
-        # save current values for next catch-up update
-        self.l = t
-        self.x_a = y_a[n_rho].copy()
-        self.x_b = y_b[n_rho].copy()
-        self.nu = w
-        self.n_crho = n_rho
-
-    def __deepcopy__(self, memo):
-        new_p = iFDD_potential(self.f_set, self.p1, self.p2)
-        for i in ["a", "b", "c", "n_crho", "e", "nu", "x_a", "x_b", "l"]:
-            new_p.__dict__[i] = self.__dict__[i]
-        return new_p
-
-
-def _set_comp_lt(a, b):
-    if len(a) < len(b):
-        return -1
-    elif len(a) > len(b):
-        return 1
-    l1 = list(a)
-    l2 = list(b)
-    l1.sort()
-    l2.sort()
-    for i in range(len(l1)):
-        if l1[i] < l2[i]:
-            return -1
-        if l1[i] > l2[i]:
-            return +1
-    return 0
-
-
 class iFDDK(iFDD):
 
     """iFDD(kappa) algorithm with support for elibility traces
@@ -695,7 +897,8 @@ class iFDDK(iFDD):
 
     def __init__(
         self, domain, discovery_threshold, initial_representation, sparsify=True,
-        discretization=20, debug=0, useCache=0, kappa=1e-5, lambda_=0., lazy=False):
+        discretization=20, debug=0, useCache=0, kappa=1e-5, lambda_=0., lazy=False,
+        cacheSize=100000, maxPotentials=None):
         try:
             self.hp_dtype = np.dtype('float128')
         except TypeError:
@@ -709,7 +912,89 @@ class iFDDK(iFDD):
         super(
             iFDDK, self).__init__(domain, discovery_threshold, initial_representation,
             sparsify=sparsify, discretization=discretization, debug=debug,
-            useCache=useCache)
+            useCache=useCache, cacheSize=cacheSize, maxPotentials=maxPotentials)
+
+    def _potentialColumns(self):
+        return {
+            "a": (self.hp_dtype, 0.),  # tE[phi |\delta|] estimate
+            "b": (self.hp_dtype, 0.),  # tE[phi \delta] estimate
+            "c": (np.float64, 0.),  # || phi ||^2_d estimate
+            "e": (self.hp_dtype, 0.),  # eligibility trace
+            "n_crho": (np.int64, 0),  # rho episode index of last update
+            "nu": (np.float64, 0.),  # w value of last statistics update
+            "x_a": (self.hp_dtype, 0.),  # y_a value of last statistics update
+            "x_b": (self.hp_dtype, 0.),  # y_b value of last stistics update
+            "l": (np.int64, 0)}  # t value of last statistics update
+
+    def _relevance(self, stats, plus):
+        # relevance of the potentials given their statistics
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if plus:
+                return old_div(np.abs(stats["b"]), np.sqrt(stats["c"]))
+            else:
+                return old_div(stats["a"], np.sqrt(stats["c"]))
+
+    def _potentialScores(self, slots):
+        store = self.iFDD_potentials
+        stats = dict((name, store[name][slots]) for name in ["a", "b", "c"])
+        return np.maximum(self._relevance(stats, True),
+                          self._relevance(stats, False))
+
+    def _updateStatistics(self, stats, rho, td_error, phi):
+        # updates the statistics of the potentials with activations phi
+        reset = self.n_rho > stats["n_crho"]
+        stats["e"] = rho * (self.lambda_ * self.discount_factor *
+                            np.where(reset, 0, stats["e"]) + phi)
+
+        stats["a"] = stats["a"] + np.abs(td_error) * stats["e"]
+        stats["b"] = stats["b"] + td_error * stats["e"]
+        stats["c"] = stats["c"] + phi ** 2
+
+        stats["n_crho"][:] = self.n_rho
+
+    def _updateLazyStatistics(self, stats, rho, td_error, phi):
+        # updates the statistics of the potentials with activations phi and
+        # catches up on the updates missed since their last activation
+        if self.lambda_ > 0:
+            # catch up on old updates
+            t_rho = self.t_rho[self.n_rho]
+            gl = np.power(np.array(self.discount_factor * self.lambda_,
+                                   dtype=self.hp_dtype), t_rho - stats["l"])
+            y_a = np.array([self.y_a[n] for n in stats["n_crho"].tolist()],
+                           dtype=self.hp_dtype)
+            y_b = np.array([self.y_b[n] for n in stats["n_crho"].tolist()],
+                           dtype=self.hp_dtype)
+            for name, x_name, y in [("a", "x_a", y_a), ("b", "x_b", y_b)]:
+                old = stats[name]
+                new = old + stats["e"] * (y - stats[x_name]) * np.exp(-stats["nu"]) * gl
+                overflow = ~np.isfinite(new)
+                if np.any(overflow):
+                    new[overflow] = old[overflow]
+                    warnings.warn("Overflow in potential relevance estimate")
+                stats[name] = new
+            # TODO clean up y_a and y_b
+            stats["e"] = np.where(
+                self.n_rho > stats["n_crho"], 0,
+                stats["e"] * gl * (self.lambda_ * self.discount_factor) ** (
+                    self.t - 1 - t_rho) * np.exp(self.w - stats["nu"]))
+
+        # updates based on current transition
+        stats["e"] = rho * (self.lambda_ * self.discount_factor * stats["e"] + phi)
+
+        stats["a"] = stats["a"] + np.abs(td_error) * stats["e"]
+        stats["b"] = stats["b"] + td_error * stats["e"]
+        stats["c"] = stats["c"] + phi ** 2
+        # save current values for next catch-up update
+        stats["l"][:] = self.t
+        stats["x_a"][:] = self.y_a[self.n_rho]
+        stats["x_b"][:] = self.y_b[self.n_rho]
+        stats["nu"][:] = self.w
+        stats["n_crho"][:] = self.n_rho
+
+    def _storeStatistics(self, slots, stats):
+        store = self.iFDD_potentials
+        for name, values in stats.items():
+            store[name][slots] = values
 
     def episodeTerminated(self):
         self.n_rho += 1
@@ -722,10 +1007,14 @@ class iFDDK(iFDD):
         print(" index\t| f_set\t| relevance\t| count\t| p1\t| p2")
         print("-" * 30)
 
-        k = sorted(iter(self.iFDD_potentials.keys()), cmp=_set_comp_lt)
-        for f_set in k:
-            potential = self.iFDD_potentials[f_set]
-            print(" %d\t| %s\t| %g\t| %d\t| %s\t| %s" % (potential.index, str(np.sort(list(potential.f_set))), potential.relevance(plus=True), potential.c, potential.p1, potential.p2))
+        store = self.iFDD_potentials
+        slots = store.liveSlots()
+        f_sets = [sorted(self._potentialSet(slot)) for slot in slots]
+        relevance = self._relevance(
+            dict((name, store[name][slots]) for name in ["b", "c"]), True)
+        for i in sorted(range(len(slots)), key=lambda i: (len(f_sets[i]), f_sets[i])):
+            slot = slots[i]
+            print(" %d\t| %s\t| %g\t| %d\t| %s\t| %s" % (-1, str(f_sets[i]), relevance[i], store["c"][slot], store.p1[slot], store.p2[slot]))
 
     def post_discover(self, s, terminal, a, td_error, phi_s, rho=1):
         """
@@ -734,34 +1023,37 @@ class iFDDK(iFDD):
         self.t += 1
         discovered = 0
         plus = self.random_state.rand() >= self.kappa
-        # if self.t == 22:
-        #    import ipdb; ipdb.set_trace()
         activeFeatures = phi_s.nonzero()[
                                        0]  # Indices of non-zero elements of vector phi_s
-        # print "Active Features:", activeFeatures, phi_s
+        g, h = np.triu_indices(len(activeFeatures), 1)
+        g, h = activeFeatures[g], activeFeatures[h]
         if not self.lazy:
-            dd = defaultdict(float)
-            for g_index, h_index in combinations(activeFeatures, 2):
-                # create potential if necessary
-                dd[self.get_potential(g_index, h_index).f_set] = phi_s[g_index] * phi_s[h_index]
-
-            for f, potential in list(self.iFDD_potentials.items()):
-                potential.update_statistics(
-                    rho, td_error, self.lambda_, self.discount_factor, dd[f], self.n_rho)
-                # print plus, potential.relevance(plus=plus)
-                if potential.relevance(plus=plus) >= self.discovery_threshold:
-                    self.addFeature(potential)
-                    del self.iFDD_potentials[f]
-                    discovered += 1
-            # print "t", self.t, "td_error", td_error, discovered
-            # self.showCache()
-            # print [ f.f_set for f in self.sortediFDDFeatures.toList()]
-            # self.showPotentials()
-
+            store = self.iFDD_potentials
+            # create potentials if necessary
+            slots = np.array([self._potentialSlot(g_index, h_index)
+                              for g_index, h_index in zip(g.tolist(), h.tolist())],
+                             dtype=int)
+            pair_phi = (phi_s[g] * phi_s[h]).astype(float)
+            valid = slots >= 0
+            slots, pair_phi = slots[valid], pair_phi[valid]
+            # the last pair of each conjunction determines its activation
+            active, last = np.unique(slots[::-1], return_index=True)
+            phi = np.zeros(store.size)
+            phi[active] = pair_phi[::-1][last]
+            store.lastVisit[active] = store.clock
+
+            # all potentials are updated
+            slots = store.liveSlots()
+            stats = dict((name, store[name][slots]) for name in store.columns)
+            self._updateStatistics(stats, rho, td_error, phi[slots])
+            self._storeStatistics(slots, stats)
+            for slot in slots[self._relevance(stats, plus) >= self.discovery_threshold]:
+                self._discoverPotential(slot)
+                discovered += 1
+            self._maintainPotentials()
             return discovered
 
-        for g_index, h_index in combinations(activeFeatures, 2):
-            discovered += self.inspectPair(g_index, h_index, td_error, phi_s, rho, plus)
+        discovered += self._inspectPairs(g, h, td_error, phi_s, rho, plus)
 
         if rho > 0:
             self.w += np.log(rho)
@@ -783,49 +1075,33 @@ class iFDDK(iFDD):
             assert(np.isfinite(self.y_a[self.n_rho]))
             assert(np.isfinite(self.y_b[self.n_rho]))
 
-        # print "t", self.t, "td_error", td_error, discovered
-        # self.showCache()
-        # print [ f.f_set for f in self.sortediFDDFeatures.toList()]
-        # self.showPotentials()
         return discovered
 
-    def get_potential(self, g_index, h_index):
-        g = self.featureIndex2feature[g_index].f_set
-        h = self.featureIndex2feature[h_index].f_set
-        f = g.union(h)
-        feature = self.iFDD_features.get(f)
-
-        if feature is not None:
-            # Already exists
-            return None
-
-        # Look it up in potentials
-        potential = self.iFDD_potentials.get(f)
-        if potential is None:
-            # Generate a new potential and put it in the dictionary
-            potential = iFDDK_potential(f, g_index, h_index)
-            self.iFDD_potentials[f] = potential
-        return potential
-
     def inspectPair(self, g_index, h_index, td_error, phi_s, rho, plus):
         # Inspect feature f = g union h where g_index and h_index are the indices of features g and h
         # If the relevance is > Threshold add it to the list of features
         # Returns True if a new feature is added
-        potential = self.get_potential(g_index, h_index)
-        phi = phi_s[g_index] * phi_s[h_index]
-        potential.update_lazy_statistics(
-            rho, td_error, self.lambda_, self.discount_factor, phi, self.y_a,
-            self.y_b, self.t_rho, self.w, self.t, self.n_rho)
+        return self._inspectPairs([g_index], [h_index], td_error, phi_s, rho, plus)
+
+    def _updatePotentials(self, slots, g_indices, h_indices, td_error, phi_s, rho, plus):
+        pairs = len(slots)
+        valid = np.flatnonzero(slots >= 0)
+        slots = slots[valid]
+        phi = (phi_s[np.asarray(g_indices, dtype=int)[valid]] *
+               phi_s[np.asarray(h_indices, dtype=int)[valid]]).astype(float)
+        store = self.iFDD_potentials
+        stats = dict((name, store[name][slots]) for name in store.columns)
+        self._updateLazyStatistics(stats, rho, td_error, phi)
         # Check for discovery
-
-        relevance = potential.relevance(plus=plus)
-        if relevance >= self.discovery_threshold:
+        relevance = self._relevance(stats, plus)
+        discoveries = np.flatnonzero(relevance >= self.discovery_threshold)
+        n = discoveries[0] + 1 if len(discoveries) else len(slots)
+        self._storeStatistics(slots[:n], dict((name, values[:n]) for name, values in stats.items()))
+        store.lastVisit[slots[:n]] = store.clock
+        if len(discoveries):
             self.maxRelevance = -np.inf
-            self.addFeature(potential)
-            del self.iFDD_potentials[potential.f_set]
-            return 1
-        else:
-            self.updateMaxRelevance(relevance)
-            return 0
-
-
+            self._discoverPotential(slots[n - 1])
+            return int(valid[n - 1]) + 1, 1
+        if len(slots):
+            self.updateMaxRelevance(np.fmax.reduce(relevance))
+        return pairs, 0
@@ -58,6 +58,24 @@ def all_linf_triangle_kernel(x, centers, widths):
     return res
 
 
+def states_gaussian_kernel(S, centers, widths):
+    """evaluates the kernels of all centers at all states (rows of S)"""
+    diff = old_div((S[:, np.newaxis, :] - centers), widths)
+    return np.exp(-(diff ** 2).sum(axis=2))
+
+
+def states_linf_triangle_kernel(S, centers, widths):
+    """evaluates the kernels of all centers at all states (rows of S)"""
+    d = 1. - old_div(np.abs(S[:, np.newaxis, :] - centers), widths)
+    d[d <= 0] = 0
+    return d.min(axis=2)
+
+
 batch = {}
 batch["gaussian_kernel"] = all_gaussian_kernel
 batch["linf_triangle_kernel"] = all_linf_triangle_kernel
+
+#: vectorized kernels evaluated for a batch of states
+states_batch = {}
+states_batch["gaussian_kernel"] = states_gaussian_kernel
+states_batch["linf_triangle_kernel"] = states_linf_triangle_kernel
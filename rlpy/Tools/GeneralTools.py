@@ -24,6 +24,7 @@ def module_exists(module_name):
         return True
 
 import sys
+import importlib
 import numpy as np
 # print "Numpy version:", numpy.__version__
 # print "Python version:", sys.version_info
@@ -65,42 +66,151 @@ def available_matplotlib_backends():
     backends = [backend_fname_formatter(fname) for fname in backend_fnames]
     return backends
 
-if module_exists('matplotlib'):
 
-    import matplotlib
-    import matplotlib.backends
-    import matplotlib.pyplot as plt
+class LazyModule(object):
+
+    """
+    Placeholder for a module which is only imported when one of its
+    attributes is accessed for the first time. Plotting (matplotlib),
+    networkx and sklearn are only needed for visualizations and a few
+    representations, so importing them lazily keeps ``import rlpy`` fast.
+
+    :param name: the full name of the module, e.g. ``"matplotlib.pyplot"``.
+    :param setup: (optional) function called once after the module has
+        been imported.
+    """
+
+    def __init__(self, name, setup=None):
+        self.__dict__["_name"] = name
+        self.__dict__["_setup"] = setup
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            module = importlib.import_module(self.__dict__["_name"])
+            self.__dict__["_module"] = module
+            if self.__dict__["_setup"] is not None:
+                self.__dict__["_setup"]()
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        return "<lazy module '%s'>" % self.__dict__["_name"]
+
+
+def _lazyAttribute(package, attr, spec):
+    module, _, name = spec.partition(":")
+    module = importlib.import_module(module, package)
+    name = name or attr
+    if hasattr(module, name):
+        return getattr(module, name)
+    # the attribute is the submodule itself
+    return module
+
+
+def lazyPackage(name, exports):
+    """
+    Makes the attributes *exports* of the package *name* (usually the
+    classes of its submodules) lazily imported: a submodule is only
+    imported when one of its attributes is accessed for the first time,
+    e.g. ``from rlpy.Domains import GridWorld`` does not import the other
+    domains. Call it at the end of the ``__init__.py`` of the package.
+    On Python 2 all attributes are imported immediately.
+
+    :param name: the name of the package (``__name__``).
+    :param exports: dictionary from the attribute names to the relative
+        names of the submodules defining them, optionally followed by
+        ``":<name in the submodule>"``. If the submodule does not define
+        the attribute, the attribute is the submodule itself.
+    """
+    package = sys.modules[name]
+    package.__all__ = sorted(exports)
+    if sys.version_info < (3, 5):
+        # the class of a module can not be changed
+        for attr, spec in exports.items():
+            setattr(package, attr, _lazyAttribute(name, attr, spec))
+        return
+    base = type(package)
+    resolved = {}
+
+    class LazyPackage(base):
+
+        def __getattribute__(self, attr):
+            # takes precedence over the submodules which the import system
+            # stores under the same names as the classes they define
+            if attr in exports:
+                if attr not in resolved:
+                    resolved[attr] = _lazyAttribute(name, attr, exports[attr])
+                return resolved[attr]
+            return base.__getattribute__(self, attr)
+
+        def __dir__(self):
+            return sorted(set(base.__dir__(self)) | set(exports))
+
+    package.__class__ = LazyPackage
+
+
+_matplotlib_configured = False
+
+
+def _configureMatplotlib():
+    """ Selects the backend and registers the colormaps of RLPy. Called when
+    matplotlib is used for the first time. """
+    global _matplotlib_configured
+    if _matplotlib_configured:
+        return
+    _matplotlib_configured = True
     mpl_backends = available_matplotlib_backends()
     if matplotlib_backend in mpl_backends:
         plt.switch_backend(matplotlib_backend)
     else:
         print("Warning: Matplotlib backend", matplotlib_backend, "not available")
         print("Available backends:", mpl_backends)
-    from matplotlib import pylab as pl
-    import matplotlib.ticker as ticker
-    from matplotlib import rc, colors
-    import matplotlib.patches as mpatches
-    import matplotlib.path as mpath
-    import matplotlib.cm as cm
-    from matplotlib import lines
-    from mpl_toolkits.mplot3d import axes3d
-    from matplotlib import lines  # for plotting lines in pendulum and PST
-    from matplotlib.patches import ConnectionStyle  # for cartpole
-    pl.ion()
-else:
-    print('matplotlib is not available => No Graphics')
+    # registers the 3d projection
+    importlib.import_module("mpl_toolkits.mplot3d")
+    plt.ion()
+    createColorMaps()
+    rc('font', family='serif', size=15,
+       weight="bold", **{"sans-serif": ["Helvetica"]})
+    rc("axes", labelsize=15)
+    rc("xtick", labelsize=15)
+    rc("ytick", labelsize=15)
+    # rc('text',usetex=False)
 
-if module_exists('networkx'):
-    import networkx as nx
-else:
-    'networkx is not available => No Graphics on SystemAdmin domain'
+    # Try to use latex fonts, if available
+    # rc('text',usetex=True)
 
-if module_exists('sklearn'):
-    from sklearn import svm
-else:
-    'sklearn is not available => No BEBF representation available'
-from scipy import stats
-from scipy import misc
+
+def rc(*args, **kwargs):
+    """ Sets matplotlib parameters, see :py:func:`matplotlib.rc`. """
+    return matplotlib.rc(*args, **kwargs)
+
+
+matplotlib = LazyModule("matplotlib", _configureMatplotlib)
+plt = LazyModule("matplotlib.pyplot", _configureMatplotlib)
+pl = LazyModule("matplotlib.pylab", _configureMatplotlib)
+ticker = LazyModule("matplotlib.ticker", _configureMatplotlib)
+colors = LazyModule("matplotlib.colors", _configureMatplotlib)
+mpatches = LazyModule("matplotlib.patches", _configureMatplotlib)
+mpath = LazyModule("matplotlib.path", _configureMatplotlib)
+cm = LazyModule("matplotlib.cm", _configureMatplotlib)
+lines = LazyModule("matplotlib.lines", _configureMatplotlib)
+axes3d = LazyModule("mpl_toolkits.mplot3d.axes3d", _configureMatplotlib)
+# only needed for the graphics of the SystemAdministrator domain
+nx = LazyModule("networkx")
+# only needed by the BEBF representation
+svm = LazyModule("sklearn.svm")
+stats = LazyModule("scipy.stats")
+misc = LazyModule("scipy.misc")
 from scipy import linalg
 from scipy.sparse import linalg as slinalg
 from scipy import sparse as sp
@@ -782,6 +892,29 @@ def wrap(x, m, M):
     return x
 
 
+def wrap_vec(X, m, M):
+    """
+    :param X: an array of values
+    :param m: minimum possible value in range
+    :param M: maximum possible value in range
+
+    Element-wise version of :py:meth:`~rlpy.Tools.GeneralTools.wrap`, which
+    gives exactly the same result for each entry of ``X``.
+
+    """
+    X = np.array(X, dtype=float)
+    diff = M - m
+    above = X > M
+    while above.any():
+        X[above] -= diff
+        above = X > M
+    below = X < m
+    while below.any():
+        X[below] += diff
+        below = X < m
+    return X
+
+
 def powerset(iterable, ascending=1):
     """
     :param iterable: an iterable type (list, ndarray)
@@ -840,8 +973,14 @@ def addNewElementForAllActions(weight_vec, actions_num, newElem=None):
         return weight_vec
 
 
-def solveLinear(A, b):
-    """ Solve the linear equation Ax=b. Return tuple (x, time to solve). """
+def solveLinear(A, b, solver=None):
+    """ Solve the linear equation Ax=b. Return tuple (x, time to solve).
+
+    :param solver: (optional) :py:class:`~rlpy.Tools.LinearSolvers.LinearSolver`
+        to use instead of a direct solve.
+    """
+    if solver is not None:
+        return solver.solve(A, b)
     error = np.inf  # just to be safe, initialize error variable here
     if sp.issparse(A):
     # print 'sparse', type(A)
@@ -1068,8 +1207,8 @@ def pretty(X, format='%0.3f'):
 
 def regularize(A):
     """ Regularize the numpy arrayLike object ``A``.
-    Adds REGULARIZATION*I To A, where I is identity matrix and REGULARIZATION
-    is defined in GeneralTools.py.\n
+    Returns REGULARIZATION*I + A, where I is identity matrix and REGULARIZATION
+    is defined in GeneralTools.py. ``A`` itself is not modified.\n
     This is often done before calling the linearSolver.
 
     .. note::
@@ -1080,18 +1219,14 @@ def regularize(A):
     x, y = A.shape
     assert x == y  # Square matrix
     if sp.issparse(A):
-        A = A + REGULARIZATION * sp.eye(x, x)
-        # print 'REGULARIZE', type(A)
-    else:
-        # print 'REGULARIZE', type(A)
-        for i in range(x):
-            A[i, i] += REGULARIZATION
-    return A
+        return A + REGULARIZATION * sp.eye(x, x)
+    return A + REGULARIZATION * np.eye(x)
 
 
 def sparsity(A):
     """ Returns the percentage of nonzero elements in ``A``. """
-    return (1 - old_div(np.count_nonzero(A), (np.prod(A.shape) * 1.))) * 100
+    nonzero = A.count_nonzero() if sp.issparse(A) else np.count_nonzero(A)
+    return (1 - old_div(nonzero, (np.prod(A.shape) * 1.))) * 100
 
 
 # CURRENTLY UNUSED
@@ -1167,7 +1302,8 @@ def rk4(derivs, y0, t, *args, **kwargs):
     :func:`scipy.integrate`.
 
     *y0*
-        initial state vector
+        initial state vector. A 2D array of shape (state dim, n) integrates
+        n systems at once if ``derivs`` operates column-wise.
 
     *t*
         sample times
@@ -1210,12 +1346,8 @@ def rk4(derivs, y0, t, *args, **kwargs):
     scipy.integrate tools rather than this function.
     """
 
-    try:
-        Ny = len(y0)
-    except TypeError:
-        yout = np.zeros((len(t),), np.float_)
-    else:
-        yout = np.zeros((len(t), Ny), np.float_)
+    # y0 may also hold a batch of systems, e.g. one column per system
+    yout = np.zeros((len(t),) + np.shape(y0), np.float_)
 
     yout[0] = y0
     i = 0
@@ -1295,18 +1427,6 @@ def rk4(derivs, y0, t, *args, **kwargs):
 #        print "and that latex is installed correctly."
 # print "\nDisabling latex functionality, using matplotlib native fonts."
 
-if module_exists('matplotlib'):
-    createColorMaps()
-    rc('font', family='serif', size=15,
-       weight="bold", **{"sans-serif": ["Helvetica"]})
-    rc("axes", labelsize=15)
-    rc("xtick", labelsize=15)
-    rc("ytick", labelsize=15)
-    # rc('text',usetex=False)
-
-    # Try to use latex fonts, if available
-    # rc('text',usetex=True)
-
 # Colors
 PURPLE = '\033[95m'
 BLUE = '\033[94m'
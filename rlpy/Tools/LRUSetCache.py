@@ -0,0 +1,128 @@
+"""Least recently used cache keyed by sets"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+
+from future import standard_library
+standard_library.install_aliases()
+from builtins import object
+from collections import OrderedDict
+
+__copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
+__credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
+               "William Dabney", "Jonathan P. How"]
+__license__ = "BSD 3-Clause"
+
+
+class LRUSetCache(object):
+
+    """Cache mapping frozensets to values which holds at most *maxsize*
+    entries. When full, the least recently used entry is evicted.
+    A reverse index from each element to the keys containing it allows
+    finding all keys that are supersets of a given set without scanning
+    the whole cache.
+    Example:
+    >>> C = LRUSetCache(2)
+    >>> C[frozenset([1, 2])] = "A"
+    >>> C[frozenset([2, 3])] = "B"
+    >>> C.get(frozenset([1, 2]))
+    'A'
+    >>> C[frozenset([3, 4])] = "C"  # evicts [2, 3]
+    >>> C.supersets([2])
+    [frozenset({1, 2})]
+    """
+
+    def __init__(self, maxsize=None):
+        """
+        :param maxsize: maximum number of entries (``None`` for an
+            unbounded cache).
+        """
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._keysContaining = {}
+        #: number of lookups that found an entry
+        self.hits = 0
+        #: number of lookups that did not find an entry
+        self.misses = 0
+        #: number of entries removed to respect *maxsize*
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored for *key* (or *default*) and marks the
+        entry as most recently used.
+        """
+        value = self._entries.pop(key, None)
+        if value is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        # re-insert as the most recently used entry
+        self._entries[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self._entries:
+            del self._entries[key]
+            self._entries[key] = value
+            return
+        self._entries[key] = value
+        for e in key:
+            self._keysContaining.setdefault(e, set()).add(key)
+        if self.maxsize is not None:
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def __getitem__(self, key):
+        return self._entries[key]
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        value = self._entries.pop(key)
+        for e in key:
+            keys = self._keysContaining[e]
+            keys.discard(key)
+            if len(keys) == 0:
+                del self._keysContaining[e]
+        return value
+
+    def pop(self, key):
+        """ Removes the entry of *key* and returns its value. """
+        return self._remove(key)
+
+    def supersets(self, elements):
+        """
+        Returns the cached keys that contain all of *elements*.
+        """
+        elements = frozenset(elements)
+        if len(elements) == 0:
+            return list(self._entries.keys())
+        postings = [self._keysContaining.get(e, ()) for e in elements]
+        smallest = min(postings, key=len)
+        return [key for key in smallest if key.issuperset(elements)]
+
+    def items(self):
+        return self._entries.items()
+
+    def keys(self):
+        return self._entries.keys()
+
+    def clear(self):
+        """ Removes all entries; the counters are kept. """
+        self._entries.clear()
+        self._keysContaining.clear()
+
+    def stats(self):
+        """
+        :return: dictionary with the number of entries, hits, misses and
+            evictions.
+        """
+        return {"size": len(self._entries), "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
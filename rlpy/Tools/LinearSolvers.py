@@ -0,0 +1,323 @@
+"""Solvers for the linear systems of the least-squares methods"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+
+from future import standard_library
+standard_library.install_aliases()
+from builtins import object
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as slinalg
+from scipy import linalg
+from .GeneralTools import clock, deltaT
+
+__copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
+__credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
+               "William Dabney", "Jonathan P. How"]
+__license__ = "BSD 3-Clause"
+
+
+class LinearSolver(object):
+
+    """
+    Base class of the solvers of the linear equation Ax=b used by
+    :py:meth:`~rlpy.Tools.GeneralTools.solveLinear` and the LSTD-based
+    agents. Solvers keep state between calls (factorizations, last solution),
+    which makes them cheap on the sequences of nearly identical systems of
+    policy iteration, and record the following metrics:
+
+    * ``calls``: number of solved systems
+    * ``total_time`` and ``last_time``: time spent solving (s)
+    * ``last_residual`` and ``max_residual``: the residual ``||Ax-b||``
+    * ``iterations``: total number of iterations (iterative solvers only)
+    * ``fallbacks``: number of times the direct solver had to be used
+      instead
+
+    Subclasses implement :py:meth:`_solve`.
+    """
+
+    #: name used to select the solver in :py:func:`linearSolver`
+    name = None
+
+    def __init__(self, compute_residual=True):
+        """
+        :param compute_residual: compute the residual ``||Ax-b||`` of each
+            solution (one additional matrix-vector product).
+        """
+        self.compute_residual = compute_residual
+        self.reset()
+
+    def reset(self):
+        """ Clears the metrics. """
+        self.calls = 0
+        self.total_time = 0.
+        self.last_time = 0.
+        self.last_residual = np.nan
+        self.max_residual = 0.
+        self.iterations = 0
+        self.fallbacks = 0
+
+    def solve(self, A, b, x0=None):
+        """
+        Solves the linear equation Ax=b.
+
+        :param A: square matrix (numpy array / matrix or scipy.sparse matrix).
+        :param b: right hand side.
+        :param x0: (optional) initial guess of the solution, e.g. the current
+            weights. Only used by solvers which can be warm-started.
+
+        :return: The tuple (x, time to solve).
+        """
+        b = np.asarray(b, dtype=float).ravel()
+        if x0 is not None:
+            x0 = np.asarray(x0, dtype=float).ravel()
+        start_log_time = clock()
+        x = np.asarray(self._solve(A, b, x0), dtype=float).ravel()
+        solve_time = deltaT(start_log_time)
+        self.calls += 1
+        self.last_time = solve_time
+        self.total_time += solve_time
+        if self.compute_residual:
+            self.last_residual = residual(A, x, b)
+            self.max_residual = max(self.max_residual, self.last_residual)
+        return x, solve_time
+
+    def _solve(self, A, b, x0):
+        """ Returns the solution of Ax=b, *b* and *x0* are flat arrays. """
+        raise NotImplementedError
+
+    def _fallback(self, A, b):
+        self.fallbacks += 1
+        return directSolve(A, b)
+
+    def metrics(self):
+        """
+        :return: dictionary of the metrics of the solver.
+        """
+        return {"solver": self.name, "calls": self.calls,
+                "total_time": self.total_time, "last_time": self.last_time,
+                "last_residual": self.last_residual,
+                "max_residual": self.max_residual,
+                "iterations": self.iterations, "fallbacks": self.fallbacks}
+
+    def __repr__(self):
+        return "%s()" % self.__class__.__name__
+
+
+def residual(A, x, b):
+    """ Returns ``||Ax-b||`` for a dense or sparse matrix *A*. """
+    if sp.issparse(A):
+        Ax = A.dot(x)
+    else:
+        Ax = np.dot(np.asarray(A), x)
+    return np.linalg.norm(np.asarray(Ax).ravel() - b)
+
+
+def directSolve(A, b):
+    """ Solves Ax=b with LU decomposition (``spsolve`` if *A* is sparse). """
+    if sp.issparse(A):
+        return slinalg.spsolve(sp.csc_matrix(A), b)
+    return linalg.solve(np.asarray(A), b)
+
+
+class DirectSolver(LinearSolver):
+
+    """
+    Solves each system from scratch with LU decomposition: dense
+    ``scipy.linalg.solve`` or ``scipy.sparse.linalg.spsolve`` for sparse
+    matrices.
+    """
+
+    name = "direct"
+
+    def _solve(self, A, b, x0):
+        return directSolve(A, b)
+
+
+class SparseLUSolver(LinearSolver):
+
+    """
+    Sparse LU decomposition (SuperLU) which reuses work between calls.
+    The column ordering computed for the first matrix (the symbolic part of
+    the factorization) is reused for all following matrices with the same
+    sparsity pattern, and the whole factorization is reused if the matrix
+    did not change at all (e.g. several right hand sides).
+    Dense matrices are converted to sparse ones.
+    """
+
+    name = "splu"
+
+    def __init__(self, permc_spec="COLAMD", **kwargs):
+        """
+        :param permc_spec: the column ordering computed for a new sparsity
+            pattern (see ``scipy.sparse.linalg.splu``).
+        """
+        self.permc_spec = permc_spec
+        self._indptr = None
+        self._indices = None
+        self._data = None
+        self._columns = None
+        self._lu = None
+        self._permuted = False
+        #: number of full factorizations (including the column ordering)
+        self.symbolic_factorizations = 0
+        #: number of factorizations which reused the column ordering
+        self.numeric_factorizations = 0
+        super(SparseLUSolver, self).__init__(**kwargs)
+
+    def _samePattern(self, A):
+        return (self._indptr is not None and
+                np.array_equal(self._indptr, A.indptr) and
+                np.array_equal(self._indices, A.indices))
+
+    def _solve(self, A, b, x0):
+        A = sp.csc_matrix(A)
+        A.sum_duplicates()
+        A.sort_indices()
+        if self._samePattern(A):
+            if not np.array_equal(self._data, A.data):
+                # reuse the column ordering of the first factorization
+                self._lu = slinalg.splu(A[:, self._columns],
+                                        permc_spec="NATURAL")
+                self._permuted = True
+                self._data = A.data.copy()
+                self.numeric_factorizations += 1
+        else:
+            self._lu = slinalg.splu(A, permc_spec=self.permc_spec)
+            # perm_c maps the original columns to their position
+            self._columns = np.argsort(self._lu.perm_c)
+            self._permuted = False
+            self._indptr = A.indptr.copy()
+            self._indices = A.indices.copy()
+            self._data = A.data.copy()
+            self.symbolic_factorizations += 1
+        if not self._permuted:
+            return self._lu.solve(b)
+        # the factorization is of A with its columns reordered
+        x = np.empty_like(b)
+        x[self._columns] = self._lu.solve(b)
+        return x
+
+    def metrics(self):
+        m = super(SparseLUSolver, self).metrics()
+        m["symbolic_factorizations"] = self.symbolic_factorizations
+        m["numeric_factorizations"] = self.numeric_factorizations
+        return m
+
+
+class IterativeSolver(LinearSolver):
+
+    """
+    Krylov subspace solvers of ``scipy.sparse.linalg``, warm-started from
+    the given initial guess or the last solution. Solving a sequence of
+    similar systems this way is much cheaper than factorizing each of them.
+    If the iterations do not converge, the system is solved directly.
+
+    Methods:
+
+    * ``"cg"``: conjugate gradient, for symmetric positive definite A
+    * ``"lgmres"``, ``"gmres"``, ``"bicgstab"``: general square A
+    * ``"lsqr"``: least squares solution, also for singular A
+    """
+
+    METHODS = ("cg", "lgmres", "gmres", "bicgstab", "lsqr")
+
+    def __init__(self, method="lgmres", tol=1e-10, maxiter=None,
+                 warm_start=True, **kwargs):
+        """
+        :param method: one of ``IterativeSolver.METHODS``.
+        :param tol: tolerance on the residual relative to ``||b||``.
+        :param maxiter: maximum number of iterations (default 1000, or
+            ``2 * n`` for lsqr).
+        :param warm_start: start from the last solution if no initial guess
+            is given to :py:meth:`solve`.
+        """
+        if method not in self.METHODS:
+            raise ValueError("Unknown iterative method %s, use one of %s"
+                             % (method, ", ".join(self.METHODS)))
+        self.name = self.method = method
+        self.tol = tol
+        self.maxiter = maxiter
+        self.warm_start = warm_start
+        self.x = None
+        super(IterativeSolver, self).__init__(**kwargs)
+
+    def _solve(self, A, b, x0):
+        if x0 is None and self.warm_start:
+            x0 = self.x
+        if x0 is not None and x0.shape != b.shape:
+            x0 = None
+        if not np.any(b):
+            x = np.zeros_like(b)
+        elif self.method == "lsqr":
+            result = slinalg.lsqr(A, b, atol=self.tol, btol=self.tol,
+                                  iter_lim=self.maxiter, x0=x0)
+            x, istop, itn = result[:3]
+            self.iterations += itn
+            # 3 and 6: A is ill-conditioned, 7: iteration limit reached
+            if istop in (3, 6, 7):
+                x = self._fallback(A, b)
+        else:
+            counter = [0]
+
+            def callback(xk):
+                counter[0] += 1
+            solver = getattr(slinalg, self.method)
+            x, info = solver(A, b, x0=x0, tol=self.tol, atol=0.,
+                             maxiter=1000 if self.maxiter is None
+                             else self.maxiter,
+                             callback=callback)
+            self.iterations += counter[0]
+            if info != 0:
+                x = self._fallback(A, b)
+        self.x = np.array(x, dtype=float).ravel()
+        return self.x
+
+    def __repr__(self):
+        return "IterativeSolver(%r, tol=%g)" % (self.method, self.tol)
+
+
+class CholeskySolver(LinearSolver):
+
+    """
+    Cholesky decomposition for symmetric positive definite A, about twice as
+    fast as LU. Falls back to the direct solver if A is not symmetric or not
+    positive definite, as the decomposition only reads one triangle of A.
+    Sparse matrices are converted to dense ones.
+    """
+
+    name = "cholesky"
+
+    def _solve(self, A, b, x0):
+        A = A.toarray() if sp.issparse(A) else np.asarray(A)
+        if not np.allclose(A, A.T):
+            return self._fallback(A, b)
+        try:
+            factor = linalg.cho_factor(A, check_finite=False)
+        except linalg.LinAlgError:
+            return self._fallback(A, b)
+        return linalg.cho_solve(factor, b, check_finite=False)
+
+
+def linearSolver(solver=None, **kwargs):
+    """
+    Creates a :py:class:`LinearSolver`.
+
+    :param solver: ``None`` (the direct solver), an existing
+        :py:class:`LinearSolver` (returned as is) or the name of a solver:
+        ``"direct"``, ``"splu"``, ``"cholesky"`` or one of the iterative
+        methods ``IterativeSolver.METHODS``.
+    :param kwargs: arguments of the solver class.
+    """
+    if solver is None:
+        return DirectSolver(**kwargs)
+    if isinstance(solver, LinearSolver):
+        return solver
+    if solver in IterativeSolver.METHODS:
+        return IterativeSolver(solver, **kwargs)
+    for cls in (DirectSolver, SparseLUSolver, CholeskySolver):
+        if cls.name == solver:
+            return cls(**kwargs)
+    raise ValueError("Unknown linear solver %s" % solver)
@@ -0,0 +1,311 @@
+"""Fixed-capacity storage of transitions for batch agents"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import absolute_import
+
+from future import standard_library
+standard_library.install_aliases()
+from builtins import range
+from builtins import object
+import os
+import numpy as np
+
+__copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
+__credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
+               "William Dabney", "Jonathan P. How"]
+__license__ = "BSD 3-Clause"
+
+
+class SampleStore(object):
+
+    """
+    Storage for the transitions (s, a, r, ns, na, terminal) gathered by a
+    batch agent, kept in one preallocated array per field:
+
+    ========  ==========================  ====================
+    field     shape                       dtype
+    ========  ==========================  ====================
+    s, ns     (capacity, state_dims)      *state_dtype*
+    a, na     (capacity, 1)               smallest unsigned int
+                                          holding *actions_num*
+    r         (capacity, 1)               float64
+    terminal  (capacity, 1)               bool
+    p_actions (capacity, actions_num)     bool (with *masks*)
+    np_actions (capacity, actions_num)    bool (with *masks*)
+    ========  ==========================  ====================
+
+    The arrays are exposed as attributes (e.g. ``store.s``), so the first
+    :py:attr:`size` rows can be sliced without copying.
+    If *ring* is set, new transitions overwrite the oldest ones once the
+    store is full, which gives a sliding window over the most recent
+    *capacity* transitions (the rows are then not in chronological order,
+    see :py:meth:`order`). Otherwise adding to a full store raises an
+    ``IndexError``.
+
+    If *directory* is given, the arrays are memory-mapped ``.npy`` files
+    (``<directory>/<field>.npy``) so that the store can be larger than the
+    memory. Such a store can be reopened with :py:meth:`open`.
+    Stored transitions can be read in chronological chunks with
+    :py:meth:`chunks`, which makes the files usable as offline datasets
+    (see :py:class:`~rlpy.Experiments.OfflineExperiment.OfflineExperiment`).
+
+    Example:
+
+    >>> store = SampleStore(1000, 2, actions_num=4, ring=True)
+    >>> store.add([0, 0], 1, -1., [0, 1], 3, False)
+    0
+    >>> store.s[:store.size]
+    array([[0., 0.]])
+
+    """
+    #: names of the stored fields, in the order of :py:meth:`add`
+    FIELDS = ("s", "a", "r", "ns", "na", "terminal")
+    #: names of the masks of the possible actions in s and ns
+    MASK_FIELDS = ("p_actions", "np_actions")
+
+    def __init__(self, capacity, state_dims, actions_num=None,
+                 state_dtype=np.float64, ring=False, directory=None,
+                 masks=False):
+        """
+        :param capacity: maximum number of stored transitions.
+        :param state_dims: number of dimensions of the states.
+        :param actions_num: number of actions; used to choose a compact
+            dtype for the actions (uint32 if not given).
+        :param state_dtype: dtype of the states, e.g. ``np.float32`` or an
+            integer type for discrete domains to save memory.
+        :param ring: overwrite the oldest transitions when full.
+        :param directory: (optional) directory of the memory-mapped arrays.
+        :param masks: also store the possible actions in s and ns as boolean
+            masks (requires *actions_num*).
+        """
+        self.capacity = int(capacity)
+        self.state_dims = int(state_dims)
+        self.ring = ring
+        self.directory = directory
+        if actions_num is None:
+            action_dtype = np.dtype(np.uint32)
+        else:
+            action_dtype = np.min_scalar_type(max(int(actions_num) - 1, 0))
+        self.dtypes = {"s": np.dtype(state_dtype), "ns": np.dtype(state_dtype),
+                       "a": action_dtype, "na": action_dtype,
+                       "r": np.dtype(np.float64),
+                       "terminal": np.dtype(bool),
+                       "p_actions": np.dtype(bool),
+                       "np_actions": np.dtype(bool)}
+        self.actions_num = actions_num
+        self.fields = self.FIELDS
+        if masks:
+            assert actions_num is not None, "masks require actions_num"
+            self.fields = self.FIELDS + self.MASK_FIELDS
+        #: total number of transitions added (including overwritten ones)
+        self.count = 0
+        if directory is not None and not os.path.exists(directory):
+            os.makedirs(directory)
+        for name in self.fields:
+            setattr(self, name, self._allocate(name))
+
+    def _shape(self, name):
+        if name in ("s", "ns"):
+            return (self.capacity, self.state_dims)
+        if name in self.MASK_FIELDS:
+            return (self.capacity, self.actions_num)
+        return (self.capacity, 1)
+
+    @property
+    def masks(self):
+        """ Whether the possible actions are stored. """
+        return self.MASK_FIELDS[0] in self.fields
+
+    def _mask(self, actions):
+        actions = np.asarray(actions)
+        if actions.dtype == bool:
+            return actions
+        mask = np.zeros(self.actions_num, dtype=bool)
+        mask[actions.astype(int)] = True
+        return mask
+
+    def _allocate(self, name, mode="w+"):
+        if self.directory is None:
+            return np.zeros(self._shape(name), dtype=self.dtypes[name])
+        return np.lib.format.open_memmap(
+            os.path.join(self.directory, name + ".npy"), mode=mode,
+            dtype=self.dtypes[name], shape=self._shape(name))
+
+    @property
+    def size(self):
+        """ Number of stored transitions. """
+        return min(self.count, self.capacity)
+
+    @property
+    def index(self):
+        """ Row of the next transition. """
+        if self.ring:
+            return self.count % self.capacity
+        return self.count
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def __len__(self):
+        return self.size
+
+    def add(self, s, a, r, ns, na, terminal, p_actions=None, np_actions=None):
+        """
+        Stores one transition.
+
+        :param p_actions: the possible actions in s (ids or boolean mask),
+            only stored with *masks*.
+        :param np_actions: the possible actions in ns.
+
+        :return: the row of the transition.
+        """
+        i = self.index
+        if i >= self.capacity:
+            raise IndexError("Sample store is full (%d transitions); "
+                             "use ring=True for a sliding window"
+                             % self.capacity)
+        self.s[i] = s
+        self.a[i] = a
+        self.r[i] = r
+        self.ns[i] = ns
+        self.na[i] = na
+        self.terminal[i] = terminal
+        if self.masks:
+            self.p_actions[i] = self._mask(p_actions)
+            self.np_actions[i] = self._mask(np_actions)
+        self.count += 1
+        return i
+
+    def order(self):
+        """
+        :return: the rows of the stored transitions from the oldest to the
+            newest.
+        """
+        if self.ring and self.count > self.capacity:
+            return np.roll(np.arange(self.capacity), -self.index)
+        return np.arange(self.size)
+
+    def transitions(self):
+        """
+        Iterates over the stored transitions (s, a, r, ns, na, terminal)
+        from the oldest to the newest.
+        """
+        for i in self.order():
+            yield (self.s[i], int(self.a[i, 0]), float(self.r[i, 0]),
+                   self.ns[i], int(self.na[i, 0]), bool(self.terminal[i, 0]))
+
+    def chunks(self, size, n=None):
+        """
+        Iterates over the stored transitions from the oldest to the newest
+        in chunks of at most *size* transitions. Each chunk is a dictionary
+        from the field names to arrays with one row per transition.
+
+        :param n: (optional) only read the first *n* transitions.
+        """
+        order = self.order()
+        if n is not None:
+            order = order[:n]
+        for start in range(0, len(order), size):
+            rows = order[start:start + size]
+            if rows[-1] - rows[0] == len(rows) - 1:
+                # consecutive rows are read as views without copying
+                rows = slice(rows[0], rows[-1] + 1)
+            yield dict((name, getattr(self, name)[rows])
+                       for name in self.fields)
+
+    def clear(self):
+        """ Removes all transitions (the memory is kept). """
+        self.count = 0
+
+    def flush(self):
+        """ Writes the memory-mapped arrays to disk. """
+        if self.directory is not None:
+            for name in self.fields:
+                getattr(self, name).flush()
+            self._writeCount()
+
+    def _writeCount(self):
+        with open(os.path.join(self.directory, "count.txt"), "w") as f:
+            f.write("%d\n" % self.count)
+
+    def save(self, path):
+        """
+        Saves the stored transitions in chronological order to the
+        ``.npz`` file *path*. They can be read back with :py:meth:`load`.
+        """
+        order = self.order()
+        np.savez(path, **dict((name, getattr(self, name)[order])
+                              for name in self.fields))
+
+    @classmethod
+    def load(cls, path, capacity=None, **kwargs):
+        """
+        Creates a store with the transitions saved by :py:meth:`save`.
+
+        :param path: the ``.npz`` file.
+        :param capacity: capacity of the new store (default: the number of
+            saved transitions). If smaller, only the newest transitions are
+            kept (requires ``ring=True``).
+        :param kwargs: further arguments of :py:class:`SampleStore`.
+        """
+        with np.load(path) as data:
+            fields = dict((name, data[name]) for name in data.files)
+        n = len(fields["r"])
+        kwargs.setdefault("state_dtype", fields["s"].dtype)
+        if "p_actions" in fields:
+            kwargs.setdefault("masks", True)
+            kwargs.setdefault("actions_num", fields["p_actions"].shape[1])
+        store = cls(n if capacity is None else capacity, fields["s"].shape[1],
+                    **kwargs)
+        store.extend(**fields)
+        return store
+
+    def extend(self, s, a, r, ns, na, terminal, p_actions=None,
+               np_actions=None):
+        """
+        Stores several transitions at once, given as arrays with one row
+        per transition (the masks of the possible actions as boolean arrays).
+        """
+        n = len(r)
+        if not self.ring and self.count + n > self.capacity:
+            raise IndexError("Sample store is full (%d transitions); "
+                             "use ring=True for a sliding window"
+                             % self.capacity)
+        values = {"s": s, "a": a, "r": r, "ns": ns, "na": na,
+                  "terminal": terminal, "p_actions": p_actions,
+                  "np_actions": np_actions}
+        start = max(0, n - self.capacity)
+        rows = (self.count + start + np.arange(n - start)) % self.capacity
+        for name in self.fields:
+            value = np.asarray(values[name])[start:]
+            getattr(self, name)[rows] = value.reshape(len(rows), -1)
+        self.count += n
+
+    @classmethod
+    def open(cls, directory, ring=False, mode="r+"):
+        """
+        Reopens the memory-mapped store of *directory* (see
+        :py:meth:`flush`).
+
+        :param mode: ``"r+"`` to continue adding transitions or ``"r"``
+            for read only access.
+        """
+        store = cls.__new__(cls)
+        store.directory = directory
+        store.ring = ring
+        store.dtypes = {}
+        store.fields = cls.FIELDS
+        if os.path.exists(os.path.join(directory, "p_actions.npy")):
+            store.fields = cls.FIELDS + cls.MASK_FIELDS
+        for name in store.fields:
+            array = np.load(os.path.join(directory, name + ".npy"),
+                            mmap_mode=mode)
+            setattr(store, name, array)
+            store.dtypes[name] = array.dtype
+        store.capacity, store.state_dims = store.s.shape
+        store.actions_num = store.p_actions.shape[1] if store.masks else None
+        with open(os.path.join(directory, "count.txt")) as f:
+            store.count = int(f.read())
+        return store
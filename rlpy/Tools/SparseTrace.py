@@ -0,0 +1,201 @@
+"""Sparse Eligibility Trace"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import absolute_import
+
+from future import standard_library
+standard_library.install_aliases()
+from builtins import object
+import numpy as np
+
+__copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
+__credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
+               "William Dabney", "Jonathan P. How"]
+__license__ = "BSD 3-Clause"
+
+
+class SparseTrace(object):
+
+    """
+    Eligibility trace that only stores its non-negligible entries.
+
+    The entries are kept as a sorted array of indices and an array of values.
+    Decaying the trace only changes a global scale factor (lazy decay); the
+    entries whose value drops below ``threshold`` are pruned. Hence all
+    operations cost time proportional to the support of the trace and not
+    to the length of the corresponding dense vector.
+
+    Example:
+
+    >>> e = SparseTrace(threshold=0.1)
+    >>> e.add(np.array([2, 5]), np.array([1., 1.]))
+    >>> e.decay(0.5)
+    >>> e.add(np.array([5]), np.array([1.]))
+    >>> e.indices, e.values()
+    (array([2, 5]), array([0.5, 1. ]))
+    >>> e.decay(0.1)
+    >>> e.indices, e.values()
+    (array([5]), array([0.1]))
+
+    """
+    #: entries whose absolute value falls below this threshold are removed
+    threshold = 1e-5
+    #: upper bound on the value of an entry (None for no bound)
+    max_value = 1.
+    #: if True, adding to an existing entry replaces its value (replacing
+    #: traces), otherwise the values are summed (accumulating traces)
+    replacing = False
+    #: the global scale is folded into the values when it drops below this
+    #: value to avoid underflows
+    MIN_SCALE = 1e-100
+
+    def __init__(self, threshold=1e-5, max_value=1., replacing=False):
+        """
+        :param threshold: entries with an absolute value smaller than
+            threshold are pruned when the trace is decayed.
+        :param max_value: the entries are clipped to this value after each
+            addition. ``None`` disables the clipping.
+        :param replacing: use replacing instead of accumulating traces.
+        """
+        self.threshold = threshold
+        self.max_value = max_value
+        self.replacing = replacing
+        self.clear()
+
+    def __len__(self):
+        return len(self.indices)
+
+    def clear(self):
+        """Sets all entries of the trace to zero."""
+        #: sorted indices of the nonzero entries
+        self.indices = np.zeros(0, dtype=int)
+        # the values of the entries are self._values * self._scale
+        self._values = np.zeros(0)
+        self._scale = 1.
+
+    def values(self):
+        """
+        :return: the values of the entries at ``self.indices``.
+        """
+        return self._values * self._scale
+
+    def decay(self, factor):
+        """
+        Multiplies all entries by *factor* and prunes the ones that become
+        smaller than ``self.threshold``.
+        """
+        self._scale *= factor
+        if self._scale == 0.:
+            self.clear()
+            return
+        keep = np.abs(self._values) * abs(self._scale) >= self.threshold
+        if not np.all(keep):
+            self.indices = self.indices[keep]
+            self._values = self._values[keep]
+        if abs(self._scale) < self.MIN_SCALE:
+            self._values *= self._scale
+            self._scale = 1.
+
+    def _positions(self, indices):
+        """
+        :return: the positions of *indices* in ``self.indices`` and a boolean
+            mask of the *indices* that are present.
+        """
+        pos = np.searchsorted(self.indices, indices)
+        found = np.zeros(len(indices), dtype=bool)
+        inside = pos < len(self.indices)
+        found[inside] = self.indices[pos[inside]] == indices[inside]
+        return pos, found
+
+    def add(self, indices, values):
+        """
+        Adds *values* to the entries *indices* (or replaces them for
+        replacing traces) and clips the result to ``self.max_value``.
+
+        :param indices: integer array of the entries, without duplicates
+        :param values: the values to add
+        """
+        if len(indices) == 0:
+            return
+        indices = np.asarray(indices, dtype=int)
+        scaled = np.asarray(values, dtype=float) / self._scale
+        pos, found = self._positions(indices)
+        if self.replacing:
+            self._values[pos[found]] = scaled[found]
+        else:
+            self._values[pos[found]] += scaled[found]
+        new = ~found
+        if np.any(new):
+            order = np.argsort(indices[new])
+            self.indices = np.insert(self.indices, pos[new][order],
+                                     indices[new][order])
+            self._values = np.insert(self._values, pos[new][order],
+                                     scaled[new][order])
+        if self.max_value is not None:
+            # all other entries only decayed since they were last clipped
+            np.minimum(self._values, self.max_value / self._scale,
+                       out=self._values)
+
+    def assign(self, indices, values):
+        """
+        Sets the trace to the vector with entries *values* at *indices*
+        (zero elsewhere). No clipping is applied.
+        """
+        order = np.argsort(indices)
+        self.indices = np.asarray(indices, dtype=int)[order]
+        self._values = np.asarray(values, dtype=float)[order]
+        self._scale = 1.
+
+    def get(self, indices):
+        """
+        :return: the values of the trace at *indices* (0 for the entries
+            that are not stored).
+        """
+        indices = np.asarray(indices, dtype=int)
+        pos, found = self._positions(indices)
+        result = np.zeros(len(indices))
+        result[found] = self._values[pos[found]] * self._scale
+        return result
+
+    def align(self, indices, values):
+        """
+        Restricts the sparse vector (*indices*, *values*) to the support of
+        the trace.
+
+        :return: an array of the same length as ``self.indices`` with the
+            entries of the sparse vector at these indices.
+        """
+        indices = np.asarray(indices, dtype=int)
+        pos, found = self._positions(indices)
+        result = np.zeros(len(self.indices))
+        result[pos[found]] = np.asarray(values)[found]
+        return result
+
+    def dot(self, vector):
+        """
+        :return: the inner product of the trace with the dense *vector*.
+        """
+        return np.dot(vector[self.indices], self._values) * self._scale
+
+    def dense(self, size):
+        """
+        :return: the trace as a dense vector of length *size*.
+        """
+        result = np.zeros(size)
+        result[self.indices] = self.values()
+        return result
+
+    def expandFeatures(self, features_num, new_features_num):
+        """
+        Remaps the indices of a trace over state-action features stored
+        action after action (see
+        :py:meth:`~rlpy.Representations.Representation.Representation.phi_sa`)
+        when the number of features per action grows from *features_num*
+        to *new_features_num*. This is the sparse counterpart of
+        :py:func:`~rlpy.Tools.GeneralTools.addNewElementForAllActions`.
+        """
+        if features_num == new_features_num or features_num == 0:
+            return
+        actions, features = np.divmod(self.indices, features_num)
+        self.indices = actions * new_features_num + features
@@ -0,0 +1,108 @@
+"""Growable storage for action-major weight vectors"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import absolute_import
+
+from future import standard_library
+standard_library.install_aliases()
+from builtins import range
+from builtins import object
+import numpy as np
+
+__copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
+__credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
+               "William Dabney", "Jonathan P. How"]
+__license__ = "BSD 3-Clause"
+
+
+class WeightBuffer(object):
+
+    """
+    Storage for a weight vector laid out action after action
+    (``weight_vec[a * features_num + f]``) to which features are added
+    over time.
+
+    The vector handed out is a view on the first
+    ``actions_num * features_num`` elements of a larger buffer whose capacity
+    doubles when it is exhausted. Adding features therefore does not
+    allocate a new array (amortized O(1) allocations); the blocks of the
+    actions are only shifted within the buffer, which is a single move for
+    one action. The result is the same as with
+    :py:func:`~rlpy.Tools.GeneralTools.addNewElementForAllActions`.
+
+    Example:
+
+    >>> buf = WeightBuffer(2)
+    >>> weight_vec = buf.addFeatures(np.array([1., 2., 3., 4.]))
+    >>> weight_vec
+    array([1., 2., 0., 3., 4., 0.])
+    >>> buf.addFeatures(weight_vec, np.array([[5.], [6.]]))
+    array([1., 2., 0., 5., 3., 4., 0., 6.])
+
+    .. warning::
+        Earlier views (and the arrays derived from them with ``reshape``)
+        share memory with the buffer and are invalid after features have
+        been added. Always use the vector returned by the last call.
+
+    """
+    #: smallest number of features per action the buffer has room for
+    MIN_CAPACITY = 16
+
+    def __init__(self, actions_num):
+        """
+        :param actions_num: number of action blocks in the weight vector
+        """
+        self.actions_num = actions_num
+        self._data = np.zeros(0)
+        self._view = None
+
+    def addFeatures(self, weight_vec, newElem=None):
+        """
+        Adds new features to all actions of *weight_vec*.
+
+        :param weight_vec: the current weight vector. If it is not the
+            vector last returned by this buffer (e.g. because it was
+            replaced by a solver), it is copied into the buffer first.
+        :param newElem: (optional) array of shape (actions_num, k) with the
+            weights of the k new features for every action. Defaults to a
+            single feature with zero weights.
+
+        :return: the new weight vector, a view on the buffer.
+        """
+        actions_num = self.actions_num
+        if newElem is None:
+            newElem = np.zeros((actions_num, 1))
+        newElem = np.asarray(newElem).reshape(actions_num, -1)
+        k = newElem.shape[1]
+        features_num = len(weight_vec) // actions_num
+        new_features_num = features_num + k
+        if weight_vec is not self._view or \
+                actions_num * new_features_num > len(self._data):
+            capacity = max(self.MIN_CAPACITY, 2 * new_features_num)
+            data = np.zeros(actions_num * capacity)
+            # copy the blocks directly to their new positions
+            data[:actions_num * new_features_num].reshape(
+                actions_num, new_features_num)[:, :features_num] = \
+                np.asarray(weight_vec).reshape(actions_num, features_num)
+            self._data = data
+        else:
+            data = self._data
+            # shift the blocks to their new positions, last block first so
+            # that no block is overwritten before it has been moved
+            for a in range(actions_num - 1, 0, -1):
+                data[a * new_features_num:a * new_features_num + features_num] = \
+                    data[a * features_num:(a + 1) * features_num]
+        blocks = data[:actions_num * new_features_num].reshape(
+            actions_num, new_features_num)
+        blocks[:, features_num:] = newElem
+        self._view = data[:actions_num * new_features_num]
+        return self._view
+
+    def __getstate__(self):
+        # the weight vector is stored by its owner; a restored buffer adopts
+        # it at the next call of addFeatures
+        state = self.__dict__.copy()
+        state["_data"] = np.zeros(0)
+        state["_view"] = None
+        return state
@@ -6,4 +6,10 @@ from future import standard_library
 standard_library.install_aliases()
 from .GeneralTools import *
 from .PriorityQueueWithNovelty import PriorityQueueWithNovelty
+from .LRUSetCache import LRUSetCache
+from .SparseTrace import SparseTrace
+from .WeightBuffer import WeightBuffer
+from .SampleStore import SampleStore
+from .LinearSolvers import (LinearSolver, DirectSolver, SparseLUSolver,
+                            IterativeSolver, CholeskySolver, linearSolver)
 from .GeneralTools import __rlpy_location__
@@ -12,8 +12,7 @@ from builtins import zip
 from builtins import range
 from builtins import object
 from past.utils import old_div
-import matplotlib.pyplot as plt
-from matplotlib.ticker import FuncFormatter
+from .GeneralTools import plt, ticker
 import json
 import os
 import numpy as np
@@ -29,7 +28,6 @@ def _thousands(x, pos):
     'The two args are the value and tick position'
     return '%1.0fk' % (x * 1e-3)
 
-thousands_formatter = FuncFormatter(_thousands)
 
 #: default labels for result quantities
 default_labels = {"learning_steps": "Learning Steps",
@@ -57,7 +55,7 @@ default_markers = [
 
 def thousand_format_xaxis():
     """set the xaxis labels to have a ...k format"""
-    plt.gca().xaxis.set_major_formatter(thousands_formatter)
+    plt.gca().xaxis.set_major_formatter(ticker.FuncFormatter(_thousands))
 
 
 def load_single(filename):
@@ -18,6 +18,8 @@ import pstats
 import platform
 import sys
 import subprocess
+import multiprocessing
+from functools import partial
 
 __copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
 __credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
@@ -26,6 +28,7 @@ __license__ = "BSD 3-Clause"
 
 # template for executable file used to execute experiments
 template = """#!/usr/bin/env python
+{future_imports}
 import sys
 sys.path = ["{rlpy_location}"] + sys.path
 {setting_content}
@@ -149,10 +152,16 @@ def prepare_directory(setting, path, **hyperparam):
         os.makedirs(final_path)
     fn = os.path.join(final_path, "main.py")
     setting_content = read_setting_content(setting)
+    # __future__ imports have to be at the beginning of the file
+    future_imports = "".join(l for l in setting_content.splitlines(True)
+                             if l.startswith("from __future__"))
+    setting_content = "".join(l for l in setting_content.splitlines(True)
+                              if not l.startswith("from __future__"))
     with open(fn, "w") as f:
         f.write(template.format(setting=setting,
                                 rlpy_location=__rlpy_location__,
                                 variables=variables,
+                                future_imports=future_imports,
                                 setting_content=setting_content))
     return fn
 
@@ -169,12 +178,14 @@ def run(filename, location, ids, parallelization="sequential",
     :param ids: list of ids / seeds which should be executed
     :param parallelization: either **sequential** (running the experiment on one core
                         for each seed in sequence), **joblib** (run using multiple
-                        cores in parallel, no console ouput of the individual runs)
+                        cores in parallel, no console ouput of the individual runs),
+                        **pool** (run in a pool of worker processes that load
+                        the file only once, see :py:func:`run_pool`)
                         or **condor** (submit jobs to a HTCondor job scheduling
                         system
     :param force_rerun: if False, seeds for which the results exists are not executed
     :param block: if True, the function returns when all jobs are done
-    :param n_jobs: if parallelized with joblib, this specifies the number of cores to use
+    :param n_jobs: if parallelized with joblib or pool, this specifies the number of cores to use
         specifying -1 means all cores, -2 means all but one cores
     :param verbose: controls the amount of outputs
     :param \**hyperaram: hyperparameter values which are passed to make_experiment
@@ -194,6 +205,9 @@ def run(filename, location, ids, parallelization="sequential",
             run_joblib(fn, ids, n_jobs=n_jobs, verbose=verbose)
         elif parallelization == "condor":
             run_condor(fn, ids, force_rerun=force_rerun, block=block)
+        elif parallelization == "pool":
+            run_pool(setting, location, ids, n_jobs=n_jobs, verbose=verbose,
+                     **hyperparam)
         elif parallelization == "sequential":
             run_joblib(fn, ids, n_jobs=1, verbose=verbose)
 
@@ -221,6 +235,109 @@ def run_joblib(fn, ids, n_jobs=-2, verbose=10):
     return exit_codes
 
 
+# make_experiment function of the setting and the progress queue of a
+# worker process of run_pool
+_worker_make_experiment = None
+_worker_queue = None
+
+
+def _init_pool_worker(setting_content, queue):
+    """loads the setting once in each worker process of :py:func:`run_pool`"""
+    global _worker_make_experiment, _worker_queue
+    local = {}
+    exec(setting_content, local)
+    _worker_make_experiment = local["make_experiment"]
+    _worker_queue = queue
+
+
+def _report_progress(exp):
+    """sends the latest evaluation of an experiment to the parent process"""
+    _worker_queue.put((exp.exp_id, exp.result["learning_steps"][-1],
+                       exp.max_steps, exp.result["return"][-1]))
+
+
+def _run_pool_job(job_id, location, hyperparam):
+    exp = _worker_make_experiment(job_id + 1, location, **hyperparam)
+    exp.log_interval = 60
+    exp.evaluation_callback = _report_progress
+    exp.run()
+    exp.save()
+    return exp.exp_id, dict(exp.result)
+
+
+def run_pool(setting, location, ids, n_jobs=-2, verbose=10, callback=None,
+             poll_interval=1., **hyperparam):
+    """
+    runs the experiments of a setting file for several seeds in a pool of
+    worker processes. Every worker loads the setting (and thereby rlpy)
+    only once and is reused for all its seeds. The result of each seed is
+    sent back to the calling process as soon as it is finished and the
+    progress of all running seeds is reported while waiting.
+    The results are also saved in location as with :py:func:`run`.
+
+    :param setting: file containing the make_experiment function
+    :param location: directory where the results are stored
+    :param ids: list of ids / seeds which should be executed
+    :param n_jobs: number of worker processes; -1 means all cores, -2 means
+        all but one cores
+    :param verbose: if > 0, the aggregated progress is printed
+    :param callback: (optional) function called with the id and the result
+        (``Experiment.result``) of every seed when it is finished
+    :param poll_interval: number of seconds between progress reports
+    :param \**hyperparam: hyperparameter values which are passed to
+        make_experiment as keyword arguments.
+    :return: dictionary of the results of all seeds indexed by their
+        experiment id
+    """
+    if n_jobs < 0:
+        n_jobs = max(1, multiprocessing.cpu_count() + 1 + n_jobs)
+    n_jobs = min(n_jobs, len(ids))
+    results = {}
+    if n_jobs == 0:
+        return results
+    queue = multiprocessing.Queue()
+    progress = {}
+    report = None
+    pool = multiprocessing.Pool(n_jobs, initializer=_init_pool_worker,
+                                initargs=(read_setting_content(setting), queue))
+    try:
+        jobs = pool.imap_unordered(
+            partial(_run_pool_job, location=location, hyperparam=hyperparam),
+            ids)
+        while len(results) < len(ids):
+            try:
+                exp_id, result = jobs.next(timeout=poll_interval)
+            except multiprocessing.TimeoutError:
+                pass
+            else:
+                results[exp_id] = result
+                progress[exp_id] = (result["learning_steps"][-1],
+                                    result["learning_steps"][-1],
+                                    result["return"][-1])
+                if callback is not None:
+                    callback(exp_id, result)
+            while not queue.empty():
+                exp_id, steps, max_steps, ret = queue.get()
+                if exp_id not in results:
+                    progress[exp_id] = (steps, max_steps, ret)
+            if verbose and len(progress):
+                steps = sum(p[0] for p in list(progress.values()))
+                max_steps = sum(p[1] for p in list(progress.values()))
+                mean_return = sum(p[2] for p in list(progress.values())) / len(progress)
+                new_report = ("{} of {} seeds finished, {} running: {}/{} "
+                              "steps, mean return = {:.4g}".format(
+                                  len(results), len(ids),
+                                  len(progress) - len(results),
+                                  steps, max_steps, mean_return))
+                if new_report != report:
+                    report = new_report
+                    print(report)
+    finally:
+        pool.terminate()
+        pool.join()
+    return results
+
+
 def run_condor(fn, ids,
                force_rerun=False, block=False, verbose=10, poll_duration=30):
     # create condor subdirectory
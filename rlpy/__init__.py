@@ -4,10 +4,14 @@ from __future__ import division
 from __future__ import absolute_import
 from future import standard_library
 standard_library.install_aliases()
-import rlpy.Agents
-import rlpy.Tools
-import rlpy.Domains
-import rlpy.MDPSolvers
-import rlpy.Experiments
-import rlpy.Policies
-import rlpy.Representations
+from rlpy.Tools.GeneralTools import lazyPackage
+
+# the subpackages are imported when they are first used
+lazyPackage(__name__, {
+    "Agents": ".Agents",
+    "Tools": ".Tools",
+    "Domains": ".Domains",
+    "MDPSolvers": ".MDPSolvers",
+    "Experiments": ".Experiments",
+    "Policies": ".Policies",
+    "Representations": ".Representations"})
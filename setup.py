@@ -96,6 +96,7 @@ class CheckSDist(sdist):
 
     _pyxfiles = ["rlpy/Representations/hashing.pyx",
                  "rlpy/Domains/HIVTreatment_dynamics.pyx",
+                 "rlpy/Domains/Pinball_dynamics.pyx",
                  "rlpy/Representations/kernels.pyx"]
 
     def initialize_options(self):
@@ -175,6 +176,7 @@ else:
 USE_CYTHON =  os.getenv('USE_CYTHON', False)
 # always cythonize if C-files are not present
 USE_CYTHON = not os.path.exists("rlpy/Representations/hashing.c") or USE_CYTHON
+fp_args = [] if sys.platform == "win32" else ["-ffp-contract=off"]
 extensions = [
           Extension("rlpy.Representations.hashing",
                     ["rlpy/Representations/hashing.pyx"],
@@ -182,6 +184,12 @@ extensions = [
           Extension("rlpy.Domains.HIVTreatment_dynamics",
                     ["rlpy/Domains/HIVTreatment_dynamics.pyx"],
                     include_dirs=["rlpy/Representations"]),
+          # no contraction to fused multiply-adds, which would change
+          # the trajectories compared to the Python implementation
+          Extension("rlpy.Domains.Pinball_dynamics",
+                    ["rlpy/Domains/Pinball_dynamics.pyx"],
+                    extra_compile_args=fp_args,
+                    include_dirs=["rlpy/Representations"]),
           Extension("rlpy.Representations.kernels",
                     ["rlpy/Representations/kernels.pyx",
                      "rlpy/Representations/c_kernels.cc",
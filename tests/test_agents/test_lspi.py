@@ -0,0 +1,185 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+from future import standard_library
+standard_library.install_aliases()
+from builtins import range
+import os
+import tempfile
+import numpy as np
+import scipy.sparse as sp
+from rlpy.Tools import linearSolver, SparseLUSolver
+from rlpy.Domains import GridWorld
+from rlpy.Representations import Tabular, iFDD, IndependentDiscretization
+from rlpy.Policies import eGreedy
+from rlpy.Agents import LSPI
+
+
+def _transitions(domain, steps):
+    # transitions of a random policy
+    random_state = np.random.RandomState(2)
+    transitions = []
+    s, terminal, p_actions = domain.s0()
+    a = random_state.choice(p_actions)
+    for i in range(steps):
+        r, ns, terminal, np_actions = domain.step(a)
+        na = random_state.choice(np_actions)
+        transitions.append((s, p_actions, a, r, ns, np_actions, na, terminal))
+        if terminal:
+            s, terminal, p_actions = domain.s0()
+            a = random_state.choice(p_actions)
+        else:
+            s, a, p_actions = ns, na, np_actions
+    return transitions
+
+
+def _domain():
+    maze = os.path.join(GridWorld.default_map_dir, '4x5.txt')
+    domain = GridWorld(maze, noise=0.3)
+    domain.random_state = np.random.RandomState(1)
+    return domain
+
+
+def _run_lspi(steps=300, max_window=None, **kwargs):
+    domain = _domain()
+    representation = Tabular(domain)
+    policy = eGreedy(representation, epsilon=0.1)
+    agent = LSPI(policy, representation, domain.discount_factor,
+                 steps if max_window is None else max_window, 100, **kwargs)
+    for transition in _transitions(domain, steps):
+        agent.learn(*transition)
+    return agent
+
+
+def test_incremental_lstd():
+    """ Ensure incremental LSTD (with and without RLS) matches the batch one """
+    agent = _run_lspi()
+    for kwargs in [dict(incremental=True), dict(incremental=True, rls=True)]:
+        other = _run_lspi(**kwargs)
+        assert other.use_sparse
+        assert other.lstd_samples == agent.samples_count
+        assert np.allclose(other.A.toarray(), agent.A, atol=1e-5)
+        assert np.allclose(other.b, agent.b)
+        assert np.allclose(other.representation.weight_vec,
+                           agent.representation.weight_vec, atol=1e-6)
+    # the RLS inverse matches the regularized A
+    A = other.A.toarray() + np.eye(other.A.shape[0]) * 1e-6
+    assert np.allclose(np.dot(other.A_inv, A), np.eye(A.shape[0]), atol=1e-5)
+
+
+def test_linear_solvers():
+    """ Ensure all solver backends solve sequences of similar systems """
+    random_state = np.random.RandomState(0)
+    n = 50
+    A = sp.random(n, n, 0.1, random_state=random_state) + 5 * sp.eye(n)
+    A = (A.T * A).tocsc()  # symmetric positive definite
+    for name in ["direct", "splu", "cholesky", "cg", "lgmres", "lsqr"]:
+        solver = linearSolver(name)
+        for k in range(3):
+            B = A.copy()
+            B.data *= 1. + 0.01 * k
+            b = random_state.randn(n)
+            for M in [B, B.toarray()]:
+                x, solve_time = solver.solve(M, b)
+                assert np.allclose(M.dot(x), b, atol=1e-6)
+                assert solver.last_residual < 1e-6
+        assert solver.calls == 6
+        assert solver.fallbacks == 0
+    # Cholesky only reads one triangle of A, non-symmetric A are solved directly
+    solver = linearSolver("cholesky")
+    C = np.array([[4., 1.], [-1., 3.]])
+    b = np.array([1., 2.])
+    for M in [C, sp.csr_matrix(C)]:
+        x, solve_time = solver.solve(M, b)
+        assert np.allclose(x, np.linalg.solve(C, b))
+    assert solver.fallbacks == 2
+    # the column ordering is computed once for the sparsity pattern
+    solver = SparseLUSolver()
+    for k in range(3):
+        solver.solve(A * (1. + k), np.ones(n))
+    assert solver.symbolic_factorizations == 1
+    assert solver.numeric_factorizations == 2
+
+
+def test_lspi_solvers():
+    """ Ensure LSPI finds the same weights with every solver """
+    agent = _run_lspi()
+    for solver in ["splu", "lgmres", "lsqr"]:
+        other = _run_lspi(solver=solver)
+        assert other.solver.calls > 0
+        assert np.allclose(other.representation.weight_vec,
+                           agent.representation.weight_vec, atol=1e-5)
+
+
+def test_ring_buffer():
+    """ Ensure A and b of a sliding window only contain the stored samples """
+    agent = _run_lspi(steps=450, max_window=200, ring_buffer=True)
+    assert agent.samples_count == 200
+    assert agent.store.count == 450
+    F1 = agent.all_phi_s_a
+    F2 = agent.all_phi_ns_na
+    assert np.allclose(agent.A, np.dot(F1.T, F1 - agent.discount_factor * F2))
+    assert np.allclose(agent.b, np.dot(F1.T, agent.data_r))
+    # the stored transitions are the latest ones
+    order = agent.store.order()
+    latest = _transitions(_domain(), 450)[-200:]
+    assert np.all(agent.data_ns[order] == [t[4] for t in latest])
+    assert np.all(agent.data_a[order, 0] == [t[2] for t in latest])
+
+
+def test_save_load_samples():
+    """ Ensure loaded samples give the same LSTD statistics """
+    agent = _run_lspi()
+    path = os.path.join(tempfile.mkdtemp(), "samples.npz")
+    agent.saveSamples(path)
+    other = _run_lspi(steps=0, max_window=300)
+    assert other.loadSamples(path) == agent.samples_count
+    assert other.samples_count == agent.samples_count
+    assert np.all(other.data_s == agent.data_s)
+    assert np.allclose(other.A, agent.A)
+    assert np.allclose(other.b, agent.b)
+
+
+def test_block_lstd_statistics():
+    """ Ensure the block-wise A and b match the action-expanded products """
+    agent = _run_lspi(steps=0, max_window=10)
+    representation = agent.representation
+    random_state = np.random.RandomState(3)
+    p, n = 50, representation.features_num
+    phi_s = (random_state.rand(p, n) < 0.2).astype(float)
+    phi_ns = (random_state.rand(p, n) < 0.2).astype(float)
+    a = random_state.randint(representation.actions_num, size=(p, 1))
+    na = random_state.randint(representation.actions_num, size=(p, 1))
+    r = random_state.randn(p, 1)
+    F1 = representation.batchPhi_s_a(phi_s, a)
+    F2 = representation.batchPhi_s_a(phi_ns, na)
+    A_expected = np.dot(F1.T, F1 - agent.discount_factor * F2)
+    agent.lstd_chunk_size = 7
+    for use_sparse in [False, True]:
+        agent.use_sparse = use_sparse
+        A, b = agent.blockLSTDStatistics(
+            sp.csr_matrix(phi_s) if use_sparse else phi_s, a,
+            sp.csr_matrix(phi_ns) if use_sparse else phi_ns, na, r)
+        assert sp.issparse(A) == use_sparse
+        assert np.allclose(A.toarray() if use_sparse else A, A_expected)
+        assert np.allclose(b, np.dot(F1.T, r))
+
+
+def test_dynamic_representation_greedy_actions():
+    """ Ensure policy iteration with a dynamic representation never builds
+    the action-expanded feature matrix """
+    domain = _domain()
+    representation = iFDD(domain, discovery_threshold=0.05,
+                          initial_representation=IndependentDiscretization(domain))
+
+    def batchPhi_s_a(*args, **kwargs):
+        raise AssertionError("batchPhi_s_a called")
+    representation.batchPhi_s_a = batchPhi_s_a
+    policy = eGreedy(representation, epsilon=0.1)
+    agent = LSPI(policy, representation, domain.discount_factor, 200, 100)
+    assert not agent.fixedRep and not agent.use_sparse
+    for transition in _transitions(domain, 200):
+        agent.learn(*transition)
+    assert not hasattr(agent, "all_phi_ns_new_na")
+    assert np.any(representation.weight_vec != 0)
@@ -0,0 +1,76 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+from future import standard_library
+standard_library.install_aliases()
+from builtins import range
+import os
+import tempfile
+import numpy as np
+from rlpy.Tools import SampleStore
+
+
+def _fill(store, n, start=0):
+    for i in range(start, start + n):
+        store.add([i, -i], i % 4, float(i), [i + 1, -i - 1], (i + 1) % 4,
+                  i % 10 == 9)
+
+
+def test_ring():
+    """ Ensure a ring buffer keeps the latest transitions """
+    store = SampleStore(10, 2, actions_num=4, ring=True)
+    assert store.a.dtype == np.uint8
+    _fill(store, 25)
+    assert store.size == len(store) == 10
+    assert store.count == 25
+    assert np.all(store.r[store.order(), 0] == np.arange(15, 25))
+    # adding many transitions at once is the same as adding them one by one
+    other = SampleStore(10, 2, actions_num=4, ring=True)
+    _fill(other, 7)
+    other.extend(**dict((name, getattr(store, name)[store.order()][-8:])
+                        for name in SampleStore.FIELDS))
+    for name in SampleStore.FIELDS:
+        assert np.all(getattr(other, name)[other.order()][-8:] ==
+                      getattr(store, name)[store.order()][-8:])
+
+
+def test_full():
+    """ Ensure a store without ring buffer does not overwrite samples """
+    store = SampleStore(5, 2)
+    _fill(store, 5)
+    try:
+        _fill(store, 1)
+    except IndexError:
+        pass
+    else:
+        assert False, "no IndexError raised"
+
+
+def test_save_load():
+    """ Ensure saved transitions are loaded in chronological order """
+    directory = tempfile.mkdtemp()
+    store = SampleStore(10, 2, actions_num=4, ring=True)
+    _fill(store, 13)
+    path = os.path.join(directory, "samples.npz")
+    store.save(path)
+    loaded = SampleStore.load(path)
+    assert loaded.size == 10
+    assert np.all(loaded.r[:, 0] == np.arange(3, 13))
+    for t1, t2 in zip(store.transitions(), loaded.transitions()):
+        for x, y in zip(t1, t2):
+            assert np.all(x == y)
+
+
+def test_memmap():
+    """ Ensure a memory-mapped store can be reopened """
+    directory = os.path.join(tempfile.mkdtemp(), "store")
+    store = SampleStore(20, 2, state_dtype=np.float32, directory=directory)
+    _fill(store, 12)
+    store.flush()
+    assert isinstance(store.s, np.memmap)
+    reopened = SampleStore.open(directory, mode="r")
+    assert reopened.size == 12
+    assert reopened.s.dtype == np.float32
+    assert np.all(reopened.s[:12] == store.s[:12])
+    assert np.all(reopened.terminal == store.terminal)
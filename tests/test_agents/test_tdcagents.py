@@ -129,3 +129,20 @@ def test_ggq_valfun_chain():
         agent.learn(np.array([i % 4]), [0], 0, 1., np.array([(i + 1) % 4]), [0], 0, (i + 2) % 4 == 0)
     V_true = np.array([2.71, 1.9, 1, 0])
     np.testing.assert_allclose(rep.weight_vec, V_true)
+
+
+def test_ggqlambda_valfun_chain():
+    """
+        Check if Greedy-GQ(lambda) computes the value function of a simple Markov chain correctly.
+        This only tests value function estimation, only one action possible
+    """
+    rep = MockRepresentation()
+    pol = eGreedy(rep)
+    agent = Greedy_GQ(pol, rep, lambda_=0.5, discount_factor=0.9)
+    for i in range(1000):
+        if i % 4 == 3:
+            agent.episodeTerminated()
+            continue
+        agent.learn(np.array([i % 4]), [0], 0, 1., np.array([(i + 1) % 4]), [0], 0, (i + 2) % 4 == 0)
+    V_true = np.array([2.71, 1.9, 1, 0])
+    np.testing.assert_allclose(rep.weight_vec, V_true, rtol=1e-5)
@@ -18,8 +18,12 @@ __credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
 __license__ = "BSD 3-Clause"
 
 
+def _domains():
+    return [getattr(rlpy.Domains, name) for name in rlpy.Domains.__all__]
+
+
 def test_random_trajectory():
-    for d in list(rlpy.Domains.__dict__.values()):
+    for d in _domains():
         if d == Domain:
             continue
         if inspect.isclass(d) and issubclass(d, Domain):
@@ -27,7 +31,7 @@ def test_random_trajectory():
 
 
 def test_specification():
-    for d in list(rlpy.Domains.__dict__.values()):
+    for d in _domains():
         if d == Domain:
             continue
         if inspect.isclass(d) and issubclass(d, Domain):
@@ -0,0 +1,34 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from future import standard_library
+standard_library.install_aliases()
+from builtins import range
+import numpy as np
+from rlpy.Domains import BlocksWorld
+from rlpy.Tools import vec2id
+
+
+def _possibleActions(domain, s):
+    """ possibleActions without the lookup table """
+    empty_blocks = [b for b in range(domain.blocks) if domain.clear(b, s)]
+    return np.array([vec2id([a, b], [domain.blocks, domain.blocks])
+                     for a in empty_blocks for b in empty_blocks
+                     if a != b or s[a] != a])
+
+
+def test_possible_actions():
+    """ Ensure the memoized possible actions match along random walks """
+    domain = BlocksWorld(blocks=4, towerSize=4)
+    domain.random_state = np.random.RandomState(0)
+    random_state = np.random.RandomState(1)
+    s, terminal, pa = domain.s0()
+    for i in range(300):
+        if terminal:
+            s, terminal, pa = domain.s0()
+        assert np.array_equal(pa, _possibleActions(domain, s))
+        for a in range(domain.actions_num):
+            A, B = a % domain.blocks, a // domain.blocks
+            assert domain._validActions(s)[a] == domain.validAction(s, A, B)
+        r, s, terminal, pa = domain.step(random_state.choice(pa))
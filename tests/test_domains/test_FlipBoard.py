@@ -0,0 +1,27 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from future import standard_library
+standard_library.install_aliases()
+from builtins import range
+import numpy as np
+from rlpy.Domains import FlipBoard
+from rlpy.Tools import id2vec
+
+
+def test_step():
+    """ Ensure each action flips the row and the column of its cell """
+    domain = FlipBoard()
+    random_state = np.random.RandomState(0)
+    s = domain.s0()[0]
+    for i in range(100):
+        a = random_state.randint(domain.actions_num)
+        expected = s.reshape((domain.BOARD_SIZE, -1)).copy()
+        a_row, a_col = id2vec(a, [domain.BOARD_SIZE, domain.BOARD_SIZE])
+        expected[a_row, :] = np.logical_not(expected[a_row, :])
+        expected[:, a_col] = np.logical_not(expected[:, a_col])
+        expected[a_row, a_col] = not expected[a_row, a_col]
+        r, s, terminal, pa = domain.step(a)
+        assert s.dtype == bool
+        assert np.array_equal(s, expected.flatten())
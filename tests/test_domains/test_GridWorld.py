@@ -0,0 +1,81 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from future import standard_library
+standard_library.install_aliases()
+from builtins import range
+import os
+from copy import deepcopy
+import numpy as np
+from rlpy.Domains import GridWorld
+
+
+def _possibleActions(domain, s):
+    """ possibleActions without the lookup table """
+    possibleA = np.array([], np.uint8)
+    for a in range(domain.actions_num):
+        ns = s + domain.ACTIONS[a]
+        if (ns[0] < 0 or ns[0] == domain.ROWS or
+                ns[1] < 0 or ns[1] == domain.COLS or
+                domain.map[int(ns[0]), int(ns[1])] == domain.BLOCKED):
+            continue
+        possibleA = np.append(possibleA, [a])
+    return possibleA
+
+
+def _free_states(domain):
+    return np.argwhere(domain.map != domain.BLOCKED)
+
+
+def test_possible_actions():
+    """ Ensure the memoized possible actions match the computed ones """
+    for name in ["4x5.txt", "6x9-Wall.txt", "11x11-Rooms.txt"]:
+        domain = GridWorld(os.path.join(GridWorld.default_map_dir, name))
+        for i in range(2):
+            for s in _free_states(domain):
+                pa = domain.possibleActions(s)
+                expected = _possibleActions(domain, s)
+                assert np.array_equal(pa, expected)
+                assert pa.dtype == expected.dtype
+                assert not pa.flags.writeable
+
+
+def test_step():
+    """ Ensure step moves to the free neighbouring cells only """
+    domain = GridWorld(os.path.join(GridWorld.default_map_dir,
+                                    "6x9-Wall.txt"), noise=0)
+    for s in _free_states(domain):
+        for a in range(domain.actions_num):
+            domain.state = s.copy()
+            r, ns, terminal, pa = domain.step(a)
+            if a in _possibleActions(domain, s):
+                assert np.array_equal(ns, s + domain.ACTIONS[a])
+            else:
+                assert np.array_equal(ns, s)
+            assert np.array_equal(domain.state, ns)
+            assert terminal == domain.isTerminal(ns)
+            assert np.array_equal(pa, _possibleActions(domain, ns))
+            # the returned state is not shared with the lookup tables
+            ns[0] = -1
+            assert np.array_equal(domain._successors(s)[a],
+                                  domain.state)
+
+
+def test_expected_step():
+    """ Ensure the expected steps of all actions sum up to the transition """
+    domain = GridWorld(os.path.join(GridWorld.default_map_dir, "4x5.txt"))
+    domain.s0()
+    copy = deepcopy(domain)
+    for s in _free_states(domain):
+        for a in domain.possibleActions(s):
+            p, r, ns, t, pa = domain.expectedStep(s, a)
+            assert np.isclose(p.sum(), 1)
+            assert np.array_equal(
+                ns, s + domain.ACTIONS[_possibleActions(domain, s)])
+            for j in range(len(p)):
+                assert t[j, 0] == domain.isTerminal(ns[j])
+                assert np.array_equal(pa[j], _possibleActions(domain, ns[j]))
+            # copies of the domain share the lookup tables
+            p2, r2, ns2, t2, pa2 = copy.expectedStep(s, a)
+            assert np.array_equal(p, p2) and ns is ns2
@@ -0,0 +1,42 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from future import standard_library
+standard_library.install_aliases()
+from builtins import range
+import numpy as np
+from scipy.integrate import odeint
+from rlpy.Domains import HIVTreatment
+from rlpy.Domains.HIVTreatment import dsdt, integrate, integrate_batch
+
+
+def _reference(s, eps1, eps2, dt):
+    return odeint(dsdt, s, [0, dt], args=(eps1, eps2), mxstep=100000,
+                  rtol=1e-12, atol=1e-12)[-1]
+
+
+def test_integrate():
+    """ Ensure the integrator agrees with a precise odeint solution """
+    domain = HIVTreatment()
+    domain.s0()
+    random_state = np.random.RandomState(0)
+    for i in range(50):
+        s = domain.state.copy()
+        eps1, eps2 = domain.actions[random_state.randint(4)]
+        ns = integrate(s, eps1, eps2, domain.dt)
+        assert np.allclose(ns, _reference(s, eps1, eps2, domain.dt),
+                           rtol=1e-6, atol=0)
+        domain.state = ns
+
+
+def test_integrate_batch():
+    """ Ensure the batched integrator integrates each patient separately """
+    random_state = np.random.RandomState(0)
+    s0 = HIVTreatment().s0()[0]
+    states = np.power(10., s0) * random_state.uniform(.5, 2., (20, 6))
+    eps = HIVTreatment.actions[random_state.randint(4, size=20)]
+    ns = integrate_batch(states, eps, 5.)
+    for i in range(20):
+        assert np.allclose(ns[i], integrate(states[i], eps[i, 0], eps[i, 1],
+                                            5.))
@@ -0,0 +1,49 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from future import standard_library
+standard_library.install_aliases()
+from builtins import range
+import os
+import importlib
+import numpy as np
+from rlpy.Domains import Pinball
+
+pinball_module = importlib.import_module("rlpy.Domains.Pinball")
+
+
+def _trajectory(configuration, compiled, steps=300, seed=0):
+    take_action = pinball_module._take_action
+    if not compiled:
+        pinball_module._take_action = None
+    try:
+        domain = Pinball(configuration=configuration)
+        domain.random_state = np.random.RandomState(seed)
+        random_state = np.random.RandomState(seed + 1)
+        s, terminal, p_actions = domain.s0()
+        trajectory = []
+        for i in range(steps):
+            if terminal:
+                s, terminal, p_actions = domain.s0()
+            if i % 50 == 0:
+                # restart from random states to hit many obstacles
+                domain.state = np.array([random_state.rand(),
+                                         random_state.rand(),
+                                         random_state.uniform(-2, 2),
+                                         random_state.uniform(-2, 2)])
+            r, s, terminal, p_actions = domain.step(random_state.randint(5))
+            trajectory.append(np.hstack((s, r, terminal)))
+        return np.array(trajectory)
+    finally:
+        pinball_module._take_action = take_action
+
+
+def test_compiled_physics():
+    """ Ensure the compiled physics gives exactly the same trajectories """
+    if pinball_module._take_action is None:
+        return
+    for name in ["pinball_medium.cfg", "pinball_box.cfg"]:
+        configuration = os.path.join(Pinball.default_config_dir, name)
+        assert np.array_equal(_trajectory(configuration, compiled=True),
+                              _trajectory(configuration, compiled=False))
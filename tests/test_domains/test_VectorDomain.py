@@ -0,0 +1,102 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from future import standard_library
+standard_library.install_aliases()
+from builtins import range
+from copy import deepcopy
+import numpy as np
+from rlpy.Domains import (MountainCar, PuddleWorld, GridWorld, ChainMDP,
+                          Acrobot, AcrobotLegacy, FiniteCartPoleBalanceOriginal,
+                          FiniteCartPoleSwingUpFriction, InfCartPoleSwingUp,
+                          RCCar, HIVTreatment, VectorDomain)
+from rlpy.Representations import Tabular
+from rlpy.Policies import eGreedy
+from rlpy.Agents import Q_Learning
+from rlpy.Experiments import Experiment
+
+
+def _deterministic_domains():
+    swingup = InfCartPoleSwingUp()
+    swingup.force_noise_max = 0
+    return [MountainCar(noise=0), PuddleWorld(noise_level=0), GridWorld(noise=0),
+            Acrobot(), AcrobotLegacy(), FiniteCartPoleBalanceOriginal(),
+            FiniteCartPoleSwingUpFriction(), swingup, RCCar(), HIVTreatment()]
+
+
+def test_step_batch():
+    """ Ensure step_batch gives the same transitions as step """
+    random_state = np.random.RandomState(0)
+    for domain in _deterministic_domains():
+        states, actions, rewards, next_states, terminals = [], [], [], [], []
+        s, terminal, p_actions = domain.s0()
+        for i in range(100):
+            if terminal:
+                s, terminal, p_actions = domain.s0()
+            a = random_state.choice(p_actions)
+            states.append(np.array(s, copy=True))
+            actions.append(a)
+            r, s, terminal, p_actions = domain.step(a)
+            rewards.append(r)
+            next_states.append(s)
+            terminals.append(terminal)
+        r, ns, t, p_actions = domain.step_batch(np.array(states),
+                                                np.array(actions))
+        assert np.allclose(r, rewards)
+        assert np.allclose(ns, next_states)
+        assert np.all(t == np.array(terminals))
+        assert p_actions.shape == (100, domain.actions_num)
+
+
+def test_sample_step():
+    """ Ensure sampleStep samples from the given state and keeps the state """
+    for domain in [MountainCar(noise=0), RCCar(), ChainMDP(10)]:
+        s, terminal, p_actions = domain.s0()
+        s = domain.step(p_actions[-1])[1]
+        s_sampled = s.copy()
+        a = p_actions[0]
+        domain.s0()
+        next_states, rewards = domain.sampleStep(s_sampled, a, 5)
+        assert np.allclose(domain.state, domain.s0()[0])
+        domain.state = s_sampled.copy()
+        r, ns = domain.step(a)[:2]
+        assert next_states.shape == (5, len(ns))
+        assert np.allclose(next_states, ns)
+        assert np.allclose(rewards, r)
+        # sampling from the current state
+        domain.state = s_sampled.copy()
+        next_states, rewards = domain.sampleStep(a, 3)
+        assert np.allclose(next_states, ns)
+        assert np.allclose(domain.state, s_sampled)
+
+
+def test_vector_domain():
+    """ Ensure VectorDomain steps only the selected episodes """
+    for domain in [GridWorld(noise=0.3), ChainMDP(5)]:
+        vector_domain = VectorDomain(domain, 4)
+        assert vector_domain.vectorized == isinstance(domain, GridWorld)
+        s, t, p_actions = vector_domain.s0()
+        assert s.shape == (4, domain.state_space_dims)
+        r, ns, t, p_actions = vector_domain.step([1, 1], [0, 2])
+        assert len(r) == len(ns) == len(t) == len(p_actions) == 2
+        assert np.all(vector_domain.states[[0, 2]] == ns)
+        assert np.all(vector_domain.states[[1, 3]] == s[[1, 3]])
+
+
+def test_vectorized_evaluation():
+    """ Ensure the batched performance runs agree with the sequential ones """
+    domain = GridWorld(noise=0)
+    representation = Tabular(domain)
+    representation.weight_vec[:] = np.random.RandomState(0).randn(
+        len(representation.weight_vec))
+    policy = eGreedy(representation, epsilon=0.1,
+                     forcedDeterministicAmongBestActions=True)
+    agent = Q_Learning(policy, representation, domain.discount_factor)
+    experiment = Experiment(agent, domain, path="./Results/Temp/test_VectorDomain")
+    experiment.performance_domain = deepcopy(domain)
+    sequential = experiment.performanceRun(0)
+    batch = experiment.performanceRunBatch(3)
+    for value, values in zip(sequential, batch):
+        assert np.allclose(values, value)
+    assert policy.epsilon == 0.1
@@ -0,0 +1,86 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+from future import standard_library
+standard_library.install_aliases()
+import os
+import tempfile
+import numpy as np
+from rlpy.Domains import GridWorld
+from rlpy.Representations import Tabular
+from rlpy.Policies import eGreedy
+from rlpy.Agents import Q_Learning, LSPI
+from rlpy.Experiments import Experiment, OfflineExperiment
+from rlpy.Tools import SampleStore
+
+
+def _domain():
+    maze = os.path.join(GridWorld.default_map_dir, '4x5.txt')
+    return GridWorld(maze, noise=0.3)
+
+
+def _q_learning(domain):
+    representation = Tabular(domain)
+    policy = eGreedy(representation, epsilon=0.2)
+    return Q_Learning(policy, representation, domain.discount_factor)
+
+
+def _record(path, **kwargs):
+    domain = _domain()
+    experiment = Experiment(_q_learning(domain), domain, max_steps=500,
+                            num_policy_checks=2, path=path,
+                            record_samples=True, **kwargs)
+    experiment.run()
+    return experiment
+
+
+def test_record_samples():
+    """ Ensure the recorded transitions are consistent """
+    path = tempfile.mkdtemp()
+    experiment = _record(path)
+    samples = SampleStore.load(
+        os.path.join(experiment.full_path, "001-samples.npz"))
+    assert samples.size == 500
+    assert samples.masks
+    # within an episode, the next state is the state of the next transition
+    start = np.ones(500, dtype=bool)
+    start[1:] = samples.terminal[:-1, 0]
+    continued = ~start[1:] & np.all(samples.ns[:-1] == samples.s[1:], axis=1)
+    assert continued.sum() > 400
+    assert np.all(samples.p_actions[np.arange(500), samples.a[:, 0]])
+    # memory-mapped recording gives the same transitions
+    other = _record(tempfile.mkdtemp(), record_memmap=True)
+    reopened = SampleStore.open(
+        os.path.join(other.full_path, "001-samples"), mode="r")
+    assert np.all(reopened.s == samples.s)
+    assert np.all(reopened.np_actions == samples.np_actions)
+
+
+def test_offline_lspi():
+    """ Ensure LSPI learns from all recorded transitions """
+    path = tempfile.mkdtemp()
+    recording = _record(path)
+    dataset = os.path.join(recording.full_path, "001-samples.npz")
+    domain = _domain()
+    representation = Tabular(domain)
+    policy = eGreedy(representation, epsilon=0.1)
+    agent = LSPI(policy, representation, domain.discount_factor, 500, 1000)
+    experiment = OfflineExperiment(agent, domain, dataset, chunk_size=64,
+                                   num_policy_checks=4, path=path)
+    experiment.run()
+    assert experiment.result["learning_steps"] == [0, 125, 250, 375, 500]
+    assert agent.samples_count == 500
+    F1 = agent.all_phi_s_a
+    F2 = agent.all_phi_ns_na
+    assert np.allclose(agent.b, np.dot(F1.T, agent.data_r))
+    assert np.allclose(agent.A, np.dot(F1.T, F1 - agent.discount_factor * F2))
+    assert np.any(representation.weight_vec != 0)
+
+    # online agents replay the transitions
+    agent = _q_learning(domain)
+    experiment = OfflineExperiment(agent, domain, dataset, max_steps=200,
+                                   num_policy_checks=2, path=path)
+    experiment.run()
+    assert experiment.result["learning_steps"] == [0, 100, 200]
+    assert np.any(agent.representation.weight_vec != 0)
@@ -0,0 +1,47 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+from future import standard_library
+standard_library.install_aliases()
+import os
+import tempfile
+from rlpy.Tools.run import run, get_finished_ids
+
+SETTING = '''
+import os
+from rlpy.Domains import GridWorld
+from rlpy.Representations import Tabular
+from rlpy.Policies import eGreedy
+from rlpy.Agents import Q_Learning
+from rlpy.Experiments import Experiment
+
+
+def make_experiment(exp_id=1, path="./Results/Temp", epsilon=0.2):
+    maze = os.path.join(GridWorld.default_map_dir, '4x5.txt')
+    domain = GridWorld(maze, noise=0.3)
+    representation = Tabular(domain)
+    policy = eGreedy(representation, epsilon=epsilon)
+    agent = Q_Learning(policy, representation, domain.discount_factor)
+    return Experiment(agent, domain, exp_id=exp_id, path=path,
+                      max_steps=200, num_policy_checks=2,
+                      checks_per_policy=1)
+
+if __name__ == '__main__':
+    make_experiment(1).run()
+'''
+
+
+def test_run_pool():
+    """ Ensure the pool runner writes the results of every seed """
+    path = tempfile.mkdtemp()
+    setting = os.path.join(path, "setting.py")
+    with open(setting, "w") as f:
+        f.write(SETTING)
+    location = os.path.join(path, "results")
+    run(setting, location, ids=[0, 1], parallelization="pool", n_jobs=2,
+        verbose=0, epsilon=0.1)
+    assert get_finished_ids(location) == [1, 2]
+    for exp_id in [1, 2]:
+        assert os.path.exists(
+            os.path.join(location, "%03d-results.json" % exp_id))
@@ -0,0 +1,75 @@
+"""Guards the time needed to import rlpy for a headless experiment."""
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+from future import standard_library
+standard_library.install_aliases()
+import os
+import sys
+import json
+import subprocess
+import importlib
+import rlpy
+from rlpy.Tools import __rlpy_location__
+
+__copyright__ = "Copyright 2013, RLPy http://acl.mit.edu/RLPy"
+__credits__ = ["Alborz Geramifard", "Robert H. Klein", "Christoph Dann",
+               "William Dabney", "Jonathan P. How"]
+__license__ = "BSD 3-Clause"
+
+#: modules only needed for visualizations or a few representations / domains
+HEAVY_MODULES = ["sklearn", "networkx", "scipy.stats", "scipy.integrate",
+                 "scipy.io", "matplotlib.pylab", "mpl_toolkits.mplot3d",
+                 "rlpy.Domains.HIVTreatment", "rlpy.Domains.Pacman",
+                 "rlpy.Representations.KernelizediFDD"]
+
+#: generous upper bound of the import time (s) on a slow machine
+IMPORT_TIME_BUDGET = 3.
+
+SCRIPT = """
+import sys, time, json
+before = set(sys.modules)
+start = time.time()
+from rlpy.Domains import GridWorld
+from rlpy.Agents import Q_Learning
+from rlpy.Representations import Tabular
+from rlpy.Policies import eGreedy
+from rlpy.Experiments import Experiment
+duration = time.time() - start
+print(json.dumps({"time": duration,
+                  "loaded": sorted(set(sys.modules) - before)}))
+"""
+
+
+def _importHeadless():
+    env = dict(os.environ)
+    path = os.path.dirname(__rlpy_location__)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [path] + [p for p in [env.get("PYTHONPATH")] if p])
+    # the first run writes the byte code of the modules
+    for i in range(2):
+        out = subprocess.check_output([sys.executable, "-c", SCRIPT],
+                                      env=env)
+    return json.loads(out.decode("utf-8").strip().splitlines()[-1])
+
+
+def test_import_headless():
+    result = _importHeadless()
+    loaded = result["loaded"]
+    for name in HEAVY_MODULES:
+        assert name not in loaded, "%s was imported" % name
+    assert result["time"] < IMPORT_TIME_BUDGET, \
+        "importing rlpy took %.2fs" % result["time"]
+
+
+def test_lazy_attributes():
+    from rlpy.Agents import Q_Learning, Q_LEARNING
+    assert Q_LEARNING is Q_Learning
+    assert "GridWorld" in dir(rlpy.Domains)
+    importlib.import_module("rlpy.Domains.GridWorld")
+    # the class and not the submodule of the same name
+    from rlpy.Domains import GridWorld
+    assert GridWorld.__name__ == "GridWorld"
+    assert rlpy.Domains.GridWorld is GridWorld
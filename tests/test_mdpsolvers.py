@@ -0,0 +1,81 @@
+"""Nosetests for the model based MDP solvers."""
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+
+from future import standard_library
+standard_library.install_aliases()
+from builtins import range
+from copy import deepcopy
+import os
+import numpy as np
+from rlpy.Domains import GridWorld, BlocksWorld
+from rlpy.MDPSolvers import ValueIteration, PolicyIteration, PrioritizedSweeping
+from rlpy.MDPSolvers.TabularModel import TabularModel
+from rlpy.Representations import Tabular
+from rlpy.Policies import eGreedy
+
+
+def _gridworld():
+    maze = os.path.join(GridWorld.default_map_dir, '4x5.txt')
+    return GridWorld(maze, noise=0.3)
+
+
+def test_model_backups():
+    """ Ensure the compiled backups agree with ``Q_oneStepLookAhead`` """
+    for domain in [_gridworld(), BlocksWorld(blocks=3, towerSize=3)]:
+        rep = Tabular(domain)
+        rep.weight_vec[:] = np.random.RandomState(0).randn(len(rep.weight_vec))
+        policy = eGreedy(deepcopy(rep), epsilon=0,
+                         forcedDeterministicAmongBestActions=True)
+        policy.representation.weight_vec[:] = \
+            np.random.RandomState(1).randn(len(rep.weight_vec))
+        model = TabularModel(rep)
+        Q = model.bellmanBackup(rep.weight_vec)
+        Q_pi = model.policyBackup(
+            rep.weight_vec, model.greedyPolicy(policy.representation.weight_vec))
+        S = model.states_num
+        for i in range(S):
+            s = rep.stateID2state(i)
+            for a in domain.possibleActions(s):
+                assert np.allclose(rep.Q_oneStepLookAhead(s, a, 1), Q[a * S + i])
+                assert np.allclose(rep.Q_oneStepLookAhead(s, a, 1, policy),
+                                   Q_pi[a * S + i])
+
+
+def test_compiled_solvers():
+    """ Ensure the solvers converge to the same values with a compiled model """
+    weights = []
+    for Solver, kwargs in [(ValueIteration, {"compile_model": False}),
+                           (ValueIteration, {}),
+                           (PolicyIteration, {"max_PE_iterations": 1000}),
+                           (PolicyIteration, {"direct_PE": True})]:
+        domain = _gridworld()
+        rep = Tabular(domain)
+        solver = Solver(1, rep, domain, convergence_threshold=1e-8,
+                        project_path="./Results/Temp/test_mdpsolvers", **kwargs)
+        solver.solve()
+        weights.append(rep.weight_vec.copy())
+    # value iteration also backs up the actions of the terminal states
+    assert np.allclose(weights[0], weights[1], atol=1e-6)
+    assert np.allclose(weights[2], weights[3], atol=1e-6)
+    model = TabularModel(rep)
+    non_terminal = np.tile(~model.terminal, model.actions_num)
+    assert np.allclose(weights[1][non_terminal], weights[3][non_terminal],
+                       atol=1e-6)
+
+
+def test_prioritized_sweeping():
+    """ Ensure prioritized sweeping converges with fewer backups than VI """
+    weights, updates = [], []
+    for Solver in [ValueIteration, PrioritizedSweeping]:
+        domain = _gridworld()
+        rep = Tabular(domain)
+        solver = Solver(1, rep, domain, convergence_threshold=1e-8,
+                        project_path="./Results/Temp/test_mdpsolvers")
+        solver.solve()
+        weights.append(rep.weight_vec.copy())
+        updates.append(solver.result["bellman_updates"][-1])
+    assert np.allclose(weights[0], weights[1], atol=1e-6)
+    assert updates[1] < updates[0]
@@ -47,4 +47,26 @@ def test_phi_post_expansion():
     
     """
     # TODO - could check to make sure weight vector remains aligned with 
-    # feat vec, even after expansion
\ No newline at end of file
+    # feat vec, even after expansion
+
+
+def test_feature_cache():
+    """ Ensure cached features are reused and dropped when features are added """
+    mapDir = os.path.join(__rlpy_location__, "Domains", "GridWorldMaps")
+    mapname=os.path.join(mapDir, "4x5.txt")
+    domain = GridWorld(mapname=mapname)
+
+    rep = IncrementalTabular(domain)
+    s = np.array([0, 0])
+    s2 = np.array([1, 2])
+    rep.pre_discover(s, False, 0, s, False)
+    phiVec = rep.phi(s, False)
+    assert rep.phi(np.array([0, 0]), False) is phiVec  # served from the cache
+    indices, _ = rep.phi_active(s, False)
+    assert np.array_equal(indices, np.nonzero(phiVec)[0])
+
+    rep.pre_discover(s2, False, 0, s2, False)
+    phiVec2 = rep.phi(s, False)
+    assert phiVec2 is not phiVec
+    assert len(phiVec2) == rep.features_num == 2
+    assert sum(phiVec2) == 1
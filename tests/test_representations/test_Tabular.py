@@ -7,6 +7,7 @@ standard_library.install_aliases()
 from rlpy.Representations import Tabular
 from rlpy.Domains import GridWorld, InfiniteTrackCartPole
 import numpy as np
+import scipy.sparse as sp
 from rlpy.Tools import __rlpy_location__
 import os
 
@@ -50,4 +51,44 @@ def test_continuous_discr():
     rep = Tabular(domain, discretization=20)
     assert rep.features_num == 400
     rep = Tabular(domain, discretization=50)
-    assert rep.features_num == 2500
\ No newline at end of file
+    assert rep.features_num == 2500
+
+
+def test_phi_active():
+    """ Ensure the sparse active feature agrees with the dense ``phi`` """
+    mapDir = os.path.join(__rlpy_location__, "Domains", "GridWorldMaps")
+    mapname=os.path.join(mapDir, "4x5.txt")
+    domain = GridWorld(mapname=mapname)
+
+    rep = Tabular(domain)
+    for r in np.arange(4):
+        for c in np.arange(5):
+            s = np.array([r, c])
+            indices, values = rep.phi_active(s, terminal=False)
+            assert np.array_equal(indices, np.nonzero(rep.phi(s, False))[0])
+            assert np.array_equal(values, [1.])
+    indices, values = rep.phi_active(s, terminal=True)
+    assert len(indices) == 0
+
+
+def test_batch_best_action():
+    """ Ensure batchBestAction agrees with bestAction for every state """
+    mapDir = os.path.join(__rlpy_location__, "Domains", "GridWorldMaps")
+    mapname=os.path.join(mapDir, "4x5.txt")
+    domain = GridWorld(mapname=mapname)
+
+    rep = Tabular(domain)
+    rep.weight_vec = np.random.RandomState(0).randn(len(rep.weight_vec))
+    states = np.array([[r, c] for r in range(4) for c in range(5)])
+    all_phi_s = rep.phi_batch(states)
+    for use_sparse in [False, True]:
+        best, phi_s_a, mask = rep.batchBestAction(states, all_phi_s,
+                                                  useSparse=use_sparse)
+        assert sp.issparse(phi_s_a) == use_sparse
+        if use_sparse:
+            phi_s_a = phi_s_a.toarray()
+        for i, s in enumerate(states):
+            p_actions = domain.possibleActions(s)
+            assert best[i] == rep.bestAction(s, False, p_actions)
+            assert np.all(mask[i, p_actions] == 0)
+            assert np.array_equal(phi_s_a[i], rep.phi_sa(s, False, best[i]))
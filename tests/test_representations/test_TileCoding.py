@@ -27,4 +27,70 @@ def test_number_of_cells():
                      safety="super") # super safety prevents any collisions
     assert rep.features_num == memory
     
-    # TODO - test hashing function
\ No newline at end of file
+    # TODO - test hashing function
+
+
+def test_phi_active():
+    """ Ensure the sparse active features agree with the dense ``phi`` """
+    domain = InfiniteTrackCartPole.InfTrackCartPole()
+    rep = TileCoding(domain, memory=500, num_tilings=[4, ],
+                     resolutions=[5, ], dimensions=[[0, 1], ],
+                     safety="super")
+    random_state = np.random.RandomState(0)
+    limits = domain.statespace_limits
+    for _ in range(20):
+        s = limits[:, 0] + random_state.rand(2) * (limits[:, 1] - limits[:, 0])
+        phi = rep.phi(s, terminal=False)
+        indices, values = rep.phi_active(s, terminal=False)
+        assert np.array_equal(indices, np.nonzero(phi)[0])
+        assert np.all(values == 1)
+    indices, values = rep.phi_active(s, terminal=True)
+    assert len(indices) == 0 and len(values) == 0
+
+
+def test_phi_batch():
+    """ Ensure ``phi_batch`` agrees with ``phi`` applied to each state """
+    domain = InfiniteTrackCartPole.InfTrackCartPole()
+    limits = domain.statespace_limits
+    random_state = np.random.RandomState(0)
+    S = limits[:, 0] + random_state.rand(30, 2) * (limits[:, 1] - limits[:, 0])
+    terminal = np.zeros(30, dtype=bool)
+    terminal[[3, 17]] = True
+    rep = TileCoding(domain, memory=500, num_tilings=[4, ],
+                     resolutions=[5, ], dimensions=[[0, 1], ],
+                     safety="super")
+    ref = TileCoding(domain, memory=500, num_tilings=[4, ],
+                     resolutions=[5, ], dimensions=[[0, 1], ],
+                     safety="super")
+    ref.feature_cache_size = 0
+    expected = np.array([ref.phi(s, t) for s, t in zip(S, terminal)])
+    assert np.array_equal(rep.phi_batch(S, terminal), expected)
+    assert np.array_equal(rep.phi_batch(S, terminal, use_sparse=True).toarray(),
+                          expected)
+
+
+def test_compiled_hashing():
+    """ Ensure the C-extension hashes exactly like the python implementation """
+    import sys
+    module = sys.modules[TileCoding.__module__]
+    if module.active_tiles is None:
+        return
+    domain = InfiniteTrackCartPole.InfTrackCartPole()
+    limits = domain.statespace_limits
+    S = limits[:, 0] + np.random.RandomState(0).rand(200, 2) * \
+        (limits[:, 1] - limits[:, 0])
+    for safety in ["super", "lazy", "none"]:
+        # a small memory provokes collisions
+        reps = [TileCoding(domain, memory=40, num_tilings=[4, 2],
+                           resolutions=[5, 3], dimensions=[[0, 1], [1]],
+                           safety=safety) for _ in range(2)]
+        compiled = reps[0]._active_tiles_batch(S)
+        kernel, module.active_tiles = module.active_tiles, None
+        try:
+            python = np.array([reps[1]._active_tiles(s) for s in S])
+        finally:
+            module.active_tiles = kernel
+        assert np.array_equal(compiled, python)
+        assert np.array_equal(reps[0].counts, reps[1].counts)
+        assert np.array_equal(reps[0].check_data, reps[1].check_data)
+        assert reps[0].collisions == reps[1].collisions
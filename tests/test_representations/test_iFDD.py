@@ -10,6 +10,8 @@ from rlpy.Representations import iFDD
 from rlpy.Representations import IndependentDiscretizationCompactBinary
 import rlpy.Domains
 import numpy as np
+import scipy.sparse as sp
+from copy import deepcopy
 
 STDOUT_FILE = 'out.txt'
 JOB_ID = 1
@@ -79,6 +81,103 @@ def deterministic_test():
     assert np.array_equal(ANSWER, np.array([2, 3, 4, 5, 6, 7, 8, 22]))
     # rep.showCache()
 
+
+def test_feature_index():
+    """ Ensure the indexed lookup of active features matches a linear scan """
+    domain = rlpy.Domains.SystemAdministrator()
+    initialRep = IndependentDiscretizationCompactBinary(domain)
+    rep = iFDD(domain, discovery_threshold, initialRep,
+               useCache=0, sparsify=sparsify)
+    rep.inspectPair(0, 1, discovery_threshold + 1)
+    rep.inspectPair(0, 20, discovery_threshold + 1)
+    rep.inspectPair(20, 21, discovery_threshold + 1)
+    rep.inspectPair(2, 3, discovery_threshold + 1)
+    assert rep.featuresContaining[0] == [0, 21, 22, 23]
+    assert rep.featuresContaining[20] == [20, 22, 23]
+    rep = deepcopy(rep)
+    random_state = np.random.RandomState(0)
+    for i in range(100):
+        active = set(random_state.choice(20, 8, replace=False)) | {0, 20}
+        expected = []
+        remaining = set(active)
+        for feature in rep.sortediFDDFeatures.toList():
+            if remaining.issuperset(feature.f_set):
+                expected.append(feature.index)
+                remaining -= feature.f_set
+        assert rep.findFinalActiveFeatures(list(active)) == expected
+
+
+def test_bounded_cache():
+    """ Ensure the LRU cache of active features is bounded and invalidated """
+    domain = rlpy.Domains.SystemAdministrator()
+    initialRep = IndependentDiscretizationCompactBinary(domain)
+    rep = iFDD(domain, discovery_threshold, initialRep,
+               useCache=1, sparsify=sparsify, cacheSize=2)
+    assert rep.findFinalActiveFeatures([0, 1, 2]) == [2, 1, 0]
+    assert rep.findFinalActiveFeatures([0, 1, 3]) == [3, 1, 0]
+    # hit keeps [0, 1, 2] and evicts [0, 1, 3]
+    assert rep._final_from_initial([0, 1, 2]) == [2, 1, 0]
+    assert rep.findFinalActiveFeatures([4, 5]) == [5, 4]
+    assert len(rep.cache) == 2
+    assert frozenset([0, 1, 3]) not in rep.cache
+    assert rep.cache.stats() == {"size": 2, "hits": 1, "misses": 0,
+                                 "evictions": 1}
+    # discovering [0, 1] only invalidates the entries containing it
+    rep.inspectPair(0, 1, discovery_threshold + 1)
+    assert frozenset([0, 1, 2]) not in rep.cache
+    assert frozenset([4, 5]) in rep.cache
+    assert rep._final_from_initial([0, 1, 2]) == [21, 2]
+    assert rep.cache.misses == 1
+
+
+def test_potential_store():
+    """ Ensure potentials of the same conjunction share their statistics """
+    domain = rlpy.Domains.SystemAdministrator()
+    initialRep = IndependentDiscretizationCompactBinary(domain)
+    rep = iFDD(domain, 10, initialRep, iFDDPlus=0, maxPotentials=4)
+    rep.inspectPair(0, 1, 4)
+    rep.inspectPair(0, 2, 1)
+    assert len(rep.iFDD_potentials) == 2
+    rep.inspectPair(0, 1, 6)
+    rep.inspectPair(0, 2, 9)
+    assert rep.findFinalActiveFeatures([0, 1]) == [21]
+    assert rep.findFinalActiveFeatures([0, 2]) == [22]
+    # [0, 1] and [2] lead to the same conjunction as [0, 2] and [1]
+    rep.inspectPair(21, 2, 3)
+    rep.inspectPair(22, 1, 3)
+    store = rep.iFDD_potentials
+    slot = store.findSet(frozenset([0, 1, 2]), rep._potentialSet)
+    assert store["cumabstderr"][slot] == 6 and store["count"][slot] == 3
+    rep.inspectPair(22, 1, 4)
+    assert rep.findFinalActiveFeatures([0, 1, 2]) == [23]
+    assert len(store) == 0
+    # potentials with the lowest relevance are evicted first
+    for i in range(3, 8):
+        rep.inspectPair(0, i, i)
+    assert len(store) == 3 and store.evictions == 2
+    assert sorted(store["cumabstderr"][store.liveSlots()]) == [5, 6, 7]
+
+
+def test_batch_discover():
+    """ Ensure batch discovery adds the most relevant pairs of features """
+    domain = rlpy.Domains.SystemAdministrator()
+    initialRep = IndependentDiscretizationCompactBinary(domain)
+    phi = np.zeros((4, initialRep.features_num))
+    phi[:, [0, 1]] = 1
+    phi[:2, 5] = phi[:2, 7] = 1
+    phi[3, 2] = 1
+    td_errors = np.array([1., 1., 0.5, -1.])
+    for use_sparse in [False, True]:
+        rep = iFDD(domain, discovery_threshold, initialRep, iFDDPlus=0,
+                   maxBatchDiscovery=2, batchThreshold=1.5)
+        assert rep.batchDiscover(
+            td_errors, sp.csr_matrix(phi) if use_sparse else phi, None)
+        # [0, 1] has relevance 3.5, the pairs of [0, 1, 5, 7] 2, [0, 2] 1
+        assert rep.getStrFeatureSet(21) == "[0, 1]"
+        assert rep.features_num == 23
+        assert rep.getStrFeatureSet(22) in ["[0, 5]", "[0, 7]", "[1, 5]",
+                                           "[1, 7]", "[5, 7]"]
+
 import nose.tools
 
 